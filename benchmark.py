@@ -0,0 +1,291 @@
+import json
+import argparse
+import contextlib
+import io
+import logging
+import os
+import platform
+import random
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+
+import h5py
+import numpy as np
+import pandas as pd
+import streamlit
+
+# Der Viewer läuft ohne "streamlit run"; die Warnungen dazu sind hier bedeutungslos
+streamlit.config.set_option("global.showWarningOnDirectExecution", False)
+streamlit.config.set_option("logger.level", "error")
+streamlit.logger.set_log_level(logging.ERROR)
+import cv
+import json_toh5
+
+# Standardgrößen der Benchmarks als CHATSxNACHRICHTEN_PRO_CHAT
+DEFAULT_SIZES = ["10x100", "100x500", "200x2000"]
+
+# Wortschatz der synthetischen Nachrichten
+WORDS = ["hallo", "treffen", "morgen", "heute", "danke", "bitte", "projekt", "termin", "später", "gestern",
+         "frage", "antwort", "version", "neue", "alte", "datei", "schicke", "gleich", "wieder", "woche",
+         "montag", "dienstag", "mittwoch", "donnerstag", "freitag", "büro", "kaffee", "straße", "grüße",
+         "übersetzung", "nachricht", "server", "fehler", "läuft", "schon", "noch", "nicht", "alles", "gut",
+         "vielleicht", "natürlich", "genau", "okay", "super", "klar", "idee", "plan", "zeit", "liste", "bericht"]
+
+# Suchanfrage des Such-Benchmarks (zwei häufige Wörter, UND-verknüpft)
+SEARCH_QUERY = "treffen morgen"
+
+# Nachrichten pro Seite im Render-Benchmark
+RENDER_PAGE_SIZE = 100
+
+
+def random_text(rng):
+    """Zufälliger Nachrichtentext aus 3 bis 20 Wörtern des Wortschatzes."""
+    return " ".join(rng.choices(WORDS, k=rng.randint(3, 20)))
+
+
+def generate_export(json_file_path, chats, messages_per_chat, duplicate_ratio=0.1, senders=50,
+                    translation_ratio=0.3, seed=0):
+    """
+    Schreibt einen synthetischen Chat-Export im JSON-Format, das convert_json_to_h5 erwartet.
+    Ein Anteil duplicate_ratio der Chats wird als zwei Fragmente mit derselben chat_id
+    exportiert (das zweite am Ende der Datei), die sich in etwa 10 % der Nachrichten
+    überschneiden; ein Anteil translation_ratio der Nachrichten erhält DeepL- und
+    M2M100-Übersetzungen. Jeder Chat nutzt 2 bis 8 der senders Sender.
+
+    Returns:
+        int: Anzahl der eindeutigen Nachrichten
+    """
+    rng = random.Random(seed)
+    sender_aliases = [f"@user{i}:matrix.example.com" for i in range(senders)]
+    message_id = 0
+    deferred = []
+
+    def write_fragment(file, chat_id, fragment, first):
+        if not first:
+            file.write(",\n")
+        json.dump({
+            "chat_id": chat_id,
+            "unique_sender_count": len({msg["sender_alias"] for msg in fragment}),
+            "message_count": len(fragment),
+            "messages": fragment,
+        }, file, ensure_ascii=False)
+
+    with open(json_file_path, "w", encoding="utf-8") as file:
+        file.write("[\n")
+        for chat in range(chats):
+            chat_id = f"!chat{chat:06d}:matrix.example.com"
+            chat_senders = rng.sample(sender_aliases, min(len(sender_aliases), rng.randint(2, 8)))
+            timestamp = datetime(2023, 1, 1) + timedelta(seconds=rng.randrange(365 * 86400))
+            messages = []
+            for _ in range(messages_per_chat):
+                timestamp += timedelta(seconds=rng.randint(1, 3600))
+                msg = {
+                    "timestamp": timestamp.strftime(json_toh5.TIMESTAMP_FORMAT),
+                    "sender_alias": rng.choice(chat_senders),
+                    "message": random_text(rng),
+                    "message_id": message_id,
+                }
+                if rng.random() < translation_ratio:
+                    msg["message_deepl"] = random_text(rng)
+                    msg["message_m2m100"] = random_text(rng)
+                messages.append(msg)
+                message_id += 1
+
+            if len(messages) > 1 and rng.random() < duplicate_ratio:
+                split = len(messages) // 2
+                overlap = max(1, len(messages) // 10)
+                write_fragment(file, chat_id, messages[:split + overlap], chat == 0)
+                deferred.append((chat_id, messages[split:]))
+            else:
+                write_fragment(file, chat_id, messages, chat == 0)
+        for chat_id, fragment in deferred:
+            write_fragment(file, chat_id, fragment, False)
+        file.write("\n]\n")
+    return message_id
+
+
+def measure(function, repeat=3, memory=True):
+    """
+    Misst eine Phase: die beste von repeat Laufzeiten und, mit memory, in einem
+    zusätzlichen Lauf die Spitze der Python-Allokationen (tracemalloc; erfasst auch
+    NumPy-Arrays, aber nicht den internen Speicher von HDF5).
+
+    Returns:
+        tuple: (Sekunden, Spitzenspeicher in Bytes oder None, Rückgabewert des letzten Laufs)
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - start)
+    peak = None
+    if memory:
+        tracemalloc.start()
+        try:
+            result = function()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return min(timings), peak, result
+
+
+def run_size(work_dir, chats, messages_per_chat, args):
+    """Erzeugt einen Export der angegebenen Größe und misst Konvertierung, Laden, Filtern, Suche und Rendern."""
+    json_file_path = os.path.join(work_dir, f"export_{chats}x{messages_per_chat}.json")
+    h5_file_path = os.path.join(work_dir, f"chats_{chats}x{messages_per_chat}.h5")
+    messages = generate_export(json_file_path, chats, messages_per_chat, args.duplicate_ratio, args.senders,
+                               args.translation_ratio, args.seed)
+    phases = {}
+
+    def convert():
+        # Fortschrittsausgaben des Konverters unterdrücken
+        with contextlib.redirect_stdout(io.StringIO()):
+            json_toh5.convert_json_to_h5(json_file_path, h5_file_path)
+    phases["convert"] = measure(convert, args.repeat, args.memory)
+
+    def load():
+        cv.get_chat_cache().clear()
+        chat_index, file_info = cv.read_chat_index(h5_file_path)
+        df, filter_index = cv.load_all_chats(h5_file_path, chat_index, file_info)
+        return file_info, df, filter_index
+    phases["load"] = measure(load, args.repeat, args.memory)
+    file_info, df, filter_index = phases["load"][2]
+
+    # Filter: ein Sender und die mittlere Hälfte des Zeitraums
+    first_date = pd.Timestamp(file_info["first_timestamp"]).date()
+    last_date = pd.Timestamp(file_info["last_timestamp"]).date()
+    start_date = first_date + (last_date - first_date) / 4
+    end_date = last_date - (last_date - first_date) / 4
+    phases["filter"] = measure(lambda: filter_index.filter(df, 0, start_date, end_date), args.repeat, args.memory)
+
+    # Suche ohne Cache, also einschließlich der casefoldeten Spalten
+    frame_key = (file_info["fingerprint"], None)
+    columns = [column for column in ["message", "message_deepl"] if column in df.columns]
+
+    def search():
+        cv.get_chat_cache().clear()
+        return cv.search_messages(h5_file_path, file_info, frame_key, df, filter_index, (None, None, None),
+                                  SEARCH_QUERY, columns)
+    phases["search"] = measure(search, args.repeat, args.memory)
+    search_results, search_hits = phases["search"][2]
+
+    # Rendern der ersten Seite ohne Fragment-Cache
+    page_df = df.iloc[:RENDER_PAGE_SIZE]
+    highlight_pattern = cv.build_highlight_pattern(SEARCH_QUERY)
+
+    def render():
+        cv.get_fragment_cache().clear()
+        return cv.render_page(page_df, file_info["fingerprint"], highlight_pattern, search_hits,
+                              search_results[0] if len(search_results) else -1, "DeepL Übersetzung bevorzugt")
+    phases["render"] = measure(render, args.repeat, args.memory)
+
+    records = []
+    for phase, (seconds, peak, _) in phases.items():
+        records.append({
+            "size": f"{chats}x{messages_per_chat}",
+            "chats": chats,
+            "messages_per_chat": messages_per_chat,
+            "messages": messages,
+            "phase": phase,
+            "seconds": seconds,
+            "peak_bytes": peak,
+        })
+    records[0]["h5_bytes"] = os.path.getsize(h5_file_path)
+    return records
+
+
+def get_git_commit():
+    """Aktueller Git-Commit des Repositorys oder None."""
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(records, baseline=None):
+    """Gibt die Ergebnisse als Tabelle aus; mit baseline zusätzlich das Verhältnis zur alten Laufzeit."""
+    old = {(record["size"], record["phase"]): record for record in baseline["results"]} if baseline else {}
+    header = f"{'Größe':<12} {'Nachrichten':>11} {'Phase':<8} {'Sekunden':>10} {'Spitze (MB)':>12}"
+    if baseline:
+        header += f" {'alt (s)':>10} {'Faktor':>7}"
+    print(header)
+    for record in records:
+        peak = "-" if record["peak_bytes"] is None else f"{record['peak_bytes'] / 1024 ** 2:.1f}"
+        line = (f"{record['size']:<12} {record['messages']:>11} {record['phase']:<8} "
+                f"{record['seconds']:>10.4f} {peak:>12}")
+        previous = old.get((record["size"], record["phase"]))
+        if previous:
+            line += f" {previous['seconds']:>10.4f} {record['seconds'] / previous['seconds']:>7.2f}"
+        print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Misst Konverter und Viewer mit synthetischen Chat-Exporten.")
+    parser.add_argument("--sizes", nargs='+', default=DEFAULT_SIZES,
+                        help=f"Größen als CHATSxNACHRICHTEN_PRO_CHAT (Standard: {' '.join(DEFAULT_SIZES)})")
+    parser.add_argument("--duplicate-ratio", type=float, default=0.1,
+                        help="Anteil der Chats, die als zwei überlappende Fragmente exportiert werden (Standard: 0.1)")
+    parser.add_argument("--senders", type=int, default=50, help="Anzahl verschiedener Sender (Standard: 50)")
+    parser.add_argument("--translation-ratio", type=float, default=0.3,
+                        help="Anteil der Nachrichten mit Übersetzungen (Standard: 0.3)")
+    parser.add_argument("--seed", type=int, default=0, help="Startwert des Zufallsgenerators (Standard: 0)")
+    parser.add_argument("--repeat", type=int, default=3, help="Läufe pro Phase, gewertet wird der schnellste (Standard: 3)")
+    parser.add_argument("--no-memory", dest="memory", action="store_false",
+                        help="Keinen zusätzlichen Lauf zur Messung des Spitzenspeichers")
+    parser.add_argument("--output", "-o", default="benchmark_results.json",
+                        help="JSON-Datei für die Ergebnisse (Standard: benchmark_results.json)")
+    parser.add_argument("--compare", help="Frühere Ergebnisdatei, mit der verglichen wird")
+    parser.add_argument("--work-dir", help="Verzeichnis für Exporte und H5-Dateien (Standard: temporär)")
+
+    args = parser.parse_args()
+
+    sizes = []
+    for size in args.sizes:
+        try:
+            chats, messages_per_chat = (int(value) for value in size.lower().split("x"))
+        except ValueError:
+            parser.error(f"Ungültige Größe '{size}', erwartet z. B. 100x1000")
+        if chats < 1 or messages_per_chat < 1:
+            parser.error(f"Ungültige Größe '{size}': Chats und Nachrichten pro Chat müssen mindestens 1 sein")
+        sizes.append((chats, messages_per_chat))
+    if args.repeat < 1:
+        parser.error("--repeat muss mindestens 1 sein")
+    if not 0 <= args.duplicate_ratio <= 1 or not 0 <= args.translation_ratio <= 1:
+        parser.error("--duplicate-ratio und --translation-ratio müssen zwischen 0 und 1 liegen")
+    if args.senders < 2:
+        parser.error("--senders muss mindestens 2 sein")
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            baseline = json.load(file)
+
+    # Der Festplatten-Cache des Viewers würde die Lade-Messung verfälschen
+    os.environ["CHAT_VIEWER_DISK_CACHE_DIR"] = ""
+
+    records = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        work_dir = args.work_dir or temp_dir
+        os.makedirs(work_dir, exist_ok=True)
+        for chats, messages_per_chat in sizes:
+            print(f"Messe {chats}x{messages_per_chat} ...")
+            records.extend(run_size(work_dir, chats, messages_per_chat, args))
+
+    results = {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": get_git_commit(),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "versions": {"numpy": np.__version__, "pandas": pd.__version__, "h5py": h5py.__version__},
+        "settings": {key: value for key, value in vars(args).items() if key not in ("output", "compare", "work_dir")},
+        "results": records,
+    }
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(results, file, indent=2, ensure_ascii=False)
+
+    print_results(records, baseline)
+    print(f"Ergebnisse gespeichert in {args.output}")
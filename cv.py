@@ -1,11 +1,73 @@
 import os
+import glob
+import json
 import pandas as pd
 import streamlit as st
 from datetime import datetime, timedelta
 import h5py
 import numpy as np
 import re
+import copy
 import hashlib
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from itertools import islice
+from pandas.api.types import union_categoricals
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+
+from json_toh5 import format_bytes
+
+# Standard-Speicherbudget des Chat-Caches in MB (überschreibbar mit CHAT_VIEWER_CACHE_MB)
+DEFAULT_CHAT_CACHE_MB = 512
+
+# Verzeichnis des Festplatten-Caches (Standard: "chat-viewer" im Cache-Verzeichnis des Benutzers,
+# $XDG_CACHE_HOME bzw. ~/.cache; überschreibbar mit CHAT_VIEWER_DISK_CACHE_DIR, ein leerer Wert
+# schaltet ihn ab; mit CHAT_VIEWER_DISK_CACHE_BESIDE_DATA=1 als "<Datei>.viewer-cache" neben der H5-Datei)
+DISK_CACHE_APP_DIR = "chat-viewer"
+DISK_CACHE_SUFFIX = ".viewer-cache"
+
+# Kleinere Chats sind schneller neu gelesen als aus dem Festplatten-Cache geladen
+DISK_CACHE_MIN_ROWS = 10000
+
+# Zeilen, an denen der Speicherbedarf von String-Spalten für das Cache-Budget geschätzt wird
+SIZE_SAMPLE_ROWS = 1000
+
+# Speicherbudget in MB für gerenderte Nachrichten (HTML-Fragmente)
+FRAGMENT_CACHE_MB = 32
+
+# Spalten der geladenen "Alle"-DataFrames in ihrer Reihenfolge
+FRAME_COLUMNS = ['timestamp', 'sender_alias', 'message', 'message_id', 'message_deepl', 'message_m2m100',
+                 'chat_id', 'chat_name', 'file_name']
+
+# Zeilen pro Lesevorgang, wenn "Alle" Chats geladen werden
+ALL_CHATS_BATCH_ROWS = 100000
+
+# Threads zum parallelen Lesen der Dateien eines Archivs (überschreibbar mit CHAT_VIEWER_READ_THREADS)
+DEFAULT_READ_THREADS = min(8, os.cpu_count() or 1)
+
+# Abstand in Sekunden, in dem die Live-Ansicht neue Chats einer wachsenden Datei nachlädt
+LIVE_REFRESH_SECONDS = 3
+
+# Zeilen der Tabellen "Aktivste Sender" und "Aktivste Chats"
+ACTIVITY_TOP_ROWS = 20
+
+# Optionale Übersetzungsspalten
+TRANSLATION_COLUMNS = ['message_deepl', 'message_m2m100']
+
+# Ungültige Zeitstempel (NaT) werden als kleinster int64-Wert gespeichert
+NAT_VALUE = np.iinfo(np.int64).min
+
+# Durchsuchbare Textspalten (Anzeigename -> Spalte)
+SEARCH_FIELDS = {'Original': 'message', 'DeepL': 'message_deepl', 'M2M100': 'message_m2m100'}
+
+# Strukturansicht: höchstens so viele Einträge pro aufgeklappter Gruppe, Attribute und Zeichen pro Attributwert
+STRUCTURE_MAX_ITEMS = 50
+STRUCTURE_MAX_ATTRS = 20
+STRUCTURE_MAX_ATTR_CHARS = 200
 
 # Passwort-Verifizierung
 def check_password():
@@ -50,122 +112,1559 @@ def check_password():
     
     return False
 
-# Hilfsfunktion zum Durchsuchen und Anzeigen der H5-Struktur
-def explore_h5_structure(hf, path="/", level=0):
-    result = []
-    indent = "  " * level
-    
-    # Gruppe und ihre Attribute auflisten
-    attrs_str = ""
-    if hasattr(hf[path], 'attrs') and len(hf[path].attrs) > 0:
-        attrs_str = " [Attributes: " + ", ".join([f"{k}={v}" for k, v in hf[path].attrs.items()]) + "]"
-    
-    result.append(f"{indent}{path}{attrs_str}")
-    
-    # Wenn es sich um eine Gruppe handelt, rekursiv die Unterelemente durchgehen
-    if isinstance(hf[path], h5py.Group):
-        for name in hf[path]:
-            child_path = path + name if path == "/" else path + "/" + name
-            result.extend(explore_h5_structure(hf, child_path, level+1))
-    
-    # Wenn es sich um ein Dataset handelt, Details anzeigen
-    elif isinstance(hf[path], h5py.Dataset):
-        dataset = hf[path]
-        shape_str = str(dataset.shape)
-        dtype_str = str(dataset.dtype)
-        try:
-            first_items = str(dataset[:5]) if dataset.shape[0] > 0 else "[]"
-            result.append(f"{indent}  [Shape: {shape_str}, Type: {dtype_str}, First items: {first_items}...]")
-        except Exception as e:
-            result.append(f"{indent}  [Shape: {shape_str}, Type: {dtype_str}, Error accessing data: {str(e)}]")
-    
+# Laufzeiten der Phasen eines Skriptdurchlaufs (für das Debug-Panel)
+class PhaseTimer:
+    """
+    Sammelt die Laufzeiten benannter Phasen eines Skriptdurchlaufs (HDF5 lesen, Dekodieren,
+    DataFrame bauen, Filtern, Suchen, Rendern) und Ereigniszähler wie Treffer im
+    Festplatten-Cache. Verschachtelte Phasen erhalten den Namen der umgebenden Phase als
+    Präfix ('load/read_columns/decode'), gleichnamige Phasen werden aufsummiert.
+    """
+    def __init__(self):
+        self.phases = OrderedDict()
+        self.counters = OrderedDict()
+        self.stack = []
+        self.cache_stats = get_cache_stats()
+        self.started = time.perf_counter()
+
+# Streamlit führt jeden Durchlauf in einem eigenen Thread aus; der Timer des laufenden
+# Durchlaufs liegt deshalb thread-lokal und ist None, solange das Debug-Panel aus ist
+phase_timers = threading.local()
+
+# Timer für den aktuellen Durchlauf setzen
+def start_phase_timer(enabled=True):
+    """Startet die Zeitmessung für den laufenden Durchlauf (oder schaltet sie ab) und liefert den Timer."""
+    phase_timers.current = PhaseTimer() if enabled else None
+    return phase_timers.current
+
+# Laufzeit einer Phase messen (auch als Dekorator verwendbar)
+@contextmanager
+def timed_phase(name):
+    timer = getattr(phase_timers, 'current', None)
+    if timer is None:
+        yield
+        return
+    path = f"{timer.stack[-1]}/{name}" if timer.stack else name
+    # In Startreihenfolge eintragen, damit umgebende Phasen vor ihren Unterphasen stehen
+    timer.phases.setdefault(path, (0, 0.0))
+    timer.stack.append(path)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        timer.stack.pop()
+        calls, seconds = timer.phases.get(path, (0, 0.0))
+        timer.phases[path] = (calls + 1, seconds + elapsed)
+
+# Ereignis im laufenden Durchlauf zählen
+def count_event(name):
+    timer = getattr(phase_timers, 'current', None)
+    if timer is not None:
+        timer.counters[name] = timer.counters.get(name, 0) + 1
+
+# Vom Konverter gespeicherte Strukturübersicht als Textzeilen formatieren
+def format_structure_summary(summary):
+    """Formatiert das Wurzelattribut 'structure_summary' (siehe write_structure_summary im Konverter)."""
+    counts = [f"{summary['chats']} Chats", f"{summary['messages']} Nachrichten"]
+    if 'senders' in summary:
+        counts.append(f"{summary['senders']} Sender")
+    if summary.get('dead_rows'):
+        counts.append(f"{summary['dead_rows']} ungenutzte Zeilen")
+    lines = [f"Layout {summary['layout_version']}: {', '.join(counts)} (Stand {summary['created']})"]
+    for path, group in summary['groups'].items():
+        lines.append(path + (f" [Attribute: {', '.join(group['attrs'])}]" if group['attrs'] else ""))
+        for name, dataset in group['datasets'].items():
+            lines.append(f"  {name}: Form {tuple(dataset['shape'])}, Typ {dataset['dtype']}, "
+                         f"{format_bytes(dataset['storage_bytes'])}, {dataset['filters']}")
+    if 'chat_groups' in summary:
+        lines.append(f"/<Chat-ID> ({summary['chats']} Gruppen)")
+        for name, dataset in summary['chat_groups'].items():
+            lines.append(f"  {name}: in {dataset['groups']} Gruppen, {dataset['rows']} Zeilen, Typ {dataset['dtype']}, "
+                         f"{format_bytes(dataset['storage_bytes'])}, {dataset['filters']}")
+    return lines
+
+# Attribute eines H5-Objekts gekürzt formatieren
+def format_h5_attrs(attrs):
+    if len(attrs) == 0:
+        return ""
+    items = [f"{key}={str(value)[:STRUCTURE_MAX_ATTR_CHARS]}" for key, value in islice(attrs.items(), STRUCTURE_MAX_ATTRS)]
+    if len(attrs) > STRUCTURE_MAX_ATTRS:
+        items.append(f"... {len(attrs) - STRUCTURE_MAX_ATTRS} weitere")
+    return " [Attributes: " + ", ".join(items) + "]"
+
+# Eine Gruppe oder ein Dataset der H5-Datei anzeigen (nicht rekursiv)
+def explore_h5_structure(hf, path="/", sample=False):
+    """
+    Listet Attribute und direkte Einträge der Gruppe path (Untergruppen mit Anzahl Einträge,
+    Datasets mit Form und Typ) bzw. die Details des Datasets path. Die ersten Werte der
+    Datasets werden nur mit sample=True gelesen. Angezeigt werden höchstens
+    STRUCTURE_MAX_ITEMS Einträge; Attributwerte werden gekürzt.
+    """
+    def describe(name, obj, indent):
+        if isinstance(obj, h5py.Group):
+            return f"{indent}{name}/ ({len(obj)} Einträge){format_h5_attrs(obj.attrs)}"
+        details = f"Shape: {obj.shape}, Type: {obj.dtype}"
+        if sample:
+            try:
+                details += f", First items: {str(obj[:5]) if obj.shape and obj.shape[0] > 0 else '[]'}..."
+            except Exception as e:
+                details += f", Error accessing data: {str(e)}"
+        return f"{indent}{name} [{details}]{format_h5_attrs(obj.attrs)}"
+
+    obj = hf[path]
+    if isinstance(obj, h5py.Dataset):
+        return [describe(path, obj, "")]
+    result = [f"{path}{format_h5_attrs(obj.attrs)}"]
+    for name in islice(obj, STRUCTURE_MAX_ITEMS):
+        child = obj.get(name)
+        result.append(describe(name, child, "  ") if child is not None else f"  {name} (nicht auflösbarer Link)")
+    if len(obj) > STRUCTURE_MAX_ITEMS:
+        result.append(f"  ... {len(obj) - STRUCTURE_MAX_ITEMS} weitere Einträge")
     return result
 
-# Funktion zum Laden der Daten aus einer H5-Datei - Keine selektive Ladung mehr
-def load_h5_file(file_path):
-    """Lädt alle Daten aus einer H5-Datei ohne selektives Laden."""
-    all_data = []
-    structure_info = []
-    
-    with h5py.File(file_path, 'r') as hf:
-        # H5-Struktur erkunden (nur beim ersten Mal)
-        if "h5_structure" not in st.session_state:
-            structure_info = explore_h5_structure(hf)
-            st.session_state.h5_structure = structure_info
+# Zeitstempel eines Chats als datetime64[ns]-Array lesen
+def read_timestamps(chat_group, rows=slice(None)):
+    """
+    Liest die Zeitstempel eines Chats (bzw. den Zeilenbereich rows) vektorisiert als
+    datetime64[ns]. Neue Dateien speichern int64-Unix-Timestamps mit den Attributen
+    'unit' und 'timezone'; ältere Dateien werden über timestamp_str bzw. Float-Sekunden gelesen.
+    """
+    dataset = chat_group['timestamp']
+    if 'unit' in dataset.attrs:
+        return to_local_datetimes(dataset[rows], dataset.attrs['unit'], dataset.attrs.get('timezone', 'UTC'))
+    if has_text_column(chat_group, 'timestamp_str'):
+        # Altes Format: timestamp_str enthält die lesbaren Zeitstempel
+        return pd.to_datetime(read_text_column(chat_group, 'timestamp_str', rows), errors='coerce').to_numpy()
+    # Altes Format ohne timestamp_str: Float-Sekunden (NaN wird zu NaT)
+    return pd.to_datetime(dataset[rows], unit='s').to_numpy()
+
+# Gespeicherte Unix-Timestamps in Ortszeit umwandeln
+def to_local_datetimes(values, unit, timezone):
+    """Wandelt int64-Unix-Timestamps (NaT als kleinster int64-Wert) in datetime64[ns] in der Ortszeit des Exports um."""
+    timestamps = np.asarray(values, dtype=np.int64).astype(f'datetime64[{unit}]').astype('datetime64[ns]')
+    if timezone != 'UTC':
+        # Zurück in die Ortszeit des Exports, damit die Anzeige dem Export entspricht
+        timestamps = pd.DatetimeIndex(timestamps).tz_localize('UTC').tz_convert(timezone).tz_localize(None).to_numpy()
+    return timestamps
+
+# Gelesene Zeilen nach dem gespeicherten Zeitindex ordnen
+def apply_time_order(chat_group, rows, row_chat, labels, columns):
+    """
+    Ordnet die gelesenen Zeilen des Bereichs rows (Slice) nach dem vom Konverter
+    gespeicherten Zeitindex 'time_order', damit build_chat_frame bereits sortierte
+    Blöcke erhält. Dateien ohne Zeitindex bleiben in Dateireihenfolge.
+    """
+    if 'time_order' not in chat_group:
+        return row_chat, labels, columns
+    order = chat_group['time_order'][rows] - (rows.start or 0)
+    return row_chat[order], labels[order], {column: values[order] for column, values in columns.items()}
+
+# String-Dataset lesen
+def read_strings(dataset, rows=slice(None)):
+    """Liest ein String-Dataset (bzw. den Zeilenbereich rows) als Array von str."""
+    string_info = h5py.check_string_dtype(dataset.dtype)
+    with timed_phase("hdf5_read"):
+        raw = dataset[rows]
+    with timed_phase("decode"):
+        if string_info is not None:
+            # Entspricht dataset.asstr()[rows], misst Lesen und Dekodieren aber getrennt
+            values = np.empty(len(raw), dtype=object)
+            values[:] = [value.decode(string_info.encoding) for value in raw]
+            return values
+        return raw.astype(str).astype(object)
+
+# Textspalte lesen (vlen-Strings oder UTF-8-Blob mit Offsets)
+def read_text_column(chat_group, column, rows=slice(None)):
+    """Liest die Textspalte column für rows, unabhängig von ihrer Kodierung in der Datei."""
+    if column in chat_group:
+        return read_strings(chat_group[column], rows)
+    return read_blob_strings(chat_group, column, rows)
+
+# Prüfen, ob eine Textspalte vorhanden ist
+def has_text_column(chat_group, column):
+    return column in chat_group or f'{column}_offsets' in chat_group
+
+# Blob-Spalte lesen
+def read_blob_strings(chat_group, column, rows=slice(None)):
+    """
+    Liest eine Blob-Spalte ('<Spalte>_blob' mit den UTF-8-Bytes aller Texte am Stück,
+    '<Spalte>_offsets' mit den Byte-Offsets, siehe STRING_ENCODING_BLOB im Konverter)
+    für rows (Slice oder sortiertes Array). Ein Bereich wird mit einem Lesezugriff auf
+    Offsets und Bytes gelesen, bei einem Array werden nur die Bytes dieser Zeilen gelesen.
+    Dekodiert wird der ganze Block auf einmal (siehe decode_strings).
+    """
+    offsets_dataset = chat_group[f'{column}_offsets']
+    blob_dataset = chat_group[f'{column}_blob']
+    with timed_phase("hdf5_read"):
+        if isinstance(rows, slice):
+            start, stop, _ = rows.indices(offsets_dataset.shape[0] - 1)
+            offsets = offsets_dataset[start:stop + 1]
+            data = read_blob_bytes(blob_dataset, int(offsets[0]), int(offsets[-1]))
+            offsets = offsets - offsets[0]
         else:
-            structure_info = st.session_state.h5_structure
-        
-        # Lade alle Chats
-        for chat_id in hf.keys():
-            chat_group = hf[chat_id]
-            
-            # Chat-Metadaten aus Attributen holen
-            chat_name = chat_group.attrs.get('chat_name', f"Chat {chat_id}")
-            
-            # Prüfen, ob alle erforderlichen Datenfelder vorhanden sind
+            rows = np.asarray(rows)
+            starts = offsets_dataset[rows] if len(rows) else np.array([], dtype=np.int64)
+            ends = offsets_dataset[rows + 1] if len(rows) else np.array([], dtype=np.int64)
+            parts = [read_blob_bytes(blob_dataset, begin, end) for begin, end in zip(starts.tolist(), ends.tolist())]
+            data = np.concatenate(parts) if parts else np.array([], dtype=np.uint8)
+            offsets = np.concatenate([[0], np.cumsum(ends - starts)])
+    with timed_phase("decode"):
+        if (data >= 0x80).any():
+            # Byte- in Zeichenoffsets umrechnen: UTF-8-Folgebytes (10xxxxxx) beginnen kein Zeichen
+            continuation = np.concatenate([[0], np.cumsum((data & 0xC0) == 0x80)])
+            offsets = offsets - continuation[offsets]
+        return decode_strings(data, offsets)
+
+# Bytebereich eines Blob-Datasets lesen
+def read_blob_bytes(dataset, start, end):
+    """
+    Liest dataset[start:end] eines uint8-Datasets. Zusammenhängend und ungefiltert
+    gespeicherte Datasets (z. B. nach h5repack -l CONTI) werden per Memory-Map gelesen,
+    ohne Kopie durch HDF5.
+    """
+    if end <= start:
+        return np.array([], dtype=np.uint8)
+    file_offset = dataset.id.get_offset() if dataset.chunks is None else None
+    if file_offset is not None:
+        return np.memmap(dataset.file.filename, dtype=np.uint8, mode='r', offset=file_offset,
+                         shape=dataset.shape)[start:end]
+    return dataset[start:end]
+
+# Kategorische Spalte aus Codes und Lookup-Tabelle bauen
+def sorted_categorical(codes, categories):
+    """
+    Baut ein pd.Categorical direkt aus Integer-Codes und einer Tabelle eindeutiger
+    Kategorien. Die Kategorien werden alphabetisch sortiert (Codes werden umgerechnet),
+    damit Sortierung und Auswahllisten wie bei String-Spalten funktionieren.
+    """
+    categories = np.asarray(categories, dtype=object)
+    codes = np.asarray(codes)
+    order = np.argsort(categories, kind='stable')
+    rank = np.empty(len(order), dtype=np.int64)
+    rank[order] = np.arange(len(order))
+    new_codes = np.where(codes >= 0, rank[codes], -1) if len(codes) else codes
+    return pd.Categorical.from_codes(new_codes, categories=categories[order])
+
+# Fingerabdruck einer Datei für Cache-Schlüssel
+def get_file_fingerprint(file_path):
+    """
+    Liefert (absoluter Pfad, Größe, Änderungszeit in ns). Alle Caches des Viewers sind
+    darauf geschlüsselt, damit eine neu geschriebene oder ergänzte Datei sofort neu
+    gelesen wird und eine unveränderte nie.
+    """
+    stat = os.stat(file_path)
+    return (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+
+# H5-Dateien zu einer Pfadeingabe finden
+def resolve_h5_paths(path):
+    """
+    Liefert die sortierten H5-Dateien zu path: eine einzelne Datei, alle *.h5-Dateien eines
+    Verzeichnisses oder die Treffer eines Musters wie 'archiv/2024-*.h5'.
+    """
+    if glob.has_magic(path):
+        paths = glob.glob(path)
+    elif os.path.isdir(path):
+        paths = glob.glob(os.path.join(path, '*.h5'))
+    else:
+        paths = [path]
+    return sorted(path for path in paths if path.endswith('.h5') and os.path.isfile(path))
+
+# H5-Datei zum Lesen öffnen
+def open_h5(file_path):
+    """
+    Öffnet eine H5-Datei lesend im SWMR-Modus, damit auch Dateien gelesen werden können,
+    die der Konverter gerade mit --swmr schreibt; für fertige Dateien ändert das nichts.
+    """
+    return h5py.File(file_path, 'r', swmr=True)
+
+# Chat-Verzeichnis prozessweit cachen
+@st.cache_resource(max_entries=16)
+def get_chat_index(fingerprint):
+    """
+    Liest das Chat-Verzeichnis einmal pro Dateistand; alle Sitzungen teilen sich
+    dasselbe (nicht zu verändernde) Ergebnis, ohne es zu kopieren.
+    """
+    return read_chat_index(fingerprint[0])
+
+# Chat-Verzeichnis einer H5-Datei lesen (nur Metadaten, keine Nachrichten)
+def read_chat_index(file_path):
+    """
+    Liest nur die Chat-Metadaten einer H5-Datei: IDs, Namen, Zähler und wo die
+    Nachrichten eines Chats liegen. Nachrichten werden erst bei Auswahl eines Chats geladen.
+
+    Returns:
+        tuple: (DataFrame mit einer Zeile pro Chat mit Nachrichten, sortiert nach chat_id;
+            Dict mit Layout, Sender-Tabelle (nur Layout 2), Schreibvorgang (ingest_id,
+            ingest_complete), den Zeitgrenzen der Datei,
+            der gespeicherten Strukturübersicht (oder None), den sortierten Kategorien
+            für chat_name und sender_alias und dem Fingerabdruck der Datei)
+    """
+    fingerprint = get_file_fingerprint(file_path)
+    with open_h5(file_path) as hf:
+        if hf.attrs.get('layout_version', 1) >= 2:
+            # Layout 2: Chat-Tabelle mit [start, end)-Offsets in die globalen Spalten
+            chats = hf['chats']
+            # Während einer SWMR-Konvertierung können die Spalten der Chat-Tabelle kurz
+            # unterschiedlich lang sein: nur vollständig sichtbare Chats übernehmen
+            n_chats = min(chats[name].shape[0] for name in ['chat_id', 'chat_name', 'message_count',
+                                                            'unique_sender_count', 'start', 'end'])
+            chat_index = pd.DataFrame({
+                'chat_id': chats['chat_id'].asstr()[:n_chats],
+                'chat_name': chats['chat_name'].asstr()[:n_chats],
+                'message_count': chats['message_count'][:n_chats],
+                'unique_sender_count': chats['unique_sender_count'][:n_chats],
+                'start': chats['start'][:n_chats],
+                'end': chats['end'][:n_chats],
+            })
+            for column in ['first_timestamp', 'last_timestamp']:
+                if column in chats:
+                    dataset = chats[column]
+                    chat_index[column] = to_local_datetimes(dataset[:], dataset.attrs['unit'],
+                                                            dataset.attrs.get('timezone', 'UTC'))
+            chat_index = chat_index[chat_index['end'] <= hf['messages']['timestamp'].shape[0]].copy()
+            # Zeilennummern in /messages dienen als eindeutige Indexwerte
+            chat_index['offset'] = chat_index['start']
+            senders = None
+            if 'sender_code' in hf['messages']:
+                senders = hf['senders']['sender_alias'].asstr()[:]
+            file_info = {'layout': 2, 'senders': senders}
+        else:
+            # Layout 1: eine Gruppe pro Chat, Metadaten stehen in den Attributen
+            rows = []
             required_fields = ['timestamp', 'sender_alias', 'message']
-            if all(field in chat_group for field in required_fields):
-                # Extrahiere Daten aus den Datasets
-                try:
-                    # Zeitstempel-Handling mit Fehlerbehandlung
-                    timestamps = chat_group['timestamp'][:]
-                    if 'timestamp_str' in chat_group:
-                        # Verwende timestamp_str, falls vorhanden (für bessere Lesbarkeit)
-                        timestamp_strings = [ts.decode('utf-8') if isinstance(ts, bytes) else str(ts) 
-                                           for ts in chat_group['timestamp_str'][:]]
-                        timestamps = [pd.to_datetime(ts) for ts in timestamp_strings]
-                    else:
-                        # Konvertiere Unix-Timestamps in datetime-Objekte
-                        timestamps = [pd.to_datetime(ts, unit='s') if not np.isnan(ts) else pd.NaT 
-                                     for ts in timestamps]
-                    
-                    # Lade Sender-Alias-Daten
-                    sender_aliases = [s.decode('utf-8') if isinstance(s, bytes) else str(s) 
-                                     for s in chat_group['sender_alias'][:]]
-                    
-                    # Lade Nachrichteninhalte
-                    messages = [m.decode('utf-8') if isinstance(m, bytes) else str(m) 
-                               for m in chat_group['message'][:]]
-                    
-                    # Erstelle ein DataFrame für den aktuellen Chat
-                    df_data = {
-                        'timestamp': timestamps,
-                        'sender_alias': sender_aliases,
-                        'message': messages
-                    }
-                    
-                    # Lade Message ID, falls vorhanden
-                    if 'message_id' in chat_group:
-                        df_data['message_id'] = chat_group['message_id'][:]
-                    
-                    # Lade DeepL Übersetzung, falls vorhanden
-                    if 'message_deepl' in chat_group:
-                        df_data['message_deepl'] = [m.decode('utf-8') if isinstance(m, bytes) else str(m) 
-                                                  for m in chat_group['message_deepl'][:]]
-                    
-                    # Lade M2M100 Übersetzung, falls vorhanden
-                    if 'message_m2m100' in chat_group:
-                        df_data['message_m2m100'] = [m.decode('utf-8') if isinstance(m, bytes) else str(m) 
-                                                  for m in chat_group['message_m2m100'][:]]
-                    
-                    df = pd.DataFrame(df_data)
-                    
-                    # Chat-Metadaten hinzufügen
-                    df['chat_id'] = chat_id
-                    df['chat_name'] = chat_name
-                    df['file_name'] = os.path.basename(file_path)
-                    
-                    all_data.append(df)
-                    
-                except Exception as e:
-                    st.error(f"Fehler beim Verarbeiten des Chats {chat_id}: {str(e)}")
-    
-    # Fasse alle DataFrames zusammen
-    if all_data:
-        combined_df = pd.concat(all_data, ignore_index=True)
-        return combined_df, structure_info
+            for chat_id, chat_group in hf.items():
+                if not isinstance(chat_group, h5py.Group) or not all(field in chat_group for field in required_fields):
+                    continue
+                rows.append({
+                    'chat_id': chat_id,
+                    'chat_name': chat_group.attrs.get('chat_name', f"Chat {chat_id}"),
+                    'message_count': chat_group.attrs.get('message_count', 0),
+                    'unique_sender_count': chat_group.attrs.get('unique_sender_count', 0),
+                    'start': 0,
+                    'end': chat_group['message'].shape[0],
+                    'first_timestamp': chat_group.attrs.get('first_timestamp', NAT_VALUE),
+                    'last_timestamp': chat_group.attrs.get('last_timestamp', NAT_VALUE),
+                })
+            chat_index = pd.DataFrame(rows, columns=['chat_id', 'chat_name', 'message_count',
+                                                     'unique_sender_count', 'start', 'end',
+                                                     'first_timestamp', 'last_timestamp'])
+            for column in ['first_timestamp', 'last_timestamp']:
+                chat_index[column] = to_local_datetimes(chat_index[column].to_numpy(np.int64),
+                                                        hf.attrs.get('timestamp_unit', 's'), hf.attrs.get('timezone', 'UTC'))
+            # Fortlaufende Zeilennummern in Dateireihenfolge dienen als eindeutige Indexwerte
+            chat_index['offset'] = (chat_index['end'].cumsum() - chat_index['end']).astype(np.int64)
+            file_info = {'layout': 1, 'senders': None}
+
+        # Schreibvorgang, aus dem die Datei stammt, und ob er abgeschlossen ist (fehlt in älteren Dateien)
+        file_info['ingest_id'] = hf.attrs.get('ingest_id')
+        file_info['ingest_complete'] = bool(hf.attrs.get('ingest_complete', True))
+
+        # Vom Konverter gespeicherte Strukturübersicht (fehlt in älteren Dateien)
+        file_info['structure_summary'] = None
+        if 'structure_summary' in hf.attrs:
+            file_info['structure_summary'] = json.loads(hf.attrs['structure_summary'])
+
+        # Zeitgrenzen der ganzen Datei (NaT für Dateien ohne Zeitindex)
+        for key in ['first_timestamp', 'last_timestamp']:
+            file_info[key] = to_local_datetimes([hf.attrs.get(key, NAT_VALUE)], hf.attrs.get('timestamp_unit', 's'),
+                                                hf.attrs.get('timezone', 'UTC'))[0]
+
+    for column in ['first_timestamp', 'last_timestamp']:
+        if column not in chat_index:
+            chat_index[column] = np.full(len(chat_index), np.datetime64('NaT'), dtype='datetime64[ns]')
+    chat_index = chat_index[chat_index['end'] > chat_index['start']]
+    chat_index = chat_index.sort_values('chat_id', kind='stable').reset_index(drop=True)
+
+    # Sortierte Kategorien einmalig bestimmen, damit jeder geladene Chat nur Codes umrechnet
+    chat_index['name_code'], file_info['chat_name_categories'] = pd.factorize(chat_index['chat_name'], sort=True)
+    file_info['fingerprint'] = fingerprint
+    if file_info['senders'] is not None:
+        order = np.argsort(file_info['senders'], kind='stable')
+        file_info['sender_rank'] = np.empty(len(order), dtype=np.int64)
+        file_info['sender_rank'][order] = np.arange(len(order))
+        file_info['sender_categories'] = file_info['senders'][order]
+    return chat_index, file_info
+
+# Nachrichtenspalten eines Zeilenbereichs lesen
+@timed_phase("read_columns")
+def read_message_columns(chat_group, rows, file_info):
+    """Liest die Nachrichtenspalten des Zeilenbereichs rows als Arrays (Sender als Codes der Sender-Tabelle oder Strings)."""
+    columns = {'timestamp': read_timestamps(chat_group, rows)}
+    if file_info['senders'] is not None:
+        columns['sender_code'] = chat_group['sender_code'][rows]
+    else:
+        columns['sender_alias'] = read_strings(chat_group['sender_alias'], rows)
+    columns['message'] = read_text_column(chat_group, 'message', rows)
+    if 'message_id' in chat_group:
+        columns['message_id'] = chat_group['message_id'][rows]
+    for column in TRANSLATION_COLUMNS:
+        if has_text_column(chat_group, column):
+            columns[column] = read_text_column(chat_group, column, rows)
+        elif has_sparse_column(chat_group, column):
+            columns[column] = read_sparse_strings(chat_group, column, rows, file_info)
+    return columns
+
+# Dünn besetzte Spalte mit mindestens einem Text vorhanden?
+def has_sparse_column(chat_group, column):
+    # Im SWMR-Modus legt der Konverter alle dünn besetzten Spalten vorab leer an
+    return f'{column}_rows' in chat_group and chat_group[f'{column}_rows'].shape[0] > 0
+
+# Vorhandene Übersetzungsspalten einer Gruppe (voll oder dünn besetzt)
+def get_translation_columns(chat_group):
+    return [column for column in TRANSLATION_COLUMNS
+            if has_text_column(chat_group, column) or has_sparse_column(chat_group, column)]
+
+# Dünn besetzte Textspalte lesen
+def read_sparse_strings(chat_group, column, rows, file_info):
+    """
+    Liest eine dünn besetzte Spalte ('<Spalte>_rows' mit den Zeilen, '<Spalte>_values' mit
+    den Texten, siehe SPARSE_COLUMNS im Konverter) für rows (Slice oder sortiertes Array).
+    Nur die vorhandenen Texte werden gelesen und dekodiert; alle anderen Zeilen verweisen
+    auf denselben leeren String. Die Zeilenliste wird einmal pro Dateistand gecacht.
+    """
+    cache = get_chat_cache()
+    cache_key = (file_info['fingerprint'], 'sparse_rows', column)
+    sparse_rows = cache.get(cache_key)
+    if sparse_rows is None:
+        with timed_phase("hdf5_read"):
+            sparse_rows = chat_group[f'{column}_rows'][:]
+        cache.put(cache_key, sparse_rows, sparse_rows.nbytes)
+
+    if isinstance(rows, slice):
+        first, last = np.searchsorted(sparse_rows, [rows.start, rows.stop])
+        values = np.full(rows.stop - rows.start, '', dtype=object)
+        if last > first:
+            values[sparse_rows[first:last] - rows.start] = read_text_column(chat_group, f'{column}_values',
+                                                                            slice(int(first), int(last)))
+        return values
+    positions = np.minimum(np.searchsorted(sparse_rows, rows), max(len(sparse_rows) - 1, 0))
+    found = (sparse_rows[positions] == rows) if len(sparse_rows) else np.zeros(len(rows), dtype=bool)
+    values = np.full(len(rows), '', dtype=object)
+    if found.any():
+        values[found] = read_text_column(chat_group, f'{column}_values', positions[found])
+    return values
+
+# Gelesene Spaltenblöcke zu einem DataFrame zusammenfügen
+@timed_phase("build_frame")
+def build_chat_frame(parts, file_path, chat_index, file_info):
+    """
+    Fügt gelesene Blöcke (Chat-Position je Zeile, Indexwerte, Spalten) zu einem DataFrame
+    zusammen, sortiert nach chat_id und Zeitstempel (stabil, NaT zuletzt). Chat, Chatname,
+    Sender und Datei werden als Categoricals mit alphabetisch sortierten Kategorien angelegt.
+    Fehlende Übersetzungen werden mit '' und fehlende message_ids mit -1 aufgefüllt;
+    Textspalten, die in keinem Block gelesen wurden, fehlen im Ergebnis.
+    """
+    row_chat = np.concatenate([part[0] for part in parts])
+    labels = np.concatenate([part[1] for part in parts])
+    timestamps = np.concatenate([part[2]['timestamp'] for part in parts])
+
+    # Stabil nach Chat (Position = Code der sortierten chat_id) und Zeitstempel sortieren
+    sort_keys = timestamps.view(np.int64)
+    sort_keys = np.where(np.isnat(timestamps), np.iinfo(np.int64).max, sort_keys)
+    order = np.lexsort((sort_keys, row_chat))
+    row_chat = row_chat[order]
+
+    def combine(column, fill_value, dtype):
+        if not any(column in part[2] for part in parts):
+            return None
+        values = np.concatenate([part[2][column] if column in part[2] else np.full(len(part[0]), fill_value, dtype=dtype)
+                                 for part in parts])
+        return values[order]
+
+    if file_info['senders'] is not None:
+        sender_aliases = pd.Categorical.from_codes(file_info['sender_rank'][combine('sender_code', -1, np.int64)],
+                                                   categories=file_info['sender_categories'])
+    else:
+        sender_aliases = sorted_categorical(*pd.factorize(combine('sender_alias', '', object)))
+
+    df_data = {
+        'timestamp': timestamps[order],
+        'sender_alias': sender_aliases,
+    }
+    for column, fill_value, dtype in [('message', '', object), ('message_id', -1, np.int64),
+                                      ('message_deepl', '', object), ('message_m2m100', '', object),
+                                      ('row', -1, np.int64)]:
+        values = combine(column, fill_value, dtype)
+        if values is not None:
+            df_data[column] = values
+    df_data['chat_id'] = pd.Categorical.from_codes(row_chat, categories=chat_index['chat_id'].to_numpy())
+    df_data['chat_name'] = pd.Categorical.from_codes(chat_index['name_code'].to_numpy()[row_chat],
+                                                     categories=file_info['chat_name_categories'])
+    df_data['file_name'] = pd.Categorical.from_codes(np.zeros(len(row_chat), dtype=np.int8),
+                                                     categories=[os.path.basename(file_path)])
+    return pd.DataFrame(df_data, index=labels[order])
+
+# Lesevorgänge für "Alle" planen
+def iter_read_batches(chat_index, file_info):
+    """
+    Liefert Leseblöcke (Gruppenname oder None, Zeilenbereich, Chat-Position je Zeile, Indexwerte).
+    In Layout 2 werden in der Datei aufeinanderfolgende Chats zu Blöcken von etwa
+    ALL_CHATS_BATCH_ROWS Zeilen zusammengefasst, in Layout 1 wird jede Chat-Gruppe einzeln gelesen.
+    """
+    if file_info['layout'] < 2:
+        for chat_pos, chat in enumerate(chat_index.itertuples(index=False)):
+            n_rows = chat.end - chat.start
+            yield chat.chat_id, slice(None), np.full(n_rows, chat_pos), chat.offset + np.arange(n_rows)
+        return
+
+    positions = np.argsort(chat_index['start'].to_numpy(), kind='stable')
+    starts = chat_index['start'].to_numpy()[positions]
+    ends = chat_index['end'].to_numpy()[positions]
+    batch_first = 0
+    for i in range(len(positions)):
+        last = i + 1 == len(positions)
+        if last or starts[i + 1] != ends[i] or ends[i] - starts[batch_first] >= ALL_CHATS_BATCH_ROWS:
+            batch_start, batch_end = int(starts[batch_first]), int(ends[i])
+            row_chat = np.repeat(positions[batch_first:i + 1], ends[batch_first:i + 1] - starts[batch_first:i + 1])
+            yield None, slice(batch_start, batch_end), row_chat, np.arange(batch_start, batch_end)
+            batch_first = i + 1
+
+# Speicherbedarf einer Spalte schätzen
+def estimate_column_nbytes(values):
+    """
+    Schätzt den Speicherbedarf einer Series für das Cache-Budget wie memory_usage(deep=True),
+    aber ohne alle Strings zu durchlaufen: Arrays über nbytes, Categoricals über Codes und
+    Kategorien, Objekt-Spalten über eine gleichmäßige Stichprobe von SIZE_SAMPLE_ROWS Zeilen.
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        return values.cat.codes.to_numpy().nbytes + estimate_column_nbytes(pd.Series(values.cat.categories))
+    array = values.to_numpy()
+    if array.dtype != object or not len(array):
+        return array.nbytes
+    sample = array[::max(1, len(array) // SIZE_SAMPLE_ROWS)]
+    return array.nbytes + int(sum(map(sys.getsizeof, sample)) * len(array) / len(sample))
+
+# Speicherbedarf eines DataFrames schätzen
+def estimate_frame_nbytes(df):
+    """Summe von estimate_column_nbytes über alle Spalten plus Index; der Aufwand ist unabhängig von der Zeilenzahl."""
+    return df.index.nbytes + sum(estimate_column_nbytes(df[column]) for column in df.columns)
+
+# LRU-Cache für geladene Chats
+class ChatCache:
+    """
+    Prozessweiter LRU-Cache für geladene Chat-DataFrames mit Speicherbudget in Bytes
+    (andere Werte, etwa gerenderte Nachrichten, brauchen eine explizite Größe).
+    Der zuletzt eingefügte Eintrag bleibt auch dann erhalten, wenn er allein das Budget
+    überschreitet. Die DataFrames werden zwischen Sitzungen geteilt und dürfen nicht
+    verändert werden.
+    """
+    def __init__(self, budget):
+        self.budget = budget
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, size=None):
+        if size is None:
+            size = estimate_frame_nbytes(value)
+        with self.lock:
+            if key in self.entries:
+                self.size -= self.entries.pop(key)[1]
+            self.entries[key] = (value, size)
+            self.size += size
+            # Älteste Einträge verdrängen, bis das Budget wieder eingehalten wird
+            while self.size > self.budget and len(self.entries) > 1:
+                _, (_, evicted_size) = self.entries.popitem(last=False)
+                self.size -= evicted_size
+
+    def clear(self):
+        """Leert den Cache; die Trefferzähler bleiben erhalten."""
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+@st.cache_resource
+def get_chat_cache():
+    """Liefert den prozessweiten Chat-Cache; das Budget kommt aus CHAT_VIEWER_CACHE_MB."""
+    budget_mb = int(os.environ.get("CHAT_VIEWER_CACHE_MB", DEFAULT_CHAT_CACHE_MB))
+    return ChatCache(budget_mb * 1024 * 1024)
+
+# Pfad einer Datei im Festplatten-Cache
+def get_disk_cache_path(file_info, name):
+    """
+    Liefert den Pfad der Cache-Datei name für den aktuellen Stand der H5-Datei oder None,
+    wenn der Festplatten-Cache abgeschaltet ist. Der Dateiname beginnt mit Größe und
+    Änderungszeit; Dateien eines älteren Stands werden beim Speichern entfernt.
+    Neben die H5-Datei wird nur auf ausdrücklichen Wunsch geschrieben, da Datenverzeichnisse
+    oft schreibgeschützt oder geteilt sind.
+    """
+    file_path, size, mtime_ns = file_info['fingerprint']
+    cache_dir = os.environ.get("CHAT_VIEWER_DISK_CACHE_DIR")
+    if cache_dir == "":
+        return None
+    if cache_dir is None and os.environ.get("CHAT_VIEWER_DISK_CACHE_BESIDE_DATA") == "1":
+        cache_dir = file_path + DISK_CACHE_SUFFIX
+    else:
+        if cache_dir is None:
+            user_cache_dir = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+            cache_dir = os.path.join(user_cache_dir, DISK_CACHE_APP_DIR)
+        # Gemeinsames Verzeichnis: ein Unterverzeichnis pro H5-Datei
+        cache_dir = os.path.join(cache_dir, hashlib.sha1(file_path.encode()).hexdigest()[:16])
+    return os.path.join(cache_dir, f"{size}-{mtime_ns}-{name}.npz")
+
+# Strings als UTF-8-Block mit Offsets kodieren (ohne Pickle speicherbar)
+def encode_strings(values):
+    """Kodiert Strings als (uint8-Block, Offsets in Zeichen); values[i] = text[offsets[i]:offsets[i + 1]]."""
+    lengths = np.fromiter(map(len, values), dtype=np.int64, count=len(values))
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+    blob = np.frombuffer("".join(values).encode('utf-8', 'surrogatepass'), dtype=np.uint8)
+    return blob, offsets
+
+# Mit encode_strings kodierte Strings lesen
+def decode_strings(blob, offsets):
+    """Dekodiert einen UTF-8-Block mit Offsets in Zeichen zu einem Array von str."""
+    text = blob.tobytes().decode('utf-8', 'surrogatepass')
+    offsets = offsets.tolist()
+    values = np.empty(len(offsets) - 1, dtype=object)
+    values[:] = [text[start:end] for start, end in zip(offsets[:-1], offsets[1:])]
+    return values
+
+# Geladenes DataFrame im Festplatten-Cache ablegen
+@timed_phase("disk_cache_save")
+def save_frame_to_disk(path, df):
+    """
+    Speichert die dekodierten Spalten eines geladenen DataFrames als unkomprimierte .npz-Datei:
+    Zahlen und Zeitstempel direkt, Categoricals als Codes und Kategorien, Strings als UTF-8-Block
+    mit Offsets. Geschrieben wird über eine temporäre Datei, damit parallele Sitzungen nie eine
+    halbe Datei lesen. Fehler beim Schreiben werden ignoriert; der Cache ist optional.
+    """
+    if path is None:
+        return
+    arrays = {'index': df.index.to_numpy(), 'columns': np.array(df.columns, dtype=str)}
+    for column in df.columns:
+        values = df[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            arrays[f'{column}.codes'] = values.cat.codes.to_numpy()
+            arrays[f'{column}.blob'], arrays[f'{column}.offsets'] = encode_strings(values.cat.categories.to_numpy())
+        elif values.dtype == object:
+            arrays[f'{column}.blob'], arrays[f'{column}.offsets'] = encode_strings(values.to_numpy())
+        else:
+            arrays[column] = values.to_numpy()
+
+    cache_dir, file_name = os.path.split(path)
+    prefix = file_name.split('-', 2)[:2]
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        # Cache-Dateien älterer Stände der H5-Datei entfernen
+        for old_name in os.listdir(cache_dir):
+            if old_name.split('-', 2)[:2] != prefix:
+                os.remove(os.path.join(cache_dir, old_name))
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(temp_path, path)
+    except OSError:
+        pass
+
+# DataFrame aus dem Festplatten-Cache laden
+def load_frame_from_disk(path):
+    """Lädt ein mit save_frame_to_disk gespeichertes DataFrame oder liefert None, wenn es fehlt oder unlesbar ist."""
+    if path is None:
+        return None
+    if not os.path.exists(path):
+        count_event("disk_cache_miss")
+        return None
+    count_event("disk_cache_hit")
+    try:
+        with timed_phase("disk_cache"), np.load(path) as data:
+            df_data = {}
+            for column in data['columns']:
+                if f'{column}.codes' in data:
+                    df_data[column] = pd.Categorical.from_codes(
+                        data[f'{column}.codes'],
+                        categories=decode_strings(data[f'{column}.blob'], data[f'{column}.offsets']))
+                elif f'{column}.blob' in data:
+                    df_data[column] = decode_strings(data[f'{column}.blob'], data[f'{column}.offsets'])
+                else:
+                    df_data[column] = data[column]
+            return pd.DataFrame(df_data, index=data['index'])
+    except (OSError, ValueError, KeyError):
+        return None
+
+# Binäre Suche in mehreren sortierten Abschnitten gleichzeitig
+def segment_searchsorted(keys, starts, ends, value):
+    """
+    Wie np.searchsorted(keys[start:end], value) + start für jeden Abschnitt [start, end),
+    aber vektorisiert über alle Abschnitte (ein Halbierungsschritt pro Durchlauf).
+    """
+    lower = starts.copy()
+    upper = ends.copy()
+    active = lower < upper
+    while active.any():
+        middle = (lower + upper) // 2
+        below = np.zeros(len(lower), dtype=bool)
+        below[active] = keys[middle[active]] < value
+        lower = np.where(active & below, middle + 1, lower)
+        upper = np.where(active & ~below, middle, upper)
+        active = lower < upper
+    return lower
+
+# Puffer mit Reserve vergrößern
+def grow_buffer(buffer, size, needed):
+    """
+    Liefert buffer, wenn er mindestens needed Einträge fasst, sonst einen Puffer doppelter
+    Größe (mindestens needed) mit den ersten size Einträgen von buffer. Angehängte Zeilen
+    kosten so amortisiert O(1); vorhandene Einträge werden nur beim Vergrößern kopiert.
+    """
+    if len(buffer) >= needed:
+        return buffer
+    grown = np.empty(max(needed, 2 * len(buffer)), dtype=buffer.dtype)
+    grown[:size] = buffer[:size]
+    return grown
+
+# Zeilen je Sender für einen Zeilenbereich
+def index_sender_rows(sender_codes, start, end, n_senders):
+    """Liefert (start, end, nach Sender stabil sortierte Zeilennummern in [start, end), Offsets je Sender-Code)."""
+    rows = np.argsort(sender_codes[start:end], kind='stable') + start
+    return start, end, rows, np.searchsorted(sender_codes[rows], np.arange(n_senders + 1))
+
+# Filterindex eines geladenen DataFrames
+class FilterIndex:
+    """
+    Einmal pro geladenem DataFrame berechnete Nachschlagetabellen für die Filter:
+    Zeilenbereich [start, end) je Chat, Zeilen je Sender (nach Sender stabil sortierte
+    Zeilennummern mit Offsets je Sender-Code) und int64-Sortierschlüssel der Zeitstempel
+    (NaT zuletzt). Die geladenen DataFrames sind nach Chat und Zeitstempel sortiert,
+    daher ergibt der Zeitraum pro Chat wieder einen Zeilenbereich.
+    Mit extend wird der Index um hinten angehängte Chats erweitert (siehe LiveFrame). Die
+    Zeilen je Sender liegen dazu in Segmenten aufeinanderfolgender Zeilenbereiche; ein
+    Segment wird mit seinem Vorgänger zusammengelegt, solange dieser höchstens doppelt so
+    groß ist, daher gibt es höchstens log2(Zeilen) Segmente.
+    """
+    @timed_phase("filter_index")
+    def __init__(self, df):
+        self.size = 0
+        self.chat_starts = np.zeros(0, dtype=np.int64)
+        self.chat_ends = np.zeros(0, dtype=np.int64)
+        self.time_keys = np.zeros(0, dtype=np.int64)
+        self.sender_segments = []
+        self.add_rows(df)
+
+    @timed_phase("filter_index")
+    def extend(self, df):
+        """
+        Liefert den Index für df, das aus dem indizierten DataFrame und dahinter angehängten
+        neuen Chats besteht. Nur die neuen Zeilen werden gelesen; self bleibt für das bisherige
+        DataFrame gültig (die Zeitschlüssel teilen sich einen Puffer, geschrieben wird nur
+        hinter dem bisherigen Ende).
+        """
+        extended = copy.copy(self)
+        extended.sender_segments = list(self.sender_segments)
+        extended.add_rows(df)
+        return extended
+
+    def add_rows(self, df):
+        start, end = self.size, len(df)
+        chat_codes = df["chat_id"].cat.codes.to_numpy()[start:]
+        bounds = np.concatenate([[0], np.flatnonzero(chat_codes[1:] != chat_codes[:-1]) + 1, [len(chat_codes)]]) + start
+        self.chat_starts = np.concatenate([self.chat_starts, bounds[:-1]])
+        self.chat_ends = np.concatenate([self.chat_ends, bounds[1:]])
+
+        sender_codes = df["sender_alias"].cat.codes.to_numpy()
+        n_senders = len(df["sender_alias"].cat.categories)
+        self.sender_segments.append(index_sender_rows(sender_codes, start, end, n_senders))
+        while len(self.sender_segments) > 1:
+            previous, last = self.sender_segments[-2:]
+            if previous[1] - previous[0] > 2 * (last[1] - last[0]):
+                break
+            self.sender_segments[-2:] = [index_sender_rows(sender_codes, previous[0], last[1], n_senders)]
+
+        timestamps = df["timestamp"].to_numpy()[start:]
+        self.time_keys = grow_buffer(self.time_keys, start, end)
+        self.time_keys[start:end] = np.where(np.isnat(timestamps), np.iinfo(np.int64).max, timestamps.view(np.int64))
+        self.size = end
+
+    @property
+    def nbytes(self):
+        return sum(array.nbytes for array in [self.chat_starts, self.chat_ends, self.time_keys]) + \
+            sum(rows.nbytes + offsets.nbytes for _, _, rows, offsets in self.sender_segments)
+
+    def sender_rows(self, sender_code):
+        """Aufsteigende Zeilennummern des Senders sender_code über alle Segmente."""
+        parts = [rows[offsets[sender_code]:offsets[sender_code + 1]]
+                 for _, _, rows, offsets in self.sender_segments if sender_code + 1 < len(offsets)]
+        if len(parts) == 1:
+            return parts[0]
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64)
+
+    def filter_rows(self, sender_code=None, start_date=None, end_date=None):
+        """
+        Schneidet Sender-Zeilen und die Zeitbereiche je Chat (vom Beginn von start_date bis
+        zum Ende von end_date). Der Aufwand hängt von der Zahl der Treffer ab.
+
+        Returns:
+            slice oder np.ndarray: Zeilenpositionen der Treffer (Slice für einen
+                zusammenhängenden Bereich, None wenn kein Filter wirkt)
+        """
+        lower, upper = self.chat_starts, self.chat_ends
+        if start_date is not None:
+            lower = segment_searchsorted(self.time_keys, self.chat_starts, self.chat_ends,
+                                         np.datetime64(start_date, 'ns').astype(np.int64))
+            upper = segment_searchsorted(self.time_keys, lower, self.chat_ends,
+                                         np.datetime64(end_date + timedelta(days=1), 'ns').astype(np.int64))
+
+        if sender_code is None:
+            if np.array_equal(lower, self.chat_starts) and np.array_equal(upper, self.chat_ends):
+                return None
+            lengths = upper - lower
+            # Die Bereiche sind aufsteigend; Zeilennummern ohne Maske über das ganze DataFrame
+            rows = np.repeat(lower - np.concatenate([[0], np.cumsum(lengths)[:-1]]), lengths) + np.arange(lengths.sum())
+        else:
+            rows = self.sender_rows(sender_code)
+            chat = np.searchsorted(self.chat_starts, rows, side='right') - 1
+            rows = rows[(rows >= lower[chat]) & (rows < upper[chat])]
+
+        if len(rows) == 0 or rows[-1] - rows[0] + 1 == len(rows):
+            return slice(int(rows[0]), int(rows[-1]) + 1) if len(rows) else slice(0, 0)
+        return rows
+
+    def filter(self, df, sender_code=None, start_date=None, end_date=None):
+        """
+        Wendet filter_rows auf df an: ohne wirksamen Filter wird df selbst geliefert, bei
+        einem zusammenhängenden Bereich eine Slice-Sicht, sonst nur die getroffenen Zeilen.
+        """
+        rows = self.filter_rows(sender_code, start_date, end_date)
+        return df if rows is None else df.iloc[rows]
+
+# Einen Chat laden (aus dem Cache oder der Datei)
+def load_chat(file_path, chat_index, file_info, chat_pos):
+    """
+    Lädt einen einzelnen Chat, sortiert nach Zeitstempel; geladene Chats landen mit ihrem
+    Filterindex im LRU-Cache, größere zusätzlich im Festplatten-Cache.
+
+    Returns:
+        tuple: (DataFrame, FilterIndex)
+    """
+    cache = get_chat_cache()
+    chat = chat_index.iloc[chat_pos]
+    cached = cache.get((file_info['fingerprint'], chat['chat_id']))
+    if cached is None:
+        n_rows = int(chat['end'] - chat['start'])
+        disk_path = get_disk_cache_path(file_info, f"chat-{hashlib.sha1(chat['chat_id'].encode()).hexdigest()[:16]}") \
+            if n_rows >= DISK_CACHE_MIN_ROWS else None
+        df = load_frame_from_disk(disk_path)
+        if df is None:
+            try:
+                with open_h5(file_path) as hf:
+                    chat_group, rows = get_chat_rows(hf, chat_index, file_info, chat_pos)
+                    part = apply_time_order(chat_group, rows, np.full(n_rows, chat_pos), int(chat['offset']) + np.arange(n_rows),
+                                            read_message_columns(chat_group, rows, file_info))
+                df = build_chat_frame([part], file_path, chat_index, file_info)
+            except Exception as e:
+                st.error(f"Fehler beim Verarbeiten des Chats {chat['chat_id']}: {str(e)}")
+                return pd.DataFrame(), None
+            save_frame_to_disk(disk_path, df)
+        filter_index = FilterIndex(df)
+        cached = (df, filter_index)
+        cache.put((file_info['fingerprint'], chat['chat_id']), cached,
+                  estimate_frame_nbytes(df) + filter_index.nbytes)
+    return cached
+
+# Zeilenbereich eines Chats in seinem Dataset
+def get_chat_rows(hf, chat_index, file_info, chat_pos):
+    """Liefert die Gruppe mit den Nachrichtenspalten eines Chats und den Zeilenbereich des Chats darin."""
+    chat = chat_index.iloc[chat_pos]
+    if file_info['layout'] >= 2:
+        return hf['messages'], slice(int(chat['start']), int(chat['end']))
+    return hf[chat['chat_id']], slice(0, int(chat['end']))
+
+# Seitenmodus: nur Zeitstempel und Sender eines Chats laden
+def load_chat_keys(file_path, chat_index, file_info, chat_pos):
+    """
+    Lädt für den Seitenmodus nur Zeitstempel und Sender eines Chats, sortiert nach
+    Zeitstempel, mit der Zeile im Dataset in der Spalte 'row'. Die Nachrichtentexte
+    werden erst seitenweise mit load_page_rows gelesen.
+
+    Returns:
+        tuple: (DataFrame, FilterIndex, Liste der vorhandenen Übersetzungsspalten)
+    """
+    cache = get_chat_cache()
+    chat = chat_index.iloc[chat_pos]
+    cached = cache.get((file_info['fingerprint'], chat['chat_id'], 'keys'))
+    if cached is not None:
+        return cached
+    try:
+        with open_h5(file_path) as hf:
+            chat_group, rows = get_chat_rows(hf, chat_index, file_info, chat_pos)
+            columns = {'timestamp': read_timestamps(chat_group, rows),
+                       'row': np.arange(rows.start, rows.stop)}
+            if file_info['senders'] is not None:
+                columns['sender_code'] = chat_group['sender_code'][rows]
+            else:
+                columns['sender_alias'] = read_strings(chat_group['sender_alias'], rows)
+            translation_columns = get_translation_columns(chat_group)
+            n_rows = rows.stop - rows.start
+            part = apply_time_order(chat_group, rows, np.full(n_rows, chat_pos), int(chat['offset']) + np.arange(n_rows),
+                                    columns)
+        df = build_chat_frame([part], file_path, chat_index, file_info)
+    except Exception as e:
+        st.error(f"Fehler beim Verarbeiten des Chats {chat['chat_id']}: {str(e)}")
+        return pd.DataFrame(), None, []
+    filter_index = FilterIndex(df)
+    cache.put((file_info['fingerprint'], chat['chat_id'], 'keys'), (df, filter_index, translation_columns),
+              estimate_frame_nbytes(df) + filter_index.nbytes)
+    return df, filter_index, translation_columns
+
+# Seitenmodus: nur die sichtbaren Zeilen eines Chats lesen
+def load_page_rows(file_path, chat_index, file_info, chat_pos, rows):
+    """
+    Liest alle Spalten für die Dataset-Zeilen rows (eine Seite aus load_chat_keys).
+    Zusammenhängende Zeilen werden als Bereich gelesen, sonst per Punktauswahl.
+    Das Ergebnis hat dieselben Indexwerte und dieselbe Reihenfolge wie die Seite.
+    """
+    chat = chat_index.iloc[chat_pos]
+    rows = np.sort(rows)
+    if rows[-1] - rows[0] + 1 == len(rows):
+        selection = slice(int(rows[0]), int(rows[-1]) + 1)
+    else:
+        selection = rows
+    with open_h5(file_path) as hf:
+        chat_group, chat_rows = get_chat_rows(hf, chat_index, file_info, chat_pos)
+        columns = read_message_columns(chat_group, selection, file_info)
+    labels = int(chat['offset']) + rows - chat_rows.start
+    return build_chat_frame([(np.full(len(rows), chat_pos), labels, columns)], file_path, chat_index, file_info)
+
+# Alle Chats schrittweise laden
+def load_all_chats(file_path, chat_index, file_info, show_progress=True):
+    """
+    Lädt alle Chats blockweise (mit Fortschrittsanzeige, wenn show_progress) und fasst sie,
+    nach chat_id und Zeitstempel sortiert, zu einem DataFrame zusammen, das mit seinem
+    Filterindex ebenfalls im LRU-Cache und im Festplatten-Cache landet. Für eine Datei,
+    die gerade geschrieben wird, werden nur die neuen Chats gelesen (siehe LiveFrame).
+
+    Returns:
+        tuple: (DataFrame, FilterIndex)
+    """
+    cache = get_chat_cache()
+    cached = cache.get((file_info['fingerprint'], None))
+    if cached is not None:
+        return cached
+    loaded = read_new_chats(file_path, chat_index, file_info)
+    if loaded is None:
+        disk_path = get_disk_cache_path(file_info, "all")
+        combined_df = load_frame_from_disk(disk_path)
+        if combined_df is None:
+            combined_df = read_all_chats(file_path, chat_index, file_info, show_progress)
+            if combined_df.empty:
+                return combined_df, None
+            # Zwischenstände einer Datei, die gerade geschrieben wird, nicht auf die Festplatte legen
+            if file_info['ingest_complete']:
+                save_frame_to_disk(disk_path, combined_df)
+        loaded = remember_live_frame(chat_index, file_info, combined_df)
+    combined_df, filter_index = loaded
+    cache.put((file_info['fingerprint'], None), (combined_df, filter_index),
+              estimate_frame_nbytes(combined_df) + filter_index.nbytes)
+    return combined_df, filter_index
+
+# Wachsender "Alle"-Stand einer Datei, die gerade geschrieben wird
+class LiveFrame:
+    """
+    "Alle"-Stand einer Datei, in die der Konverter gerade schreibt (--swmr). Die Spalten
+    liegen in Puffern mit Reserve (siehe grow_buffer); neu veröffentlichte Chats werden
+    hinten angehängt, frame ist eine Sicht auf die gefüllten Zeilen und filter_index wird
+    nur um die neuen Zeilen erweitert. Bereits geladene Zeilen werden dabei weder gelesen,
+    kopiert noch neu sortiert (außer beim Vergrößern eines Puffers), ein Nachladen kostet
+    amortisiert O(neue Zeilen).
+    Anders als beim vollständigen Laden stehen neue Chats deshalb hinter den bisherigen
+    statt alphabetisch einsortiert, und Categoricals erhalten neue Kategorien hinten
+    angehängt, damit die Codes vorhandener Zeilen gültig bleiben. Frühere Stände
+    (frame, filter_index) bleiben gültig, da nur hinter ihrem Ende geschrieben wird.
+    """
+    def __init__(self, ingest_id, chats, rows, df):
+        self.ingest_id = ingest_id
+        self.size = 0
+        self.labels = np.zeros(2 * len(df), dtype=np.int64)
+        self.columns = {}
+        self.categories = {}
+        self.frame = None
+        self.filter_index = None
+        self.append(df, chats, rows)
+
+    def append(self, df, chats, rows):
+        """Hängt die Zeilen von df (neue Chats, sortiert wie build_chat_frame) an; chats und rows beschreiben den neuen Stand."""
+        self.chats = chats
+        self.rows = rows
+        if df.empty:
+            return
+        start, end = self.size, self.size + len(df)
+        self.labels = grow_buffer(self.labels, start, end)
+        self.labels[start:end] = df.index.to_numpy()
+        for column in FRAME_COLUMNS:
+            if column in df or column in self.columns:
+                self.append_column(column, df[column] if column in df else None, start, end)
+        self.size = end
+
+        frame_data = {}
+        for column in FRAME_COLUMNS:
+            if column in self.categories:
+                frame_data[column] = pd.Categorical.from_codes(self.columns[column][:end], self.categories[column],
+                                                               validate=False)
+            elif column in self.columns:
+                frame_data[column] = self.columns[column][:end]
+        self.frame = pd.DataFrame(frame_data, index=self.labels[:end], copy=False)
+        self.filter_index = FilterIndex(self.frame) if self.filter_index is None \
+            else self.filter_index.extend(self.frame)
+
+    def append_column(self, column, values, start, end):
+        if values is not None and isinstance(values.dtype, pd.CategoricalDtype):
+            # Kategorien von values auf die (hinten erweiterten) Kategorien des Stands abbilden
+            categories = self.categories.get(column, pd.Index([], dtype=object))
+            mapping = categories.get_indexer(values.cat.categories)
+            missing = mapping < 0
+            if missing.any():
+                mapping[missing] = len(categories) + np.arange(missing.sum())
+                categories = categories.append(values.cat.categories[missing])
+                self.categories[column] = categories
+            codes = values.cat.codes.to_numpy()
+            values = np.where(codes < 0, -1, mapping[codes])
+            # Codes im Datentyp, den pandas für so viele Kategorien verwendet (sonst kopiert from_codes)
+            dtype = next((dtype for dtype in (np.int8, np.int16, np.int32) if len(categories) < np.iinfo(dtype).max),
+                         np.int64)
+            fill_value = -1
+        elif values is not None:
+            values = values.to_numpy()
+            dtype = values.dtype
+            fill_value = -1 if dtype == np.int64 else ''
+        else:
+            dtype = self.columns[column].dtype
+            fill_value = -1 if column in self.categories or dtype == np.int64 else ''
+
+        buffer = self.columns.get(column)
+        if buffer is None:
+            # Spalte erscheint erst jetzt (etwa die erste Übersetzung): bisherige Zeilen auffüllen
+            buffer = np.empty(max(end, len(self.labels)), dtype=dtype)
+            buffer[:start] = fill_value
+        elif buffer.dtype != dtype:
+            buffer = buffer.astype(dtype)
+        buffer = grow_buffer(buffer, start, end)
+        buffer[start:end] = fill_value if values is None else values
+        self.columns[column] = buffer
+
+# Zuletzt geladene Stände wachsender Dateien
+@st.cache_resource
+def get_live_frames():
+    """
+    Liefert das prozessweite Dict absoluter Pfad -> LiveFrame mit dem zuletzt geladenen
+    "Alle"-Stand jeder Datei, die gerade geschrieben wird, und eine Sperre, unter der die
+    Stände erweitert werden. Pro Datei wird nur ein Stand gehalten; fertige Dateien werden
+    entfernt und unterliegen nur dem Budget des Chat-Caches.
+    """
+    return {}, threading.Lock()
+
+# Geladenen "Alle"-Stand für das inkrementelle Nachladen merken
+def remember_live_frame(chat_index, file_info, combined_df):
+    """Liefert (DataFrame, FilterIndex) für combined_df; wird die Datei noch geschrieben, als LiveFrame."""
+    live_frames, lock = get_live_frames()
+    if file_info.get('ingest_id') is None or file_info['ingest_complete']:
+        # Fertige Datei: der letzte Zwischenstand wird nicht mehr gebraucht
+        with lock:
+            live_frames.pop(file_info['fingerprint'][0], None)
+        return combined_df, FilterIndex(combined_df)
+    chats = set(zip(chat_index['chat_id'], chat_index['start'].tolist(), chat_index['end'].tolist()))
+    rows = int(chat_index['end'].max()) if len(chat_index) else 0
+    live = LiveFrame(file_info['ingest_id'], chats, rows, combined_df)
+    with lock:
+        live_frames[file_info['fingerprint'][0]] = live
+    return live.frame, live.filter_index
+
+# Nur die seit dem letzten Stand hinzugekommenen Chats lesen
+@timed_phase("read_new_chats")
+def read_new_chats(file_path, chat_index, file_info):
+    """
+    Liefert (DataFrame, FilterIndex) für "Alle" einer Datei, in die der Konverter gerade
+    schreibt (--swmr): der zuletzt geladene Stand (siehe LiveFrame) wird um die seither
+    veröffentlichten Chats erweitert, statt die ganze Datei neu zu lesen. Das geht nur,
+    solange die Datei vom selben Schreibvorgang stammt (Attribut ingest_id), noch nicht
+    abgeschlossen ist und alle bekannten Chats unverändert sind; sonst liefert die Funktion
+    None. Die fertige Datei wird einmal vollständig und sortiert gelesen.
+    """
+    if file_info.get('ingest_id') is None or file_info['ingest_complete']:
+        return None
+    live_frames, lock = get_live_frames()
+    with lock:
+        live = live_frames.get(file_info['fingerprint'][0])
+        if live is None or live.ingest_id != file_info['ingest_id']:
+            return None
+        chats = set(zip(chat_index['chat_id'], chat_index['start'].tolist(), chat_index['end'].tolist()))
+        if not live.chats <= chats:
+            return None
+        new_index = chat_index[chat_index['start'] >= live.rows].reset_index(drop=True)
+        if not new_index.empty:
+            new_df = read_all_chats(file_path, new_index, file_info, show_progress=False)
+            live.append(new_df, chats, int(chat_index['end'].max()))
+        return live.frame, live.filter_index
+
+# Alle Chats blockweise aus der H5-Datei lesen
+def read_all_chats(file_path, chat_index, file_info, show_progress=True):
+    """Liest alle Chats blockweise (siehe iter_read_batches), optional mit Fortschrittsanzeige, und baut daraus ein DataFrame."""
+    parts = []
+    total_rows = int((chat_index['end'] - chat_index['start']).sum())
+    loaded_rows = 0
+    progress = st.progress(0.0, text="Lade Chats ...") if show_progress else None
+    with open_h5(file_path) as hf:
+        for group_name, rows, row_chat, labels in iter_read_batches(chat_index, file_info):
+            chat_group = hf['messages'] if group_name is None else hf[group_name]
+            try:
+                parts.append(apply_time_order(chat_group, rows, row_chat, labels,
+                                              read_message_columns(chat_group, rows, file_info)))
+            except Exception as e:
+                st.error(f"Fehler beim Verarbeiten der Chats {', '.join(chat_index['chat_id'].iloc[np.unique(row_chat)])}: {str(e)}")
+            loaded_rows += len(row_chat)
+            if progress is not None:
+                progress.progress(loaded_rows / total_rows, text=f"Lade Chats ... {loaded_rows}/{total_rows} Nachrichten")
+    if progress is not None:
+        progress.empty()
+
+    if not parts:
+        return pd.DataFrame()
+    return build_chat_frame(parts, file_path, chat_index, file_info)
+
+# Aufgaben im Thread-Pool ausführen
+def run_parallel(function, items, progress_text=None):
+    """
+    Führt function für alle items in einem Thread-Pool (CHAT_VIEWER_READ_THREADS Threads)
+    aus und liefert die Ergebnisse in Eingabereihenfolge. Die Threads erhalten den
+    Streamlit-Kontext der Sitzung, damit Caches und Fehlermeldungen wie im Hauptthread
+    funktionieren; eine Fortschrittsanzeige (progress_text) aktualisiert nur der Hauptthread.
+    """
+    items = list(items)
+    if len(items) <= 1:
+        return [function(item) for item in items]
+    threads = int(os.environ.get("CHAT_VIEWER_READ_THREADS", DEFAULT_READ_THREADS))
+    results = [None] * len(items)
+    progress = st.progress(0.0, text=progress_text) if progress_text else None
+    with ThreadPoolExecutor(max_workers=max(threads, 1), initializer=add_script_run_ctx,
+                            initargs=(None, get_script_run_ctx(suppress_warning=True))) as executor:
+        futures = {executor.submit(function, item): i for i, item in enumerate(items)}
+        for done, future in enumerate(as_completed(futures), 1):
+            results[futures[future]] = future.result()
+            if progress is not None:
+                progress.progress(done / len(items), text=f"{progress_text} {done}/{len(items)}")
+    if progress is not None:
+        progress.empty()
+    return results
+
+# Chat-Verzeichnis eines Archivs aus mehreren H5-Dateien
+@st.cache_resource(max_entries=16)
+def get_archive_index(fingerprints):
+    """
+    Liest die Chat-Verzeichnisse aller Dateien eines Archivs (z. B. einer Datei pro Monat)
+    parallel und fasst sie zu einer Zeile pro chat_id zusammen. Jede Datei wird über
+    get_chat_index einzeln pro Dateistand gecacht; kommt eine Datei hinzu, werden nur
+    deren Metadaten gelesen. Nicht lesbare Dateien werden übersprungen.
+
+    Returns:
+        tuple: (DataFrame wie bei read_chat_index mit über die Dateien summierten Zählern
+            und Zeilen; Dict mit 'members' (pro Datei Pfad, Chat-Verzeichnis, file_info und
+            Basis sowie Anzahl ihrer Indexwerte), 'skipped' (Pfad und Fehlermeldung), der
+            vereinigten Sender-Tabelle (None, wenn eine Datei keine hat), den Zeitgrenzen und
+            den Fingerabdrücken aller Dateien)
+    """
+    def read_member(fingerprint):
+        try:
+            return get_chat_index(fingerprint)
+        except Exception as e:
+            return e
+
+    members = []
+    skipped = []
+    label_base = 0
+    for fingerprint, result in zip(fingerprints, run_parallel(read_member, fingerprints)):
+        if isinstance(result, Exception):
+            skipped.append((fingerprint[0], str(result)))
+            continue
+        member_index, member_info = result
+        # Indexwerte jeder Datei werden um die Summe der vorherigen verschoben und bleiben eindeutig
+        label_count = 0
+        if len(member_index):
+            label_count = int((member_index['offset'] + member_index['end'] - member_index['start']).max())
+        members.append({'path': fingerprint[0], 'chat_index': member_index, 'file_info': member_info,
+                        'label_base': label_base, 'label_count': label_count})
+        label_base += label_count
+
+    parts = [member['chat_index'].assign(rows=member['chat_index']['end'] - member['chat_index']['start'])
+             for member in members]
+    if not parts:
+        parts = [pd.DataFrame({'chat_id': pd.Series(dtype=object), 'chat_name': pd.Series(dtype=object),
+                               'message_count': pd.Series(dtype=np.int64),
+                               'unique_sender_count': pd.Series(dtype=np.int64), 'rows': pd.Series(dtype=np.int64),
+                               'first_timestamp': pd.Series(dtype='datetime64[ns]'),
+                               'last_timestamp': pd.Series(dtype='datetime64[ns]')})]
+    chat_index = pd.concat(parts, ignore_index=True).groupby('chat_id', sort=True).agg(
+        chat_name=('chat_name', 'last'), message_count=('message_count', 'sum'),
+        unique_sender_count=('unique_sender_count', 'max'), end=('rows', 'sum'),
+        first_timestamp=('first_timestamp', 'min'), last_timestamp=('last_timestamp', 'max')).reset_index()
+    chat_index['start'] = 0
+    chat_index['offset'] = 0
+    chat_index['name_code'], chat_name_categories = pd.factorize(chat_index['chat_name'], sort=True)
+
+    senders = None
+    if members and all(member['file_info']['senders'] is not None for member in members):
+        senders = np.unique(np.concatenate([member['file_info']['senders'] for member in members]))
+    file_info = {'layout': min((member['file_info']['layout'] for member in members), default=2),
+                 'members': members, 'skipped': skipped, 'senders': senders, 'structure_summary': None,
+                 'chat_name_categories': chat_name_categories, 'fingerprint': fingerprints}
+    # Zeitgrenzen nur, wenn jede Datei welche hat (sonst wie bei älteren Dateien aus den Nachrichten)
+    for key, reduce in [('first_timestamp', min), ('last_timestamp', max)]:
+        values = [member['file_info'][key] for member in members]
+        file_info[key] = np.datetime64('NaT', 'ns') if not values or any(pd.isna(values)) else reduce(values)
+    return chat_index, file_info
+
+# DataFrames mehrerer Dateien zu einer Ansicht zusammenführen
+@timed_phase("merge_frames")
+def merge_frames(frames):
+    """
+    Führt die DataFrames mehrerer Dateien (Liste von (DataFrame, Basis der Indexwerte))
+    zusammen, sortiert wie build_chat_frame nach chat_id und Zeitstempel (stabil, bei
+    gleichem Zeitstempel in Dateireihenfolge). Categoricals erhalten die vereinigten,
+    sortierten Kategorien; fehlende Übersetzungen werden mit '' und fehlende message_ids
+    mit -1 aufgefüllt.
+    """
+    frames = [(df, base) for df, base in frames if not df.empty]
+    if not frames:
+        return pd.DataFrame()
+    df_data = {}
+    for column in FRAME_COLUMNS:
+        if not any(column in df for df, _ in frames):
+            continue
+        if column in ('sender_alias', 'chat_id', 'chat_name', 'file_name'):
+            df_data[column] = union_categoricals([df[column] for df, _ in frames], sort_categories=True)
+        else:
+            fill_value, dtype = (-1, np.int64) if column == 'message_id' else ('', object)
+            df_data[column] = np.concatenate([df[column].to_numpy() if column in df
+                                              else np.full(len(df), fill_value, dtype=dtype) for df, _ in frames])
+    labels = np.concatenate([df.index.to_numpy() + base for df, base in frames])
+
+    timestamps = df_data['timestamp']
+    sort_keys = np.where(np.isnat(timestamps), np.iinfo(np.int64).max, timestamps.view(np.int64))
+    order = np.lexsort((sort_keys, df_data['chat_id'].codes))
+    return pd.DataFrame({column: values[order] for column, values in df_data.items()}, index=labels[order])
+
+# Alle Chats eines Archivs laden
+def load_archive_all(file_info):
+    """
+    Lädt alle Chats aller Dateien eines Archivs parallel (pro Datei wie load_all_chats,
+    also einzeln im LRU- und Festplatten-Cache) und führt sie zu einem DataFrame zusammen,
+    das mit seinem Filterindex im LRU-Cache landet.
+
+    Returns:
+        tuple: (DataFrame, FilterIndex)
+    """
+    cache = get_chat_cache()
+    cached = cache.get((file_info['fingerprint'], None))
+    if cached is not None:
+        return cached
+    members = file_info['members']
+    frames = run_parallel(lambda member: load_all_chats(member['path'], member['chat_index'], member['file_info'],
+                                                        show_progress=False)[0],
+                          members, progress_text="Lade Dateien ...")
+    combined_df = merge_frames([(df, member['label_base']) for df, member in zip(frames, members)])
+    if combined_df.empty:
+        return combined_df, None
+    filter_index = FilterIndex(combined_df)
+    cache.put((file_info['fingerprint'], None), (combined_df, filter_index),
+              estimate_frame_nbytes(combined_df) + filter_index.nbytes)
+    return combined_df, filter_index
+
+# Einen Chat aus allen Dateien eines Archivs laden
+def load_archive_chat(file_info, chat_id):
+    """
+    Lädt den Chat chat_id parallel aus allen Dateien des Archivs, die ihn enthalten (pro
+    Datei wie load_chat), und führt die Teile zusammen.
+
+    Returns:
+        tuple: (DataFrame, FilterIndex)
+    """
+    cache = get_chat_cache()
+    cached = cache.get((file_info['fingerprint'], chat_id))
+    if cached is not None:
+        return cached
+    tasks = []
+    for member in file_info['members']:
+        positions = np.flatnonzero(member['chat_index']['chat_id'].to_numpy() == chat_id)
+        if len(positions):
+            tasks.append((member, int(positions[0])))
+    frames = run_parallel(lambda task: load_chat(task[0]['path'], task[0]['chat_index'], task[0]['file_info'],
+                                                 task[1])[0], tasks)
+    combined_df = merge_frames([(df, member['label_base']) for df, (member, _) in zip(frames, tasks)])
+    if combined_df.empty:
+        return combined_df, None
+    filter_index = FilterIndex(combined_df)
+    cache.put((file_info['fingerprint'], chat_id), (combined_df, filter_index),
+              estimate_frame_nbytes(combined_df) + filter_index.nbytes)
+    return combined_df, filter_index
+
+# Suchindex der Datei laden (vom Konverter mit --search-index angelegt)
+@st.cache_resource(max_entries=16)
+def get_search_index(fingerprint):
+    """
+    Lädt die sortierten n-Gramm-Schlüssel und Offsets aller Segmente des Suchindex pro
+    Textspalte (einmal pro Dateistand, siehe get_file_fingerprint). Die Zeilenlisten werden
+    erst pro Suchanfrage gelesen. Dateien aus älteren Konvertern ohne Segmente haben einen
+    einzigen Index direkt in der Spaltengruppe. Liefert None ohne Index.
+    """
+    with open_h5(fingerprint[0]) as hf:
+        if 'search_index' not in hf:
+            return None
+        index_group = hf['search_index']
+        columns = {}
+        for column, column_group in index_group.items():
+            if 'segments' in column_group:
+                segment_groups = [column_group['segments'][str(i)] for i in range(len(column_group['segments']))]
+            else:
+                segment_groups = [column_group]
+            columns[column] = {
+                'segments': [{'path': segment_group.name,
+                              'keys': segment_group['keys'][:],
+                              'offsets': segment_group['offsets'][:]} for segment_group in segment_groups],
+                'row_count': int(column_group.attrs['row_count']),
+            }
+        return {'ngram': int(index_group.attrs['ngram']), 'columns': columns}
+
+# n-Gramm-Schlüssel eines Suchbegriffs (gleiche Kodierung wie im Konverter)
+def query_ngram_keys(search_query, n):
+    """Zerlegt den casefoldeten Suchbegriff in n-Gramme und kodiert sie als int64 (21 Bit pro Codepunkt)."""
+    codes = [ord(char) for char in search_query.casefold()]
+    keys = set()
+    for i in range(len(codes) - n + 1):
+        key = 0
+        for code in codes[i:i + n]:
+            key = (key << 21) | code
+        keys.add(key)
+    return np.array(sorted(keys), dtype=np.int64)
+
+# Kandidatenzeilen eines Segments des Suchindex bestimmen
+def find_segment_candidates(hf, segment, keys):
+    """
+    Schneidet die Zeilenlisten aller n-Gramme des Suchbegriffs in einem Segment.
+    Liefert None, wenn mindestens ein n-Gramm im Segment nicht vorkommt.
+    """
+    index_keys = segment['keys']
+    offsets = segment['offsets']
+    positions = np.searchsorted(index_keys, keys)
+    if (positions >= len(index_keys)).any() or (index_keys[np.minimum(positions, len(index_keys) - 1)] != keys).any():
+        return None
+    rows_dataset = hf[segment['path']]['rows']
+    # Kürzeste Zeilenlisten zuerst schneiden
+    segment_rows = None
+    for position in sorted(positions, key=lambda p: offsets[p + 1] - offsets[p]):
+        rows = rows_dataset[offsets[position]:offsets[position + 1]]
+        segment_rows = rows if segment_rows is None else np.intersect1d(segment_rows, rows, assume_unique=True)
+        if not len(segment_rows):
+            break
+    return segment_rows
+
+# Kandidatenzeilen einer Suche über den Suchindex bestimmen
+def find_search_candidates(file_path, search_index, search_query, columns):
+    """
+    Bestimmt die Zeilen, die in mindestens einer der Spalten alle n-Gramme des
+    Suchbegriffs enthalten. Die Kandidaten müssen anschließend noch geprüft werden.
+
+    Returns:
+        tuple: (sortierte Kandidatenzeilen, erste nicht indizierte Zeile) oder None, wenn
+            der Index die Suche nicht eingrenzen kann (kein Index, Suchbegriff kürzer als
+            ein n-Gramm oder Spalte ohne Index)
+    """
+    if search_index is None:
+        return None
+    keys = query_ngram_keys(search_query, search_index['ngram'])
+    if not len(keys) or any(column not in search_index['columns'] for column in columns):
+        return None
+
+    candidates = []
+    with open_h5(file_path) as hf:
+        for column in columns:
+            # Die Segmente decken aufeinanderfolgende Zeilenbereiche ab
+            for segment in search_index['columns'][column]['segments']:
+                segment_rows = find_segment_candidates(hf, segment, keys)
+                if segment_rows is not None:
+                    candidates.append(segment_rows)
+
+    candidate_rows = np.unique(np.concatenate(candidates)) if candidates else np.array([], dtype=np.int64)
+    return candidate_rows, min(search_index['columns'][column]['row_count'] for column in columns)
+
+# Suchanfrage zerlegen
+def parse_search_query(search_query):
+    """
+    Zerlegt eine Suchanfrage in UND-verknüpfte Klauseln aus ODER-verknüpften Begriffen.
+    Begriffe sind Wörter oder "Phrasen in Anführungszeichen"; OR (oder |) verbindet
+    benachbarte Begriffe, NOT oder ein vorangestelltes - verneint den folgenden Begriff.
+    Beispiel: 'treffen "am montag" OR dienstag -abgesagt'. Alle Begriffe werden casefoldet.
+
+    Returns:
+        list: Klauseln als Listen von (verneint, Begriff)
+    """
+    clauses = []
+    negate_next = False
+    join_next = False
+    for sign, phrase, word in re.findall(r'(-?)"([^"]*)"?|(\S+)', search_query):
+        if word in ('OR', '|'):
+            join_next = True
+            continue
+        if word == 'NOT':
+            negate_next = True
+            continue
+        if word:
+            negated = word.startswith('-') and len(word) > 1
+            term = word[1:] if negated else word
+        else:
+            negated, term = bool(sign), phrase
+        literal = (negated or negate_next, term.casefold())
+        negate_next = False
+        if not term:
+            continue
+        if join_next and clauses:
+            clauses[-1].append(literal)
+        else:
+            clauses.append([literal])
+        join_next = False
+    return clauses
+
+# Kandidaten einer zerlegten Suchanfrage aus dem Suchindex
+def find_query_candidates(file_path, search_index, clauses, columns):
+    """
+    Schneidet die Kandidaten aller Klauseln, die nur unverneinte, indizierbare Begriffe
+    enthalten (ODER innerhalb einer Klausel: Vereinigung). Liefert None, wenn keine
+    Klausel den Index nutzen kann; sonst wie find_search_candidates.
+    """
+    candidate_rows = None
+    unindexed_from = None
+    for clause in clauses:
+        if any(negated for negated, _ in clause):
+            continue
+        term_candidates = [find_search_candidates(file_path, search_index, term, columns) for _, term in clause]
+        if any(candidates is None for candidates in term_candidates):
+            continue
+        rows = np.unique(np.concatenate([candidates[0] for candidates in term_candidates]))
+        unindexed_from = term_candidates[0][1]
+        candidate_rows = rows if candidate_rows is None else np.intersect1d(candidate_rows, rows, assume_unique=True)
+    return None if candidate_rows is None else (candidate_rows, unindexed_from)
+
+# Kandidaten des Suchindex als Maske über Indexwerte
+def find_candidate_mask(file_path, file_info, clauses, columns, labels):
+    """
+    Markiert die Indexwerte labels, die laut Suchindex Treffer sein können; Zeilen hinter
+    dem indizierten Bereich bleiben immer Kandidaten. In einem Archiv wird jede Datei mit
+    ihrem eigenen Index geprüft, Dateien ohne Index liefern alle ihre Zeilen. Liefert None,
+    wenn kein Index die Suche eingrenzen kann.
+    """
+    if 'members' in file_info:
+        mask = np.ones(len(labels), dtype=bool)
+        narrowed = False
+        for member in file_info['members']:
+            in_member = (labels >= member['label_base']) & (labels < member['label_base'] + member['label_count'])
+            if not in_member.any():
+                continue
+            member_mask = find_candidate_mask(member['path'], member['file_info'], clauses, columns,
+                                              labels[in_member] - member['label_base'])
+            if member_mask is not None:
+                mask[in_member] = member_mask
+                narrowed = True
+        return mask if narrowed else None
+    if file_info['layout'] < 2 or not clauses:
+        return None
+    candidates = find_query_candidates(file_path, get_search_index(file_info['fingerprint']), clauses, columns)
+    if candidates is None:
+        return None
+    # Indexwerte sind Zeilen in /messages
+    candidate_rows, unindexed_from = candidates
+    return np.isin(labels, candidate_rows) | (labels >= unindexed_from)
+
+# Casefoldete Textspalte eines geladenen DataFrames
+def get_casefolded_column(frame_key, df, column):
+    """Liefert die casefoldete Spalte column von df; sie wird einmal pro geladenem DataFrame berechnet und gecacht."""
+    cache = get_chat_cache()
+    values = cache.get(frame_key + ('casefold', column))
+    if values is None:
+        values = np.empty(len(df), dtype=object)
+        values[:] = [text.casefold() for text in df[column].to_numpy()]
+        cache.put(frame_key + ('casefold', column), values, estimate_column_nbytes(pd.Series(values, copy=False)))
+    return values
+
+# Nachrichten durchsuchen
+def search_messages(file_path, file_info, frame_key, df, filter_index, filter_state, search_query, columns,
+                    use_regex=False):
+    """
+    Durchsucht die Spalten columns der gefilterten Zeilen von df (filter_state = Argumente
+    für FilterIndex.filter_rows). Ohne use_regex gilt die Syntax von parse_search_query und
+    verglichen wird mit casefoldeten Spalten (Kandidaten aus dem Suchindex, wenn vorhanden);
+    mit use_regex ist die Anfrage ein regulärer Ausdruck ohne Beachtung der Groß-/Kleinschreibung.
+    Ergebnisse werden pro (Anfrage, Filterzustand) gecacht, Blättern löst keine neue Suche aus.
+
+    Returns:
+        tuple: (Indexwerte der Treffer in Reihenfolge von df, dieselben Indexwerte sortiert)
+    """
+    cache = get_chat_cache()
+    cache_key = frame_key + ('search', search_query, use_regex, tuple(columns), filter_state)
+    cached = cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    rows = filter_index.filter_rows(*filter_state)
+    positions = np.arange(len(df)) if rows is None else np.arange(len(df))[rows]
+    labels = df.index.to_numpy()
+    if not columns:
+        positions = positions[:0]
+    elif use_regex:
+        pattern = re.compile(search_query, re.IGNORECASE)
+        found = np.zeros(len(positions), dtype=bool)
+        for column in columns:
+            found |= np.fromiter((pattern.search(text) is not None for text in df[column].to_numpy()[positions]),
+                                 dtype=bool, count=len(positions))
+        positions = positions[found]
     else:
-        return pd.DataFrame(), structure_info
+        clauses = parse_search_query(search_query)
+        candidate_mask = find_candidate_mask(file_path, file_info, clauses, columns, labels[positions])
+        if candidate_mask is not None:
+            # Mit Suchindex nur Kandidatenzeilen prüfen
+            positions = positions[candidate_mask]
+            texts = {}
+            for column in columns:
+                texts[column] = np.empty(len(positions), dtype=object)
+                texts[column][:] = [text.casefold() for text in df[column].to_numpy()[positions]]
+        else:
+            texts = {column: get_casefolded_column(frame_key, df, column)[positions] for column in columns}
+        if not clauses:
+            positions = positions[:0]
+        # Klausel für Klausel nur noch die verbliebenen Zeilen prüfen
+        for clause in clauses:
+            clause_found = np.zeros(len(positions), dtype=bool)
+            for negated, term in clause:
+                found = np.zeros(len(positions), dtype=bool)
+                for column in columns:
+                    found |= np.fromiter((term in text for text in texts[column]), dtype=bool, count=len(positions))
+                clause_found |= ~found if negated else found
+            positions = positions[clause_found]
+            texts = {column: values[clause_found] for column, values in texts.items()}
+
+    result = (labels[positions], np.sort(labels[positions]))
+    cache.put(cache_key, result, result[0].nbytes * 2)
+    return result
+
+# Muster zum Hervorheben der Suchbegriffe
+def build_highlight_pattern(search_query, use_regex=False):
+    """Liefert ein Regex-Muster für die hervorzuhebenden Stellen (unverneinte Begriffe bzw. der reguläre Ausdruck) oder None."""
+    if not search_query:
+        return None
+    if use_regex:
+        return re.compile(search_query, re.IGNORECASE)
+    terms = {term for clause in parse_search_query(search_query) for negated, term in clause if not negated}
+    if not terms:
+        return None
+    return re.compile("|".join(re.escape(term) for term in sorted(terms, key=len, reverse=True)), re.IGNORECASE)
 
 # Farben für Sender definieren
 def get_sender_color(sender):
@@ -173,64 +1672,52 @@ def get_sender_color(sender):
     return colors[hash(sender) % len(colors)]  # Farbe je nach Sender
 
 # Chat-Nachrichten formatieren mit Suchbegriff-Hervorhebung
-def format_message(row, search_query=None, highlight_index=-1):
-    try:
-        timestamp = row["timestamp"].strftime("%d.%m.%Y %H:%M")
-    except:
-        timestamp = str(row["timestamp"])
-    
+def format_message(chat_id, sender, timestamp, message, deepl=None, m2m100=None, highlight_pattern=None,
+                   is_search_hit=False, is_current_highlight=False):
+    """
+    Baut das HTML einer Nachricht. deepl bzw. m2m100 sind None, wenn die Spalte fehlt.
+    Fundstellen (is_search_hit) werden umrandet und die Treffer von highlight_pattern
+    markiert; is_current_highlight markiert die aktuell fokussierte Fundstelle.
+    """
     # Hellere Farbe für reguläre Nachrichten    
-    color = get_sender_color(row["sender_alias"])
+    color = get_sender_color(sender)
     
     # Suchbegriff gefunden? Dann hellere Hintergrundfarbe
     highlight_style = ""
-    is_current_highlight = False
-    
-    if search_query:
-        message_content = str(row['message']).lower()
-        deepl_content = str(row.get('message_deepl', '')).lower()
-        if search_query.lower() in message_content or search_query.lower() in deepl_content:
-            # Helleren Hintergrund und einen Rahmen hinzufügen für alle Fundstellen
-            highlight_style = "border: 2px solid #FF9933; background-color: #FFF7E6;"
-            
-            # Ist diese Nachricht die aktuell fokussierte Fundstelle?
-            if row.name == highlight_index:
-                # Stärkere Hervorhebung für die aktuelle Fundstelle
-                highlight_style = "border: 3px solid #FF5500; background-color: #FFF0D9; box-shadow: 0 0 10px rgba(255, 153, 51, 0.5);"
-                is_current_highlight = True
-    
-    # Anchor für automatisches Scrollen
     anchor = ""
-    if is_current_highlight:
-        anchor = f"<div id='current-highlight'></div>"
+    
+    if is_search_hit:
+        # Helleren Hintergrund und einen Rahmen hinzufügen für alle Fundstellen
+        highlight_style = "border: 2px solid #FF9933; background-color: #FFF7E6;"
+        
+        # Ist diese Nachricht die aktuell fokussierte Fundstelle?
+        if is_current_highlight:
+            # Stärkere Hervorhebung für die aktuelle Fundstelle, Anchor für automatisches Scrollen
+            highlight_style = "border: 3px solid #FF5500; background-color: #FFF0D9; box-shadow: 0 0 10px rgba(255, 153, 51, 0.5);"
+            anchor = f"<div id='current-highlight'></div>"
     
     message_text = f"{anchor}<div style='background-color:{color}; padding:8px; border-radius:5px; {highlight_style}'>"
     
     # Chatname über dem Sendernamen anzeigen, etwas kleiner, mit padding-bottom: 0
-    message_text += f"<p style='font-size: 8px; color: #888; margin-bottom: 0px;'>{row['chat_id']}</p>"
+    message_text += f"<p style='font-size: 8px; color: #888; margin-bottom: 0px;'>{chat_id}</p>"
     
     # Nachricht mit kleinerem Schriftstil
-    message_text += f"<b style='font-size: 12px;'>{row['sender_alias']} ({timestamp}):</b><br>"
-    
-    # Original und Übersetzungen vorbereiten - mit Typprüfung für Sicherheit
-    original_message = str(row['message'])
-    deepl_translation = str(row.get('message_deepl', '')) if 'message_deepl' in row else ''
-    m2m100_translation = str(row.get('message_m2m100', '')) if 'message_m2m100' in row else ''
+    message_text += f"<b style='font-size: 12px;'>{sender} ({timestamp}):</b><br>"
     
     # Hauptanzeige bestimmen (DeepL bevorzugt)
-    if 'message_deepl' in row and deepl_translation and str(deepl_translation).strip():
-        displayed_content = deepl_translation
+    if deepl and deepl.strip():
+        displayed_content = deepl
     else:
-        displayed_content = original_message
+        displayed_content = message
     
-    # Suchbegriff hervorheben, wenn vorhanden
-    if search_query and search_query.lower() in displayed_content.lower():
-        pattern = re.compile(re.escape(search_query), re.IGNORECASE)
-        displayed_content = pattern.sub(f"<mark>{search_query}</mark>", displayed_content)
+    # Suchbegriffe hervorheben (leere Treffer eines regulären Ausdrucks auslassen)
+    if is_search_hit and highlight_pattern is not None:
+        displayed_content = highlight_pattern.sub(lambda match: f"<mark>{match.group(0)}</mark>" if match.group(0) else "",
+                                                  displayed_content)
     
     # Verbesserter Tooltip mit HTML-Formatierung
-    original_escaped = original_message.replace('"', '&quot;').replace("'", "\\'").replace('\n', '<br>')
-    m2m100_escaped = m2m100_translation.replace('"', '&quot;').replace("'", "\\'").replace('\n', '<br>') if m2m100_translation else ""
+    original_escaped = message.replace('"', '&quot;').replace("'", "\\'").replace('\n', '<br>')
+    m2m100_escaped = m2m100.replace('"', '&quot;').replace("'", "\\'").replace('\n', '<br>') if m2m100 else ""
     
     # Message mit fortgeschrittenem Hover-Effekt und Click-to-Copy-Funktion erstellen
     message_text += f"""
@@ -245,6 +1732,214 @@ def format_message(row, search_query=None, highlight_index=-1):
     message_text += "</div>"
     return message_text
 
+@st.cache_resource
+def get_fragment_cache():
+    """Liefert den prozessweiten Cache für gerenderte Nachrichten (Budget FRAGMENT_CACHE_MB)."""
+    return ChatCache(FRAGMENT_CACHE_MB * 1024 * 1024)
+
+# Zählerstände der prozessweiten Caches
+def get_cache_stats():
+    """Liefert pro Cache (Anzeigename) Treffer, Fehlzugriffe, Einträge, belegte Bytes und Budget."""
+    stats = {}
+    for name, cache in [("Chats", get_chat_cache()), ("Nachrichten-HTML", get_fragment_cache())]:
+        with cache.lock:
+            stats[name] = (cache.hits, cache.misses, len(cache.entries), cache.size, cache.budget)
+    return stats
+
+# Debug-Panel anzeigen (CHAT_VIEWER_DEBUG=1 oder ?debug=1 in der URL)
+def debug_enabled():
+    """Prüft, ob das Debug-Panel eingeschaltet ist."""
+    return os.environ.get("CHAT_VIEWER_DEBUG", "") not in ("", "0") or st.query_params.get("debug") == "1"
+
+# Laufzeiten und Cache-Trefferquoten des Durchlaufs anzeigen
+def show_debug_panel(timer):
+    """
+    Zeigt in der Seitenleiste die Phasen des Durchlaufs mit Aufrufen und Laufzeit, die
+    gezählten Ereignisse und pro Cache die Treffer dieses Durchlaufs sowie die Trefferquote
+    seit dem Start des Prozesses. Die Caches sind prozessweit; gleichzeitige Sitzungen
+    fließen in die Zähler ein.
+    """
+    total_seconds = time.perf_counter() - timer.started
+    with st.sidebar.expander("🛠️ Debug: Laufzeiten", expanded=True):
+        st.write(f"Durchlauf: {total_seconds * 1000:.1f} ms")
+        if timer.phases:
+            st.dataframe(pd.DataFrame(
+                [(path, calls, round(seconds * 1000, 1), f"{seconds / total_seconds:.1%}" if total_seconds else "")
+                 for path, (calls, seconds) in timer.phases.items()],
+                columns=["Phase", "Aufrufe", "ms", "Anteil"]), hide_index=True)
+        if timer.counters:
+            st.write(", ".join(f"{name}: {count}" for name, count in timer.counters.items()))
+
+        rows = []
+        for name, (hits, misses, entries, size, budget) in get_cache_stats().items():
+            start_hits, start_misses = timer.cache_stats[name][:2]
+            total = hits + misses
+            rows.append((name, hits - start_hits, misses - start_misses, f"{hits / total:.1%}" if total else "",
+                         entries, round(size / 1024 / 1024, 1), budget // (1024 * 1024)))
+        st.dataframe(pd.DataFrame(rows, columns=["Cache", "Treffer", "Fehlzugriffe", "Quote gesamt", "Einträge",
+                                                 "MB", "Budget MB"]), hide_index=True)
+
+# Vorberechnete Aktivitätsstatistik einer Datei lesen
+def read_activity(file_path):
+    """
+    Liest die Gruppe /activity (siehe write_activity_stats im Konverter) mit Chat-IDs und
+    Sendern statt Zeilennummern und Codes. Gelesen werden nur die kleinen Statistik-Datasets
+    und die Chat- und Sender-Tabelle, keine Nachrichten.
+
+    Returns:
+        dict oder None, wenn die Datei keine Statistik enthält (siehe get_activity)
+    """
+    with open_h5(file_path) as hf:
+        if 'activity' not in hf:
+            return None
+        activity_group = hf['activity']
+        chat_ids = hf['chats']['chat_id'].asstr()[:]
+        sender_aliases = hf['senders']['sender_alias'].asstr()[:]
+        columns = {name: dataset[:] for name, dataset in activity_group.items()}
+        unit = activity_group['sender_first_timestamp'].attrs['unit']
+        timezone = activity_group.attrs.get('timezone', 'UTC')
+    return {
+        'daily': pd.Series(columns['daily_count'], index=pd.to_datetime(columns['daily_day'], unit='D')),
+        'chat_daily': pd.DataFrame({'chat_id': chat_ids[columns['chat_daily_chat']],
+                                    'day': pd.to_datetime(columns['chat_daily_day'], unit='D'),
+                                    'count': columns['chat_daily_count']}),
+        'senders': pd.DataFrame({'sender_alias': sender_aliases,
+                                 'message_count': columns['sender_count'],
+                                 'first_timestamp': to_local_datetimes(columns['sender_first_timestamp'], unit, timezone),
+                                 'last_timestamp': to_local_datetimes(columns['sender_last_timestamp'], unit, timezone)}),
+        'sender_daily': pd.DataFrame({'sender_alias': sender_aliases[columns['sender_daily_sender']],
+                                      'day': pd.to_datetime(columns['sender_daily_day'], unit='D'),
+                                      'count': columns['sender_daily_count']}),
+    }
+
+# Aktivitätsstatistik prozessweit cachen
+@st.cache_resource(max_entries=16)
+def get_activity(fingerprints):
+    """
+    Liefert die Aktivitätsstatistik einer Datei oder aller Dateien eines Archivs (Tupel von
+    Fingerabdrücken), über die Dateien summiert.
+
+    Returns:
+        dict mit 'daily' (Series Tag -> Nachrichten), 'chat_daily' und 'sender_daily'
+        (DataFrames chat_id bzw. sender_alias, day, count), 'senders' (DataFrame mit
+        Nachrichten sowie erster und letzter Aktivität pro Sender) und 'missing' (Dateien
+        ohne Statistik), oder None, wenn keine Datei eine Statistik enthält
+    """
+    activities = []
+    missing = []
+    for fingerprint in fingerprints:
+        activity = read_activity(fingerprint[0])
+        if activity is None:
+            missing.append(fingerprint[0])
+        else:
+            activities.append(activity)
+    if not activities:
+        return None
+    if len(activities) == 1:
+        return dict(activities[0], missing=missing)
+    return {
+        'daily': pd.concat([activity['daily'] for activity in activities]).groupby(level=0).sum(),
+        'chat_daily': pd.concat([activity['chat_daily'] for activity in activities])
+                        .groupby(['chat_id', 'day'], as_index=False)['count'].sum(),
+        'senders': pd.concat([activity['senders'] for activity in activities])
+                     .groupby('sender_alias', as_index=False)
+                     .agg(message_count=('message_count', 'sum'), first_timestamp=('first_timestamp', 'min'),
+                          last_timestamp=('last_timestamp', 'max')),
+        'sender_daily': pd.concat([activity['sender_daily'] for activity in activities])
+                          .groupby(['sender_alias', 'day'], as_index=False)['count'].sum(),
+        'missing': missing,
+    }
+
+# Aktivität aus der vorberechneten Statistik anzeigen
+def show_activity(activity, chat_index, file_info, selected_chat, selected_sender):
+    """
+    Zeigt erste und letzte Aktivität, Nachrichten pro Tag und (für "Alle") die aktivsten
+    Sender und Chats für die aktuelle Auswahl. Alles stammt aus der Aktivitätsstatistik und
+    dem Chat-Verzeichnis; Nachrichten werden dafür nicht geladen. Für einen Chat mit
+    gewähltem Sender zeigt das Diagramm den ganzen Chat, da die Statistik nur pro Chat
+    und pro Sender vorliegt.
+    """
+    if selected_chat != "Alle":
+        chat = chat_index[chat_index['chat_id'] == selected_chat].iloc[0]
+        first_timestamp, last_timestamp = chat['first_timestamp'], chat['last_timestamp']
+        daily = activity['chat_daily'][activity['chat_daily']['chat_id'] == selected_chat].set_index('day')['count']
+        title = "im Chat" + (" (alle Sender)" if selected_sender != "Alle" else "")
+    elif selected_sender != "Alle":
+        sender = activity['senders'][activity['senders']['sender_alias'] == selected_sender]
+        first_timestamp, last_timestamp = sender['first_timestamp'].min(), sender['last_timestamp'].max()
+        daily = activity['sender_daily'][activity['sender_daily']['sender_alias'] == selected_sender].set_index('day')['count']
+        title = f"von {selected_sender}"
+    else:
+        first_timestamp, last_timestamp = file_info['first_timestamp'], file_info['last_timestamp']
+        daily = activity['daily']
+        title = "insgesamt"
+
+    if not pd.isna(first_timestamp):
+        st.write(f"🕐 Erste Aktivität: {pd.Timestamp(first_timestamp):%d.%m.%Y %H:%M} · "
+                 f"Letzte Aktivität: {pd.Timestamp(last_timestamp):%d.%m.%Y %H:%M}")
+    if not daily.empty:
+        st.write(f"Nachrichten pro Tag {title}: an {len(daily)} Tagen, höchstens {int(daily.max())} an einem Tag")
+        st.bar_chart(daily.rename("Nachrichten"))
+
+    if selected_chat == "Alle" and selected_sender == "Alle":
+        col1, col2 = st.columns(2)
+        with col1:
+            st.write("Aktivste Sender")
+            top_senders = activity['senders'].nlargest(ACTIVITY_TOP_ROWS, 'message_count')
+            st.dataframe(top_senders.rename(columns={'sender_alias': 'Sender', 'message_count': 'Nachrichten',
+                                                     'first_timestamp': 'Erste', 'last_timestamp': 'Letzte'}),
+                         hide_index=True)
+        with col2:
+            st.write("Aktivste Chats")
+            top_chats = chat_index.assign(messages=chat_index['end'] - chat_index['start']).nlargest(
+                ACTIVITY_TOP_ROWS, 'messages')
+            st.dataframe(top_chats[['chat_name', 'messages', 'first_timestamp', 'last_timestamp']].rename(
+                columns={'chat_name': 'Chat', 'messages': 'Nachrichten', 'first_timestamp': 'Erste',
+                         'last_timestamp': 'Letzte'}), hide_index=True)
+    if activity['missing']:
+        st.caption("Ohne Aktivitätsstatistik (nicht berücksichtigt): "
+                   + ", ".join(os.path.basename(path) for path in activity['missing']))
+
+# Eine Seite von Nachrichten in einem Durchgang rendern
+def render_page(page_df, fingerprint, highlight_pattern, search_hits, highlight_index, display_option):
+    """
+    Baut das HTML aller Nachrichten einer Seite direkt aus den Spalten-Arrays (ohne
+    Series pro Zeile) und trennt sie mit Linien; die Seite wird als ein einziges
+    Markdown-Element gesendet. search_hits sind die sortierten Indexwerte aller
+    Fundstellen. Gerenderte Nachrichten werden pro Nachricht (Indexwert im Dateistand),
+    Suchmuster und Anzeigemodus im Fragment-Cache gehalten.
+    """
+    cache = get_fragment_cache()
+    labels = page_df.index.to_numpy()
+    hit_positions = np.minimum(np.searchsorted(search_hits, labels), max(len(search_hits) - 1, 0))
+    is_hit = (search_hits[hit_positions] == labels) if len(search_hits) else np.zeros(len(labels), dtype=bool)
+    pattern_key = None if highlight_pattern is None else highlight_pattern.pattern
+    keys = [(fingerprint, label, pattern_key, display_option, hit, hit and label == highlight_index)
+            for label, hit in zip(labels.tolist(), is_hit.tolist())]
+    fragments = [cache.get(key) for key in keys]
+    missing = [i for i, fragment in enumerate(fragments) if fragment is None]
+    if missing:
+        rows = page_df.iloc[missing]
+        timestamps = rows["timestamp"].dt.strftime("%d.%m.%Y %H:%M").fillna("NaT").tolist()
+        messages = rows["message"].tolist()
+        deepl_translations = rows["message_deepl"].tolist() if "message_deepl" in rows else [None] * len(rows)
+        m2m100_translations = rows["message_m2m100"].tolist() if "message_m2m100" in rows else [None] * len(rows)
+        for i, chat_id, sender, timestamp, message, deepl, m2m100 in zip(
+                missing, rows["chat_id"].tolist(), rows["sender_alias"].tolist(), timestamps,
+                messages, deepl_translations, m2m100_translations):
+            # Je nach Auswahl den Nachrichtentext anpassen
+            if display_option == "Nur Originalnachrichten":
+                if deepl is not None:
+                    deepl = ""
+            elif display_option == "Beide anzeigen (Original & Übersetzung)":
+                if deepl and deepl != message:
+                    message = f"{message}<br><i style='color: #666;'>Übersetzung: {deepl}</i>"
+                    deepl = ""
+            fragments[i] = format_message(chat_id, sender, timestamp, message, deepl, m2m100,
+                                          highlight_pattern, keys[i][-2], keys[i][-1])
+            cache.put(keys[i], fragments[i], len(fragments[i]))
+    return "\n\n---\n\n".join(fragments)
+
 # Hauptfunktion der App
 def main():
     # Streamlit UI
@@ -252,53 +1947,154 @@ def main():
 
     # Eingabefeld für die H5-Datei mit Standardwert
     default_file_path = "./chats.h5"
-    file_path = st.text_input("Gib den Pfad zur H5-Datei ein:", value=default_file_path, key="file_path_input")
+    file_path = st.text_input("Gib den Pfad zur H5-Datei, zu einem Verzeichnis oder ein Muster wie archiv/*.h5 ein:",
+                              value=default_file_path, key="file_path_input")
+
+    # Live-Ansicht für Dateien, die der Konverter gerade mit --swmr schreibt: der Hauptteil
+    # läuft periodisch neu, "Alle" lädt dabei nur die neu hinzugekommenen Chats nach
+    live = st.checkbox("🔴 Live-Ansicht: neue Chats automatisch nachladen", key="live_refresh_checkbox",
+                       help=f"Prüft alle {LIVE_REFRESH_SECONDS} Sekunden, ob die Datei gewachsen ist")
+    if live != st.session_state.get("live_refresh_active", False):
+        st.rerun()
 
     if file_path:
-        if os.path.exists(file_path) and file_path.endswith('.h5'):
+        file_paths = resolve_h5_paths(file_path)
+        if file_paths:
             try:
-                # Performance-Optimierung: Caching des DataFrame, um wiederholtes Laden zu vermeiden
-                @st.cache_data(ttl=600)  # 10 Minuten Caching
-                def get_cached_dataframe(file_path):
-                    return load_h5_file(file_path)
-                
-                # Lade die H5-Datei und erhalte Strukturinformationen
-                combined_df, structure_info = get_cached_dataframe(file_path)
+                # Performance-Optimierung: nur das Chat-Verzeichnis wird sofort gelesen,
+                # Nachrichten werden pro Chat bei Bedarf geladen und im LRU-Cache gehalten.
+                # Alle Caches hängen am Fingerabdruck der Datei (Pfad, Größe, Änderungszeit).
+                # Mehrere Dateien bilden ein Archiv, das pro Datei gecacht und parallel gelesen wird.
+                with timed_phase("chat_index"):
+                    if len(file_paths) == 1:
+                        file_path = file_paths[0]
+                        chat_index, file_info = get_chat_index(get_file_fingerprint(file_path))
+                    else:
+                        chat_index, file_info = get_archive_index(tuple(get_file_fingerprint(path)
+                                                                        for path in file_paths))
+                archive = 'members' in file_info
+                for skipped_path, error in file_info.get('skipped', []):
+                    st.warning(f"{os.path.basename(skipped_path)} konnte nicht gelesen werden und wird übersprungen: {error}")
+                files = file_info['members'] if archive else [{'path': file_path, 'file_info': file_info}]
+                writing = [os.path.basename(member['path']) for member in files
+                           if not member['file_info']['ingest_complete']]
+                if writing:
+                    st.info(f"⏳ {', '.join(writing)} wird gerade geschrieben; angezeigt werden die bisher "
+                            "geschriebenen Chats." + ("" if live else " Die Live-Ansicht lädt neue Chats automatisch nach."))
                 
-                # Anzeigen der H5-Struktur
+                # Anzeigen der H5-Struktur: die vom Konverter gespeicherte Übersicht sofort,
+                # einzelne Gruppen erst auf Wunsch und mit begrenzter Ausgabe
                 with st.expander("H5-Dateistruktur (zum Debugging)"):
-                    st.code("\n".join(structure_info))
+                    structure_path, structure_summary = file_path, file_info['structure_summary']
+                    if archive and file_info['members']:
+                        # Im Archiv die Struktur einer einzelnen Datei anzeigen
+                        members = {member['path']: member for member in file_info['members']}
+                        structure_path = st.selectbox("Datei", list(members), format_func=os.path.basename,
+                                                      key="h5_member_select")
+                        structure_summary = members[structure_path]['file_info']['structure_summary']
+                    if structure_summary is not None:
+                        st.code("\n".join(format_structure_summary(structure_summary)))
+                    elif os.path.basename(structure_path) in writing:
+                        st.info("Die Strukturübersicht wird erst am Ende der Konvertierung gespeichert; "
+                                "einzelne Gruppen lassen sich unten einlesen.")
+                    else:
+                        st.info("Die Datei enthält keine Strukturübersicht (ältere Konvertierung); "
+                                "einzelne Gruppen lassen sich unten einlesen.")
+                    col1, col2 = st.columns([3, 1])
+                    with col1:
+                        group_path = st.text_input("Gruppe oder Dataset", value="/", key="h5_group_input")
+                    with col2:
+                        show_samples = st.checkbox("Erste Werte lesen", key="h5_sample_checkbox")
+                    if st.checkbox("Struktur einlesen", key="show_h5_structure"):
+                        # Gruppe erkunden (einmal pro Dateistand, Pfad und Einstellung)
+                        structure_key = (file_info['fingerprint'], structure_path, group_path, show_samples)
+                        if st.session_state.get("h5_structure_key") != structure_key:
+                            with open_h5(structure_path) as hf:
+                                if group_path in hf:
+                                    st.session_state.h5_structure = explore_h5_structure(hf, group_path, show_samples)
+                                else:
+                                    st.session_state.h5_structure = [f"{group_path} existiert nicht in der Datei."]
+                            st.session_state.h5_structure_key = structure_key
+                        st.code("\n".join(st.session_state.h5_structure))
                 
-                if not combined_df.empty:
-                    # Anzeigen einiger Statistiken
+                if not chat_index.empty:
+                    # Anzeigen einiger Statistiken (aus den Metadaten, ohne Nachrichten zu laden)
                     st.write(f"### Statistiken")
-                    st.write(f"📊 Anzahl Chats: {combined_df['chat_id'].nunique()}")
-                    st.write(f"👥 Anzahl Sender: {combined_df['sender_alias'].nunique()}")
-                    st.write(f"💬 Anzahl Nachrichten: {len(combined_df)}")
-                    
-                    # Sortieren nach Zeitstempel
-                    combined_df.sort_values(["chat_id", "timestamp"], inplace=True)
+                    if archive:
+                        st.write(f"🗂️ Anzahl Dateien: {len(file_info['members'])}")
+                    st.write(f"📊 Anzahl Chats: {len(chat_index)}")
+                    sender_stats = st.empty()
+                    st.write(f"💬 Anzahl Nachrichten: {int((chat_index['end'] - chat_index['start']).sum())}")
+                    activity_container = st.container()
 
-                    # Filter
-                    chat_ids = combined_df["chat_id"].unique()
-                    senders = combined_df["sender_alias"].unique()
+                    # Chat-Auswahl; standardmäßig wird nur der erste Chat geladen
+                    chat_ids = chat_index["chat_id"]
                     
                     col1, col2 = st.columns(2)
                     with col1:
-                        selected_chat = st.selectbox("Wähle einen Chat", ["Alle"] + list(chat_ids), key="chat_selector")
+                        selected_chat = st.selectbox("Wähle einen Chat", ["Alle"] + list(chat_ids), index=1, key="chat_selector")
+                    
+                    # Seitenmodus: Ohne Suche werden für einen einzelnen Chat nur Zeitstempel und
+                    # Sender geladen und die Texte der sichtbaren Seite gezielt gelesen (nur für einzelne Dateien)
+                    paged = not archive and selected_chat != "Alle" and not st.session_state.get("search_query_input")
+                    with timed_phase("load"):
+                        if selected_chat == "Alle":
+                            if archive:
+                                combined_df, filter_index = load_archive_all(file_info)
+                            else:
+                                combined_df, filter_index = load_all_chats(file_path, chat_index, file_info)
+                        else:
+                            chat_pos = int(np.flatnonzero(chat_ids.to_numpy() == selected_chat)[0])
+                            if paged:
+                                combined_df, filter_index, translation_columns = load_chat_keys(file_path, chat_index,
+                                                                                                file_info, chat_pos)
+                            elif archive:
+                                combined_df, filter_index = load_archive_chat(file_info, selected_chat)
+                            else:
+                                combined_df, filter_index = load_chat(file_path, chat_index, file_info, chat_pos)
+                    if not paged:
+                        translation_columns = [column for column in TRANSLATION_COLUMNS if column in combined_df.columns]
+                    
+                    if combined_df.empty:
+                        st.warning("Der gewählte Chat konnte nicht geladen werden.")
+                        return
+                    
+                    # Sender (Categoricals; verglichen werden deren Codes)
+                    senders = combined_df["sender_alias"].cat.categories
+                    if file_info['senders'] is not None:
+                        sender_stats.write(f"👥 Anzahl Sender: {len(file_info['senders'])}")
+                    else:
+                        # Ohne Sender-Tabelle sind nur die Sender der geladenen Chats bekannt
+                        sender_stats.write(f"👥 Anzahl Sender: {len(senders)}"
+                                           + ("" if selected_chat == "Alle" else " (im gewählten Chat)"))
+                    
                     with col2:
-                        selected_sender = st.selectbox("Wähle einen Sender", ["Alle"] + list(senders), key="sender_selector")
+                        # Sortiert anzeigen: beim Nachladen wachsender Dateien kommen neue Kategorien hinten dazu
+                        selected_sender = st.selectbox("Wähle einen Sender", ["Alle"] + sorted(senders), key="sender_selector")
                     
-                    # Filter anwenden
-                    filtered_df = combined_df.copy()
-                    if selected_chat != "Alle":
-                        filtered_df = filtered_df[filtered_df["chat_id"] == selected_chat]
-                    if selected_sender != "Alle":
-                        filtered_df = filtered_df[filtered_df["sender_alias"] == selected_sender]
+                    sender_code = None if selected_sender == "Alle" else senders.get_loc(selected_sender)
+
+                    # Aktivität aus der vom Konverter gespeicherten Statistik (ohne Nachrichten zu lesen)
+                    with activity_container, st.expander("📈 Aktivität"), timed_phase("activity"):
+                        activity = get_activity(tuple(member['file_info']['fingerprint'] for member in files))
+                        if activity is not None:
+                            show_activity(activity, chat_index, file_info, selected_chat, selected_sender)
+                        elif writing:
+                            st.info("Die Aktivitätsstatistik wird am Ende der Konvertierung berechnet.")
+                        else:
+                            st.info("Die Datei enthält keine Aktivitätsstatistik (ältere Konvertierung oder Layout 1).")
                     
-                    # Zeitfilter
-                    min_date = combined_df["timestamp"].min().date()
-                    max_date = combined_df["timestamp"].max().date()
+                    # Zeitfilter: Grenzen aus dem Zeitindex der Datei (ältere Dateien: aus den geladenen Nachrichten)
+                    if selected_chat == "Alle":
+                        first_timestamp, last_timestamp = file_info['first_timestamp'], file_info['last_timestamp']
+                    else:
+                        first_timestamp = chat_index['first_timestamp'].iloc[chat_pos]
+                        last_timestamp = chat_index['last_timestamp'].iloc[chat_pos]
+                    if pd.isna(first_timestamp):
+                        first_timestamp = combined_df["timestamp"].min()
+                        last_timestamp = combined_df["timestamp"].max()
+                    min_date = pd.Timestamp(first_timestamp).date()
+                    max_date = pd.Timestamp(last_timestamp).date()
 
                     # Sicherstellen, dass der Zeitraum gültig ist (min_date < max_date)
                     if min_date == max_date:
@@ -307,22 +2103,51 @@ def main():
                     
                     start_date, end_date = st.slider("📅 Zeitraum wählen", min_value=min_date, max_value=max_date, value=(min_date, max_date), key="date_range_slider")
                     
-                    # Zeitfilter anwenden
-                    filtered_df = filtered_df[(filtered_df["timestamp"].dt.date >= start_date) & (filtered_df["timestamp"].dt.date <= end_date)]
+                    # Filter über den Filterindex anwenden (die geladenen DataFrames werden geteilt und nie verändert)
+                    with timed_phase("filter"):
+                        filtered_df = filter_index.filter(combined_df, sender_code, start_date, end_date)
                     
                     # Suchfunktionalität: Suchbegriff speichern, aber nicht filtern
-                    search_query = st.text_input("🔍 Nachrichtensuche", key="search_query_input")
-                    search_results = []
+                    # Syntax: Wörter (UND), "Phrasen", OR zwischen Begriffen, NOT oder -Begriff
+                    search_query = st.text_input("🔍 Nachrichtensuche", key="search_query_input",
+                                                 help='Mehrere Begriffe müssen alle vorkommen; "Phrase in Anführungszeichen", '
+                                                      'a OR b, NOT a bzw. -a')
+                    field_options = [field for field, column in SEARCH_FIELDS.items()
+                                     if column == 'message' or column in translation_columns]
+                    col1, col2 = st.columns([3, 1])
+                    with col1:
+                        search_fields = st.multiselect("Suchfelder", field_options, default=field_options[:2],
+                                                       key="search_fields_select")
+                    with col2:
+                        use_regex = st.checkbox("Regulärer Ausdruck", key="search_regex_checkbox")
+                    search_results = np.array([], dtype=np.int64)
+                    search_hits = search_results
+                    highlight_pattern = None
                     current_search_index = 0
+                    regex_error = False
                     
                     if search_query:
-                        # Finde alle Indizes, wo die Suche übereinstimmt
-                        search_filter = filtered_df["message"].str.contains(search_query, case=False, na=False)
-                        if 'message_deepl' in filtered_df.columns:
-                            search_filter |= filtered_df["message_deepl"].str.contains(search_query, case=False, na=False)
-                        search_results = filtered_df[search_filter].index.tolist()
+                        # Treffer werden pro Anfrage und Filterzustand gecacht; Blättern sucht nicht neu
+                        frame_key = (file_info['fingerprint'], None if selected_chat == "Alle" else selected_chat)
+                        filter_state = (sender_code, start_date, end_date)
+                        search_columns = [SEARCH_FIELDS[field] for field in search_fields]
+                        try:
+                            with timed_phase("search"):
+                                search_results, search_hits = search_messages(file_path, file_info, frame_key,
+                                                                              combined_df, filter_index, filter_state,
+                                                                              search_query, search_columns, use_regex)
+                            highlight_pattern = build_highlight_pattern(search_query, use_regex)
+                        except re.error as e:
+                            st.warning(f"Ungültiger regulärer Ausdruck: {str(e)}")
+                            regex_error = True
+                        
+                        # Neue Suche oder geänderte Filter: wieder bei der ersten Fundstelle beginnen
+                        search_state = frame_key + (search_query, use_regex, tuple(search_columns), filter_state)
+                        if st.session_state.get("search_state") != search_state:
+                            st.session_state.search_state = search_state
+                            st.session_state.search_index = 0
                         
-                        if search_results:
+                        if len(search_results):
                             # Navigation zwischen Suchergebnissen
                             col1, col2, col3, col4 = st.columns([3, 1, 1, 3])
                             
@@ -351,16 +2176,19 @@ def main():
                                     st.info(f"Fundstelle {st.session_state.search_index + 1} von {len(search_results)}")
                             
                             current_search_index = st.session_state.search_index
-                        else:
+                        elif not regex_error:
+                            # Nach einem ungültigen Ausdruck genügt dessen Fehlermeldung
                             st.warning(f"Keine Ergebnisse für '{search_query}' gefunden")
                     else:
                         # Zurücksetzen des Suchindex, wenn keine Suche aktiv ist
                         if 'search_index' in st.session_state:
                             del st.session_state.search_index
+                        if 'search_state' in st.session_state:
+                            del st.session_state.search_state
                     
                     # Anzeigeoptionen für Übersetzungen
                     display_option = "DeepL Übersetzung bevorzugt"
-                    if 'message_deepl' in filtered_df.columns:
+                    if 'message_deepl' in translation_columns:
                         display_option = st.radio(
                             "Anzeigeoptionen:",
                             ["DeepL Übersetzung bevorzugt", "Nur Originalnachrichten", "Beide anzeigen (Original & Übersetzung)"],
@@ -414,7 +2242,7 @@ def main():
                     
                     # Bestimme Startseite basierend auf Suchergebnissen
                     default_page = 1
-                    if search_results:
+                    if len(search_results):
                         # Verwende den aktuellen Suchindex, um zur richtigen Seite zu springen
                         result_index = filtered_df.index.get_loc(search_results[current_search_index])
                         default_page = (result_index // msg_per_page) + 1
@@ -435,7 +2263,7 @@ def main():
                     st.write(f"### Gefilterter Chatverlauf (Ergebnisse {start_idx+1}-{end_idx} von {total_msgs})")
                     
                     # Nach dem Rendern der Nachrichten, füge JavaScript für Auto-Scrolling ein
-                    if search_results and 'search_index' in st.session_state:
+                    if len(search_results) and 'search_index' in st.session_state:
                         # JavaScript um automatisch zur aktuellen Fundstelle zu scrollen
                         st.markdown("""
                         <script>
@@ -457,39 +2285,34 @@ def main():
                     if total_msgs > 0:
                         # Je nach Auswahl den Nachrichtentext anpassen
                         current_highlight_index = -1
-                        if search_results and current_search_index < len(search_results):
+                        if current_search_index < len(search_results):
                             current_highlight_index = search_results[current_search_index]
                         
                         page_df = filtered_df.iloc[start_idx:end_idx]
-                        for _, row in page_df.iterrows():
-                            # Je nach Auswahl den Nachrichtentext anpassen
-                            if display_option == "Nur Originalnachrichten":
-                                row_copy = row.copy()
-                                if 'message_deepl' in row_copy:
-                                    row_copy['message_deepl'] = ""
-                                if 'message_m2m100' in row_copy:
-                                    # Behalte m2m100 für Hover-Effekt
-                                    pass
-                                st.markdown(format_message(row_copy, search_query, current_highlight_index), unsafe_allow_html=True)
-                            elif display_option == "Beide anzeigen (Original & Übersetzung)":
-                                row_copy = row.copy()
-                                if 'message_deepl' in row_copy and row_copy['message_deepl'] and row_copy['message_deepl'] != row_copy['message']:
-                                    message_with_translation = f"{row_copy['message']}<br><i style='color: #666;'>Übersetzung: {row_copy['message_deepl']}</i>"
-                                    row_copy['message'] = message_with_translation
-                                    row_copy['message_deepl'] = ""
-                                st.markdown(format_message(row_copy, search_query, current_highlight_index), unsafe_allow_html=True)
-                            else:
-                                # DeepL bevorzugt (Standard)
-                                st.markdown(format_message(row, search_query, current_highlight_index), unsafe_allow_html=True)
-                            st.markdown("---")
+                        if paged:
+                            # Nur die sichtbaren Zeilen aus der H5-Datei lesen
+                            with timed_phase("page_rows"):
+                                page_df = load_page_rows(file_path, chat_index, file_info, chat_pos,
+                                                         page_df['row'].to_numpy())
+                        # Die ganze Seite als ein Element senden statt zwei Elementen pro Nachricht
+                        with timed_phase("render"):
+                            page_html = render_page(page_df, file_info['fingerprint'], highlight_pattern, search_hits,
+                                                    current_highlight_index, display_option)
+                        st.markdown(page_html + "\n\n---", unsafe_allow_html=True)
                     else:
                         st.info("Keine Nachrichten gefunden, die den Filterkriterien entsprechen.")
                 else:
                     st.warning("Keine Chat-Daten in der H5-Datei gefunden. Bitte überprüfe die Dateistruktur im ausgeklappten Bereich oben.")
             except Exception as e:
-                st.error(f"Fehler beim Laden der H5-Datei: {str(e)}")
+                if live and isinstance(e, OSError):
+                    # Während der Konverter die Datei abschließt, ist sie kurz gesperrt
+                    st.info("⏳ Die Datei ist gerade gesperrt, vermutlich schließt der Konverter sie ab; "
+                            "die Live-Ansicht versucht es gleich erneut.")
+                else:
+                    st.error(f"Fehler beim Laden der H5-Datei: {str(e)}")
         else:
-            st.error("Die angegebene Datei existiert nicht oder ist keine H5-Datei.")
+            st.error("Die angegebene Datei existiert nicht oder ist keine H5-Datei "
+                     "(bzw. das Verzeichnis oder Muster enthält keine H5-Dateien).")
     else:
         # Wenn keine Datei angegeben wurde
         st.write("Bitte gib den Pfad zu einer H5-Datei ein, die die Chat-Daten enthält.")
@@ -529,14 +2352,25 @@ def main():
             """)
 
 # App nur starten, wenn das Passwort korrekt ist
-if check_password():
-    main()
-else:
-    # Optional: Zeige ein Bild oder eine Animation auf der Anmeldeseite
-    st.markdown("""
-    ### 🔒 Geschützter Bereich
+# Streamlit führt das Skript als __main__ aus; beim Import (z. B. im Benchmark) startet die App nicht
+if __name__ == "__main__":
+    if check_password():
+        # Optionales Debug-Panel mit Laufzeiten der Phasen und Cache-Trefferquoten
+        debug_timer = start_phase_timer(debug_enabled())
+        # In der Live-Ansicht läuft nur main() periodisch als Fragment neu
+        st.session_state["live_refresh_active"] = st.session_state.get("live_refresh_checkbox", False)
+        if st.session_state["live_refresh_active"]:
+            st.fragment(main, run_every=LIVE_REFRESH_SECONDS)()
+        else:
+            main()
+        if debug_timer is not None:
+            show_debug_panel(debug_timer)
+    else:
+        # Optional: Zeige ein Bild oder eine Animation auf der Anmeldeseite
+        st.markdown("""
+        ### 🔒 Geschützter Bereich
     
-    Der Chat Viewer ist passwortgeschützt. Bitte gib das korrekte Passwort ein, um fortzufahren.
+        Der Chat Viewer ist passwortgeschützt. Bitte gib das korrekte Passwort ein, um fortzufahren.
     
-    *Das Standardpasswort ist "chatviewer123".*
-    """)
\ No newline at end of file
+        *Das Standardpasswort ist "chatviewer123".*
+        """)
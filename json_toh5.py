@@ -2,185 +2,2291 @@ import json
 import h5py
 import pandas as pd
 import numpy as np
-from datetime import datetime
 import argparse
+import glob
+import heapq
 import os
+import platform
+import queue
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+try:
+    import resource
+except ImportError:  # nicht unter Windows
+    resource = None
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from itertools import chain, repeat
+from operator import itemgetter
 
-def convert_json_to_h5(json_file_path, h5_file_path):
+# Standardgröße eines Nachrichten-Batches im Streaming-Modus
+DEFAULT_BATCH_SIZE = 10000
+
+# Anzahl Batches, die zwischen Aufbereitung und Schreib-Thread gepuffert werden (siehe write_chats_pipelined)
+PIPELINE_DEPTH = 4
+
+# Format der Zeitstempel im JSON-Export
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Zeitstempel werden als int64-Unix-Timestamps in dieser Einheit gespeichert
+TIMESTAMP_UNIT = 's'
+
+# Ungültige Zeitstempel (NaT) werden als kleinster int64-Wert gespeichert
+NAT_VALUE = np.iinfo(np.int64).min
+
+# Zeitzone, in der die Zeitstempel des Exports angenommen werden
+DEFAULT_TIMEZONE = 'UTC'
+
+# Standardstufe der gzip-Kompression
+DEFAULT_GZIP_LEVEL = 4
+
+# Layout-Versionen der H5-Datei (Attribut 'layout_version' der Wurzelgruppe)
+LAYOUT_VERSION_GROUPS = 1    # eine Gruppe pro Chat
+LAYOUT_VERSION_COLUMNAR = 2  # globale Spalten unter /messages, Chat-Tabelle unter /chats
+DEFAULT_LAYOUT_VERSION = LAYOUT_VERSION_COLUMNAR
+
+# Suchindex: n-Gramm-Länge, indizierte Textspalten und Zeilen pro Verarbeitungsblock
+SEARCH_INDEX_NGRAM = 3
+SEARCH_INDEX_COLUMNS = ['message', 'message_deepl', 'message_m2m100']
+SEARCH_INDEX_BATCH_ROWS = 200000
+
+# Spalten der Chat-Tabelle in Layout 2
+CHAT_TABLE_COLUMNS = ['chat_id', 'chat_name', 'message_count', 'unique_sender_count', 'start', 'end']
+CHAT_TABLE_NUMERIC_COLUMNS = {'message_count', 'unique_sender_count', 'start', 'end'}
+
+# Nachrichtenspalten in Schreibreihenfolge; alle nicht numerischen Spalten sind Strings
+MESSAGE_COLUMNS = ['timestamp', 'timestamp_str', 'sender_alias', 'message', 'message_id',
+                   'message_deepl', 'message_m2m100']
+NUMERIC_COLUMNS = {'timestamp': np.int64, 'message_id': np.int64, 'sender_code': np.int32}
+
+# Übersetzungsspalten werden in Layout 2 dünn besetzt gespeichert: '<Spalte>_rows' enthält die
+# aufsteigenden Zeilen in /messages mit nicht leerer Übersetzung, '<Spalte>_values' die Texte dazu
+SPARSE_COLUMNS = ['message_deepl', 'message_m2m100']
+
+# Kodierung der Textspalten in /messages (Layout 2): 'vlen' speichert jeden Text als HDF5-String
+# variabler Länge, 'blob' alle Texte einer Spalte hintereinander als UTF-8-Bytes in '<Spalte>_blob'
+# mit den Byte-Offsets in '<Spalte>_offsets' (Zeilen + 1 Einträge, beginnend mit 0)
+STRING_ENCODING_VLEN = 'vlen'
+STRING_ENCODING_BLOB = 'blob'
+DEFAULT_STRING_ENCODING = STRING_ENCODING_VLEN
+
+# Chunkgröße der Blob-Datasets in Bytes (--chunk-size zählt Zeilen)
+BLOB_CHUNK_BYTES = 1 << 18
+
+# Anzahl Zeichen, die pro Lesevorgang aus der JSON-Datei geholt werden
+DEFAULT_READ_SIZE = 1 << 20
+
+
+class Profiler:
     """
-    Konvertiert eine JSON-Datei mit Chat-Daten in eine H5-Datei.
-    Behandelt doppelte Chat-IDs, indem die Nachrichten zusammengeführt werden.
-    
+    Sammelt Laufzeit und Speicherspitze benannter Abschnitte (Spans) der Konvertierung.
+    Verschachtelte Abschnitte erhalten den Namen des umgebenden Abschnitts als Präfix
+    ('convert/write_chats/write_chat'); gleichnamige Abschnitte, etwa einer pro Chat,
+    werden zusammengefasst. Die Speicherspitze ist der höchste mit tracemalloc gemessene
+    Python-Speicher (inklusive NumPy) während des Abschnitts, ohne HDF5-interne Puffer.
+    Solange der Profiler nicht gestartet ist, kostet ein Abschnitt nur einen Funktionsaufruf.
+    Jeder Thread hat einen eigenen Stapel offener Abschnitte; Abschnitte des Schreib-Threads
+    (siehe write_chats_pipelined) erscheinen daher unter eigenem Namen auf oberster Ebene.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.memory = False
+        self.spans = {}
+        self.local = threading.local()
+        self.started = None
+        self.peak_bytes = 0
+
+    def start(self, memory=True):
+        """Startet die Messung; memory=False verzichtet auf tracemalloc (verfälscht die Laufzeiten weniger)."""
+        self.enabled = True
+        self.memory = memory
+        self.spans = {}
+        self.local = threading.local()
+        self.peak_bytes = 0
+        if memory:
+            tracemalloc.start()
+        self.started = time.perf_counter()
+
+    @contextmanager
+    def span(self, name):
+        if not self.enabled:
+            yield
+            return
+        path = f"{self.stack[-1][0]}/{name}" if self.stack else name
+        stats = self.spans.setdefault(path, {'count': 0, 'seconds': 0.0, 'max_seconds': 0.0, 'peak_bytes': 0})
+        self.fold_peak()
+        frame = [path, time.perf_counter(), 0]
+        self.stack.append(frame)
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - frame[1]
+            self.fold_peak()
+            self.stack.pop()
+            stats['count'] += 1
+            stats['seconds'] += seconds
+            stats['max_seconds'] = max(stats['max_seconds'], seconds)
+            stats['peak_bytes'] = max(stats['peak_bytes'], frame[2])
+
+    @property
+    def stack(self):
+        """Stapel der offenen Abschnitte des aktuellen Threads."""
+        if not hasattr(self.local, 'stack'):
+            self.local.stack = []
+        return self.local.stack
+
+    def fold_peak(self):
+        """Rechnet die Speicherspitze seit dem letzten Aufruf allen offenen Abschnitten zu."""
+        if not self.memory:
+            return
+        peak = tracemalloc.get_traced_memory()[1]
+        self.peak_bytes = max(self.peak_bytes, peak)
+        for frame in self.stack:
+            frame[2] = max(frame[2], peak)
+        tracemalloc.reset_peak()
+
+    def stop(self):
+        """
+        Beendet die Messung.
+
+        Returns:
+            dict: Gesamtlaufzeit, Speicherspitze und die Abschnitte in Startreihenfolge
+        """
+        total_seconds = time.perf_counter() - self.started
+        self.fold_peak()
+        if self.memory:
+            tracemalloc.stop()
+        self.enabled = False
+        return {
+            'total_seconds': total_seconds,
+            'peak_bytes': self.peak_bytes if self.memory else None,
+            'spans': [{'name': name, **stats} for name, stats in self.spans.items()],
+        }
+
+
+# Prozessweiter Profiler (wird mit --profile gestartet)
+PROFILER = Profiler()
+
+
+class JsonArrayStream:
+    """
+    Inkrementeller Leser für eine JSON-Datei, deren Wurzel ein Array ist.
+    Hält nur einen Puffer im Speicher und dekodiert einzelne Werte mit
+    json.JSONDecoder.raw_decode, sobald sie vollständig gelesen wurden.
+    """
+
+    def __init__(self, file, read_size=DEFAULT_READ_SIZE):
+        self.file = file
+        self.read_size = read_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self, min_size):
+        # Bereits verarbeiteten Teil des Puffers verwerfen
+        if self.pos:
+            self.buffer = self.buffer[self.pos:]
+            self.pos = 0
+        chunk = self.file.read(max(min_size, self.read_size))
+        if not chunk:
+            self.eof = True
+        self.buffer += chunk
+
+    def peek(self):
+        """Liefert das nächste Nicht-Leerzeichen, ohne es zu verbrauchen ('' am Dateiende)."""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if self.eof:
+                return ""
+            self._fill(self.read_size)
+
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Ungültiges JSON: '{char}' erwartet, '{found}' gefunden")
+        self.pos += 1
+
+    def decode_value(self):
+        """Dekodiert den nächsten vollständigen JSON-Wert aus dem Puffer."""
+        self.peek()
+        read_size = self.read_size
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+                # Zahlen oder Literale am Pufferende könnten noch weitergehen
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            # Wert unvollständig: Puffer vergrößern (Leseblock verdoppeln, damit
+            # große Werte nicht quadratisch oft neu dekodiert werden)
+            self._fill(read_size)
+            read_size *= 2
+
+
+def iter_chat_batches(json_file_path, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Liest das Top-Level-Array einer Chat-Export-Datei Chat für Chat und die
+    Nachrichten jedes Chats in Batches von höchstens batch_size Einträgen.
+
+    Liefert Tupel (chat_meta, messages). Für jeden Chat folgen zuerst die
+    Nachrichten-Batches und danach ein abschließendes (chat_meta, None).
+    chat_meta ist für alle Batches eines Chats dasselbe Dict und enthält erst
+    beim abschließenden Tupel garantiert alle Felder außer 'messages'.
+
     Args:
         json_file_path (str): Pfad zur JSON-Datei
-        h5_file_path (str): Pfad, wo die H5-Datei gespeichert werden soll
+        batch_size (int): Maximale Anzahl Nachrichten pro Batch
     """
-    print(f"Lese JSON-Datei: {json_file_path}")
-    
-    # JSON-Datei einlesen
     with open(json_file_path, 'r', encoding='utf-8') as file:
-        chat_data = json.load(file)
-    
-    print(f"Gefundene Chats: {len(chat_data)}")
-    
-    # Sammle zuerst alle Chats nach IDs, um Duplikate zu erkennen und zusammenzuführen
+        stream = JsonArrayStream(file)
+        stream.expect('[')
+        while True:
+            char = stream.peek()
+            if char == ']':
+                return
+            if char == ',':
+                stream.pos += 1
+                continue
+            if char == '':
+                raise ValueError("Ungültiges JSON: unerwartetes Dateiende")
+
+            stream.expect('{')
+            chat_meta = {}
+            pending = []  # Nachrichten, die vor der Chat-ID im Objekt stehen
+            while True:
+                char = stream.peek()
+                if char == '}':
+                    stream.pos += 1
+                    break
+                if char == ',':
+                    stream.pos += 1
+                    continue
+
+                key = stream.decode_value()
+                stream.expect(':')
+                if key != 'messages' or stream.peek() != '[':
+                    chat_meta[key] = stream.decode_value()
+                    continue
+
+                # Nachrichten-Array elementweise lesen
+                stream.expect('[')
+                batch = []
+                while True:
+                    char = stream.peek()
+                    if char == ']':
+                        stream.pos += 1
+                        break
+                    if char == ',':
+                        stream.pos += 1
+                        continue
+                    batch.append(stream.decode_value())
+                    if len(batch) >= batch_size:
+                        if 'chat_id' in chat_meta:
+                            yield chat_meta, batch
+                        else:
+                            pending.extend(batch)
+                        batch = []
+                if batch:
+                    if 'chat_id' in chat_meta:
+                        yield chat_meta, batch
+                    else:
+                        pending.extend(batch)
+
+            # Nachrichten, die vor der Chat-ID standen, erst jetzt ausgeben
+            for start in range(0, len(pending), batch_size):
+                yield chat_meta, pending[start:start + batch_size]
+            yield chat_meta, None
+
+
+def get_safe_chat_id(chat_id, verbose=True):
+    """Erstellt einen gültigen HDF5-Gruppennamen, indem ungültige Zeichen ersetzt werden."""
+    safe_chat_id = chat_id
+    if ":" in chat_id:
+        # HDF5 Pfade können keine Doppelpunkte enthalten, ersetzen durch Unterstrich
+        safe_chat_id = chat_id.replace(":", "_")
+        if verbose:
+            print(f"  Originale Chat-ID enthält unerlaubte Zeichen, verwende sicheren Namen: {safe_chat_id}")
+    return safe_chat_id
+
+
+def get_chat_name(chat_id, chat):
+    """Chat-Namen extrahieren oder aus der Chat-ID ableiten."""
+    if 'chat_name' in chat:
+        return chat['chat_name']
+    # Ableiten eines vernünftigen Chat-Namens aus der Chat-ID
+    parts = chat_id.split(':')
+    if len(parts) > 1 and parts[0].startswith('!'):
+        return parts[-1]  # Verwende die Domain als Chat-Namen
+    return chat_id
+
+
+def parse_timestamps(values, timezone=DEFAULT_TIMEZONE):
+    """
+    Parst Zeitstempel im Exportformat in einem Schritt zu int64-Unix-Timestamps
+    (Sekunden, UTC). Nicht parsebare Werte werden zu NaT (kleinster int64-Wert)
+    und sortieren damit vor allen gültigen Zeitstempeln.
+    Bei der Zeitumstellung geht kein gültiger Zeitstempel verloren: Uhrzeiten in der
+    doppelten Stunde im Herbst gelten als Sommerzeit (erstes Auftreten), Uhrzeiten in
+    der übersprungenen Stunde im Frühjahr werden auf den Beginn der Sommerzeit verschoben.
+
+    Args:
+        values (list): Zeitstempel-Strings (oder fehlende Werte)
+        timezone (str): Zeitzone, in der die Zeitstempel des Exports angegeben sind
+    """
+    parsed = pd.to_datetime(pd.Series(values, dtype=object), format=TIMESTAMP_FORMAT, errors='coerce')
+    if timezone != 'UTC':
+        parsed = parsed.dt.tz_localize(timezone, ambiguous=np.ones(len(parsed), dtype=bool),
+                                       nonexistent='shift_forward').dt.tz_convert(None)
+    return parsed.to_numpy(dtype='datetime64[s]').view(np.int64)
+
+
+def messages_to_columns(messages, timestamps=None, timezone=DEFAULT_TIMEZONE, keep_timestamp_str=True):
+    """
+    Wandelt eine Liste von Nachrichten-Dicts in Spalten für die H5-Datasets um.
+    Die Übersetzungsspalten sind None, wenn keine Nachricht eine Übersetzung hat,
+    'timestamp_str' ist None, wenn keep_timestamp_str False ist.
+    Bereits geparste Zeitstempel können über timestamps übergeben werden, damit
+    jeder Zeitstempel nur einmal geparst wird.
+    """
+    timestamp_strings = [msg.get('timestamp', '') for msg in messages]
+    if timestamps is None:
+        timestamps = parse_timestamps(timestamp_strings, timezone)
+
+    # Datenstrukturen für H5-Datasets vorbereiten
+    sender_aliases = []
+    message_texts = []
+    message_ids = []
+    message_deepl_texts = []
+    message_m2m100_texts = []
+    has_deepl = False
+    has_m2m100 = False
+
+    # Gehe durch jede Nachricht im Chat
+    for msg in messages:
+        # Sender und Nachrichtentext
+        sender_aliases.append(msg.get('sender_alias', ''))
+        message_texts.append(msg.get('message', ''))
+        message_ids.append(msg.get('message_id', -1))
+
+        # Übersetzte Nachricht (wenn vorhanden)
+        if 'message_deepl' in msg:
+            has_deepl = True
+            message_deepl_texts.append(msg['message_deepl'])
+        else:
+            message_deepl_texts.append('')
+
+        # Übersetzte Nachricht (wenn vorhanden)
+        if 'message_m2m100' in msg:
+            has_m2m100 = True
+            message_m2m100_texts.append(msg['message_m2m100'])
+        else:
+            message_m2m100_texts.append('')
+
+    return {
+        'timestamp': timestamps,
+        'timestamp_str': timestamp_strings if keep_timestamp_str else None,
+        'sender_alias': sender_aliases,
+        'message': message_texts,
+        'message_id': message_ids,
+        'message_deepl': message_deepl_texts if has_deepl else None,
+        'message_m2m100': message_m2m100_texts if has_m2m100 else None,
+    }
+
+
+def get_dataset_options(compression=None, compression_level=None, shuffle=False, chunk_size=None):
+    """
+    Stellt die Filter- und Chunk-Optionen für create_dataset zusammen.
+
+    Args:
+        compression (str): None, 'gzip' oder 'lzf'
+        compression_level (int): gzip-Stufe 0-9 (Standard: DEFAULT_GZIP_LEVEL)
+        shuffle (bool): Shuffle-Filter vor der Kompression anwenden
+        chunk_size (int): Zeilen pro Chunk (None: h5py wählt automatisch)
+    """
+    options = {}
+    if compression == 'gzip':
+        options['compression'] = 'gzip'
+        options['compression_opts'] = DEFAULT_GZIP_LEVEL if compression_level is None else compression_level
+    elif compression == 'lzf':
+        options['compression'] = 'lzf'
+    elif compression is not None:
+        raise ValueError(f"Unbekannter Kompressionsfilter: {compression}")
+    if shuffle:
+        options['shuffle'] = True
+    if chunk_size:
+        options['chunks'] = (chunk_size,)
+    return options
+
+
+def create_column(group, name, dtype, dataset_options=None, data=None, shape=None, resizable=False):
+    """
+    Legt ein eindimensionales Dataset mit den gewählten Filter- und Chunk-Optionen an.
+    Bei Datasets fester Größe wird die Chunkgröße auf die Länge begrenzt, da HDF5
+    keine Chunks zulässt, die größer als das Dataset sind.
+    """
+    options = dict(dataset_options or {})
+    n_rows = len(data) if data is not None else shape[0]
+    if resizable:
+        options['maxshape'] = (None,)
+        options.setdefault('chunks', True)
+    elif 'chunks' in options:
+        if n_rows:
+            options['chunks'] = (min(options['chunks'][0], n_rows),)
+        else:
+            del options['chunks']
+    if data is not None:
+        return group.create_dataset(name, data=data, dtype=dtype, **options)
+    return group.create_dataset(name, shape=shape, dtype=dtype, **options)
+
+
+def set_timestamp_attrs(dataset, timezone):
+    """Hinterlegt Einheit und Zeitzone der int64-Zeitstempel als Attribute."""
+    dataset.attrs['unit'] = TIMESTAMP_UNIT
+    dataset.attrs['timezone'] = timezone
+
+
+def timestamp_sort_keys(timestamps):
+    """Sortierschlüssel für int64-Zeitstempel, bei denen NaT (kleinster int64-Wert) zuletzt kommt."""
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    return np.where(timestamps == NAT_VALUE, np.iinfo(np.int64).max, timestamps)
+
+
+@PROFILER.span("time_index")
+def write_time_index(hf, timezone=DEFAULT_TIMEZONE, dataset_options=None):
+    """
+    Legt den Zeitindex einer fertig geschriebenen Datei an:
+    - 'time_order': pro Chat die Zeilen stabil nach Zeitstempel sortiert (NaT zuletzt);
+      in Layout 2 absolute Zeilen in /messages (time_order[start:end] gehört zum Chat),
+      in Layout 1 Zeilen innerhalb der Chat-Gruppe
+    - erster und letzter gültiger Zeitstempel pro Chat (Layout 2: Spalten
+      first_timestamp/last_timestamp in /chats, Layout 1: Attribute der Gruppe)
+      und für die ganze Datei (Attribute der Wurzelgruppe)
+    Fehlt ein gültiger Zeitstempel, wird NaT gespeichert. In Layout 1 werden nur
+    Gruppen ohne vorhandenen Zeitindex (neu oder ersetzt) berechnet.
+    """
+    first_timestamps = []
+    last_timestamps = []
+
+    if hf.attrs.get('layout_version', LAYOUT_VERSION_GROUPS) == LAYOUT_VERSION_COLUMNAR:
+        messages_group = hf['messages']
+        chats_group = hf['chats']
+        timestamps = messages_group['timestamp'][:]
+        starts = chats_group['start'][:]
+        ends = chats_group['end'][:]
+
+        # Die Zeilen eines Chats bilden einen Block (Startzeile), ungenutzte Zeilen je einen eigenen
+        blocks = np.arange(len(timestamps), dtype=np.int64)
+        for start, end in zip(starts, ends):
+            blocks[start:end] = start
+        time_order = np.lexsort((timestamp_sort_keys(timestamps), blocks))
+
+        # NaT liegt am Ende jedes Chats; der letzte gültige Zeitstempel steht davor
+        nat_before = np.concatenate([[0], np.cumsum(timestamps == NAT_VALUE)])
+        nat_counts = nat_before[ends] - nat_before[starts]
+        has_valid = ends - starts > nat_counts
+        chat_first = np.full(len(starts), NAT_VALUE, dtype=np.int64)
+        chat_last = np.full(len(starts), NAT_VALUE, dtype=np.int64)
+        chat_first[has_valid] = timestamps[time_order[starts[has_valid]]]
+        chat_last[has_valid] = timestamps[time_order[ends[has_valid] - 1 - nat_counts[has_valid]]]
+        first_timestamps = chat_first[has_valid]
+        last_timestamps = chat_last[has_valid]
+
+        for group, name, values in [(messages_group, 'time_order', time_order),
+                                    (chats_group, 'first_timestamp', chat_first),
+                                    (chats_group, 'last_timestamp', chat_last)]:
+            if name in group:
+                del group[name]
+            dataset = create_column(group, name, np.int64, dataset_options, data=values)
+            if name != 'time_order':
+                set_timestamp_attrs(dataset, timezone)
+    else:
+        for chat_group in hf.values():
+            if not isinstance(chat_group, h5py.Group) or 'timestamp' not in chat_group:
+                continue
+            if 'time_order' not in chat_group:
+                timestamps = chat_group['timestamp'][:]
+                create_column(chat_group, 'time_order', np.int64, dataset_options,
+                              data=np.argsort(timestamp_sort_keys(timestamps), kind='stable'))
+                valid = timestamps[timestamps != NAT_VALUE]
+                chat_group.attrs['first_timestamp'] = valid.min() if len(valid) else NAT_VALUE
+                chat_group.attrs['last_timestamp'] = valid.max() if len(valid) else NAT_VALUE
+            if chat_group.attrs['first_timestamp'] != NAT_VALUE:
+                first_timestamps.append(chat_group.attrs['first_timestamp'])
+                last_timestamps.append(chat_group.attrs['last_timestamp'])
+
+    hf.attrs['first_timestamp'] = np.min(first_timestamps) if len(first_timestamps) else NAT_VALUE
+    hf.attrs['last_timestamp'] = np.max(last_timestamps) if len(last_timestamps) else NAT_VALUE
+    hf.attrs['timestamp_unit'] = TIMESTAMP_UNIT
+    hf.attrs['timezone'] = timezone
+
+
+def local_days(timestamps, timezone=DEFAULT_TIMEZONE):
+    """Kalendertage (Tage seit 1970-01-01) gültiger int64-Zeitstempel in der Zeitzone des Exports."""
+    days = pd.to_datetime(timestamps, unit=TIMESTAMP_UNIT, utc=True)
+    if timezone != 'UTC':
+        days = days.tz_convert(timezone)
+    return days.tz_localize(None).to_numpy().astype('datetime64[D]').astype(np.int64)
+
+
+def count_pairs(groups, days):
+    """Zählt die Zeilen pro (Gruppe, Tag); liefert Gruppen, Tage und Anzahlen sortiert nach Gruppe und Tag."""
+    if not len(days):
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    first_day = days.min()
+    span = int(days.max() - first_day) + 1
+    keys, counts = np.unique(groups.astype(np.int64) * span + (days - first_day), return_counts=True)
+    return keys // span, keys % span + first_day, counts.astype(np.int64)
+
+
+def write_activity_stats(hf, timezone=DEFAULT_TIMEZONE, dataset_options=None):
+    """
+    Legt in Layout 2 die Gruppe /activity mit vorberechneten Aktivitätsstatistiken an,
+    damit der Viewer Statistiken und Diagramme zeigen kann, ohne Nachrichten zu lesen:
+    - 'daily_day'/'daily_count': Nachrichten pro Kalendertag der ganzen Datei
+    - 'chat_daily_chat'/'chat_daily_day'/'chat_daily_count': Nachrichten pro Chat (Zeile
+      in /chats) und Tag
+    - 'sender_count', 'sender_first_timestamp', 'sender_last_timestamp': Nachrichten sowie
+      erste und letzte Aktivität pro Sender (parallel zu /senders/sender_alias)
+    - 'sender_daily_sender'/'sender_daily_day'/'sender_daily_count': Nachrichten pro Sender und Tag
+    Tage zählen ab 1970-01-01 in der Zeitzone des Exports (Attribut 'timezone'); Nachrichten
+    ohne gültigen Zeitstempel fehlen in den Tageswerten. Anzahl, erste und letzte Aktivität
+    pro Chat stehen bereits in /chats (siehe write_time_index). Ungenutzte Zeilen nach dem
+    Anhängen werden nicht mitgezählt.
+    """
+    messages_group = hf['messages']
+    starts = hf['chats']['start'][:]
+    ends = hf['chats']['end'][:]
+    n_senders = hf['senders']['sender_alias'].shape[0]
+
+    # Chat jeder genutzten Zeile
+    row_chat = np.full(messages_group['timestamp'].shape[0], -1, dtype=np.int64)
+    for chat, (start, end) in enumerate(zip(starts, ends)):
+        row_chat[start:end] = chat
+    used = row_chat >= 0
+    timestamps = messages_group['timestamp'][:][used]
+    sender_codes = messages_group['sender_code'][:][used].astype(np.int64)
+    row_chat = row_chat[used]
+
+    valid = timestamps != NAT_VALUE
+    days = local_days(timestamps[valid], timezone)
+    valid_senders = sender_codes[valid]
+
+    sender_first = np.full(n_senders, NAT_VALUE, dtype=np.int64)
+    sender_last = np.full(n_senders, NAT_VALUE, dtype=np.int64)
+    if valid.any():
+        order = np.lexsort((timestamps[valid], valid_senders))
+        senders, first_pos = np.unique(valid_senders[order], return_index=True)
+        last_pos = np.append(first_pos[1:], len(order)) - 1
+        sender_first[senders] = timestamps[valid][order[first_pos]]
+        sender_last[senders] = timestamps[valid][order[last_pos]]
+
+    _, daily_day, daily_count = count_pairs(np.zeros(len(days), dtype=np.int64), days)
+    chat_daily = count_pairs(row_chat[valid], days)
+    sender_daily = count_pairs(valid_senders, days)
+
+    if 'activity' in hf:
+        del hf['activity']
+    activity_group = hf.create_group('activity')
+    activity_group.attrs['timezone'] = timezone
+    columns = {
+        'daily_day': daily_day,
+        'daily_count': daily_count,
+        'chat_daily_chat': chat_daily[0],
+        'chat_daily_day': chat_daily[1],
+        'chat_daily_count': chat_daily[2],
+        'sender_count': np.bincount(sender_codes, minlength=n_senders).astype(np.int64),
+        'sender_first_timestamp': sender_first,
+        'sender_last_timestamp': sender_last,
+        'sender_daily_sender': sender_daily[0],
+        'sender_daily_day': sender_daily[1],
+        'sender_daily_count': sender_daily[2],
+    }
+    for name, values in columns.items():
+        dataset = create_column(activity_group, name, np.int64, dataset_options, data=values)
+        if name.endswith('_timestamp'):
+            set_timestamp_attrs(dataset, timezone)
+
+
+def describe_dataset(dataset):
+    """Metadaten eines Datasets für die Strukturübersicht (ohne Daten zu lesen)."""
+    return {
+        'shape': list(dataset.shape),
+        'dtype': 'str' if h5py.check_string_dtype(dataset.dtype) is not None else str(dataset.dtype),
+        'storage_bytes': int(dataset.id.get_storage_size()),
+        'filters': describe_filters(dataset),
+    }
+
+
+@PROFILER.span("structure_summary")
+def write_structure_summary(hf):
+    """
+    Schreibt eine kompakte Übersicht über Struktur und Umfang der Datei als JSON in das
+    Wurzelattribut 'structure_summary', damit der Viewer sie ohne rekursiven Durchlauf
+    anzeigen kann. Gelesen werden nur Metadaten und die Chat-Tabelle.
+
+    Layout 2 listet jede Gruppe mit ihren Datasets (Form, Typ, belegter Speicher, Filter)
+    und Attributnamen. Layout 1 fasst die Chat-Gruppen zusammen: pro Dataset-Name die
+    Anzahl Gruppen, die Zeilensumme und der belegte Speicher.
+    """
+    layout = int(hf.attrs.get('layout_version', LAYOUT_VERSION_GROUPS))
+    summary = {'layout_version': layout, 'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'groups': {}}
+
+    if layout == LAYOUT_VERSION_COLUMNAR:
+        starts = hf['chats']['start'][:]
+        ends = hf['chats']['end'][:]
+        summary['chats'] = len(starts)
+        summary['messages'] = int((ends - starts).sum())
+        summary['senders'] = hf['senders']['sender_alias'].shape[0]
+        summary['dead_rows'] = int(hf['messages'].attrs.get('dead_rows', 0))
+
+        def visit(name, obj):
+            if isinstance(obj, h5py.Group):
+                summary['groups']['/' + name] = {
+                    'attrs': sorted(obj.attrs),
+                    'datasets': {key: describe_dataset(child) for key, child in obj.items()
+                                 if isinstance(child, h5py.Dataset)},
+                }
+        hf.visititems(visit)
+    else:
+        datasets = {}
+        chats = 0
+        messages = 0
+        for chat_group in hf.values():
+            if not isinstance(chat_group, h5py.Group):
+                continue
+            chats += 1
+            if 'message' in chat_group:
+                messages += chat_group['message'].shape[0]
+            for key, dataset in chat_group.items():
+                description = describe_dataset(dataset)
+                entry = datasets.setdefault(key, {'groups': 0, 'rows': 0, 'dtype': description['dtype'],
+                                                  'storage_bytes': 0, 'filters': description['filters']})
+                entry['groups'] += 1
+                entry['rows'] += dataset.shape[0]
+                entry['storage_bytes'] += description['storage_bytes']
+        summary['chats'] = chats
+        summary['messages'] = messages
+        summary['chat_groups'] = datasets
+
+    hf.attrs['structure_summary'] = json.dumps(summary, ensure_ascii=False)
+
+
+def prepare_fragment(messages, timezone=DEFAULT_TIMEZONE, sort=True):
+    """
+    Parst die Zeitstempel eines Chat-Fragments einmalig und liefert ein Tupel
+    (timestamps, messages), auf Wunsch stabil nach Zeitstempel sortiert.
+    """
+    timestamps = parse_timestamps([msg.get('timestamp') for msg in messages], timezone)
+    fragment = (timestamps, messages)
+    return sort_fragment(fragment) if sort else fragment
+
+
+def sort_fragment(fragment):
+    """Sortiert ein Fragment stabil nach Zeitstempel, falls es nicht schon sortiert ist."""
+    timestamps, messages = fragment
+    if np.all(timestamps[1:] >= timestamps[:-1]):
+        return fragment
+    order = np.argsort(timestamps, kind='stable')
+    return timestamps[order], [messages[i] for i in order]
+
+
+def merge_fragments(fragments):
+    """
+    Führt die sortierten Fragmente eines Chats per k-Wege-Merge zusammen und
+    entfernt doppelte Nachrichten anhand der message_id (die erste gewinnt;
+    Nachrichten ohne message_id werden nie als Duplikat betrachtet).
+
+    Returns:
+        tuple: (timestamps, messages, Anzahl entfernter Duplikate)
+    """
+    timestamps = []
+    messages = []
+    seen_ids = set()
+    duplicates = 0
+    runs = [zip(fragment_timestamps.tolist(), fragment_messages) for fragment_timestamps, fragment_messages in fragments]
+    for timestamp, msg in heapq.merge(*runs, key=itemgetter(0)):
+        message_id = msg.get('message_id', -1)
+        if message_id != -1:
+            if message_id in seen_ids:
+                duplicates += 1
+                continue
+            seen_ids.add(message_id)
+        timestamps.append(timestamp)
+        messages.append(msg)
+    return np.array(timestamps, dtype=np.int64), messages, duplicates
+
+
+def group_chats(chat_data):
+    """
+    Ordnet die Einträge eines eingelesenen Exports ihren Chat-IDs zu, ohne sie aufzubereiten.
+
+    Returns:
+        dict: Chat-ID -> Liste der Einträge (Fragmente) in der Reihenfolge des ersten Auftretens
+    """
     chat_dict = {}
-    
     for chat in chat_data:
         chat_id = chat['chat_id']
-        
         if chat_id in chat_dict:
-            # Dieser Chat wurde bereits gesehen - füge die Nachrichten zusammen
             print(f"Duplikat gefunden für Chat-ID: {chat_id} - füge Nachrichten zusammen")
-            existing_chat = chat_dict[chat_id]
-            
-            # Aktualisiere Metadaten
-            total_messages = existing_chat['message_count'] + chat['message_count']
-            existing_chat['message_count'] = total_messages
-            
-            # Sammle alle eindeutigen Sender
-            all_senders = set()
-            for msg in existing_chat['messages']:
-                if 'sender_alias' in msg:
-                    all_senders.add(msg['sender_alias'])
-            for msg in chat['messages']:
-                if 'sender_alias' in msg:
-                    all_senders.add(msg['sender_alias'])
-            
-            existing_chat['unique_sender_count'] = len(all_senders)
-            
-            # Füge die neuen Nachrichten hinzu
-            existing_chat['messages'].extend(chat['messages'])
-            
-            # Sortiere Nachrichten nach Zeitstempel
-            try:
-                existing_chat['messages'].sort(key=lambda msg: datetime.strptime(msg.get('timestamp', '1900-01-01 00:00:00'), 
-                                                                             "%Y-%m-%d %H:%M:%S"))
-            except:
-                print(f"  Fehler beim Sortieren der Nachrichten für Chat {chat_id}")
+            chat_dict[chat_id].append(chat)
         else:
-            # Neuer Chat
-            chat_dict[chat_id] = chat
-    
+            chat_dict[chat_id] = [chat]
     print(f"Eindeutige Chats nach Duplikatentfernung: {len(chat_dict)}")
-    
+    return chat_dict
+
+
+def normalize_chat(chat_id, chats, timezone=DEFAULT_TIMEZONE):
+    """
+    Bereitet die Fragmente eines Chats auf: Zeitstempel werden einmalig geparst; mehrere
+    Fragmente werden sortiert, per k-Wege-Merge zusammengeführt und nach message_id
+    dedupliziert, ihre Zähler summiert und die Sender vereinigt.
+
+    Returns:
+        dict: Zustand mit 'chat' (erstes Fragment), 'timestamps', 'messages',
+            'message_count', 'unique_sender_count' und 'senders' (None bei nur einem Fragment)
+    """
+    first = chats[0]
+    state = {
+        'chat': first,
+        'senders': None,
+        'message_count': first['message_count'],
+        'unique_sender_count': first['unique_sender_count'],
+    }
+    if len(chats) == 1:
+        state['timestamps'], state['messages'] = prepare_fragment(first['messages'], timezone, sort=False)
+        return state
+
+    timestamps, messages, duplicates = merge_fragments([prepare_fragment(chat['messages'], timezone)
+                                                        for chat in chats])
+    if duplicates:
+        print(f"  {duplicates} doppelte Nachrichten in Chat {chat_id} entfernt")
+    state['senders'] = {msg['sender_alias'] for chat in chats for msg in chat['messages'] if 'sender_alias' in msg}
+    state['message_count'] = sum(chat['message_count'] for chat in chats) - duplicates
+    state['unique_sender_count'] = len(state['senders'])
+    state['timestamps'] = timestamps
+    state['messages'] = messages
+    return state
+
+
+def collect_chats(chat_data, timezone=DEFAULT_TIMEZONE):
+    """
+    Fasst die Chats eines eingelesenen Exports nach Chat-ID zusammen und bereitet sie auf
+    (siehe group_chats und normalize_chat).
+
+    Returns:
+        dict: Chat-ID -> Zustand wie bei normalize_chat
+    """
+    return {chat_id: normalize_chat(chat_id, chats, timezone) for chat_id, chats in group_chats(chat_data).items()}
+
+
+def write_chats_pipelined(writer, chats, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Schreibt Chats in einem eigenen Schreib-Thread, während der aufrufende Thread die
+    nächsten aufbereitet. chats ist ein Iterator über (chat_id, chat_name, message_count,
+    unique_sender_count, columns), dessen Aufbereitung erst beim Durchlaufen passiert.
+    Die Chats werden zu Batches von mindestens batch_size Zeilen gebündelt und über eine
+    begrenzte Queue (PIPELINE_DEPTH Batches) weitergereicht; der Layout-Writer fasst sie zu
+    großen Schreibzugriffen auf erweiterbare Datasets zusammen. h5py serialisiert alle
+    HDF5-Aufrufe über eine globale Sperre und gibt den GIL beim Schreiben größtenteils nicht
+    frei; Aufbereitung und Schreiben überlappen daher nur, soweit der Schreib-Thread auf
+    Datei-I/O wartet oder die Aufbereitung außerhalb des Interpreters läuft (JSON-Parsing in
+    den Worker-Prozessen, numpy/pandas-Operationen). Der Gewinn ist dadurch begrenzt und
+    hängt eher vom Speichermedium als von PIPELINE_DEPTH ab.
+    Ein Fehler im Schreib-Thread beendet die Aufbereitung vor dem nächsten Chat und wird
+    hier erneut ausgelöst; bei einem Fehler der Aufbereitung endet der Schreib-Thread nach
+    den bereits übergebenen Batches. writer.close() bleibt dem Aufrufer überlassen.
+    """
+    batches = queue.Queue(maxsize=PIPELINE_DEPTH)
+    failed = threading.Event()
+    errors = []
+
+    def write_batches():
+        try:
+            with PROFILER.span("writer_thread"):
+                while True:
+                    batch = batches.get()
+                    if batch is None:
+                        return
+                    for chat in batch:
+                        with PROFILER.span("write_chat"):
+                            writer.write_chat(*chat)
+        except BaseException as error:
+            errors.append(error)
+            failed.set()
+
+    def put(item):
+        # Nicht blockieren, wenn der Schreib-Thread ausgefallen ist und die Queue nicht mehr leert
+        while not failed.is_set():
+            try:
+                batches.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    thread = threading.Thread(target=write_batches, name="h5-writer", daemon=True)
+    thread.start()
+    try:
+        chats = iter(chats)
+        batch = []
+        batch_rows = 0
+        # Vor jedem Chat prüfen, damit nach einem Schreibfehler nichts mehr aufbereitet wird
+        while not failed.is_set():
+            chat = next(chats, None)
+            if chat is None:
+                if batch:
+                    put(batch)
+                break
+            batch.append(chat)
+            batch_rows += len(chat[4]['message']) if chat[4] is not None else 0
+            if batch_rows >= batch_size:
+                put(batch)
+                batch = []
+                batch_rows = 0
+    finally:
+        # Der Schreib-Thread endet immer: mit dem Endsignal oder nach seinem Fehler
+        put(None)
+        thread.join()
+    if errors:
+        raise errors[0]
+
+
+def convert_json_to_h5(json_file_path, h5_file_path, stream=False, batch_size=DEFAULT_BATCH_SIZE,
+                       timezone=DEFAULT_TIMEZONE, keep_timestamp_str=True, layout=DEFAULT_LAYOUT_VERSION,
+                       dataset_options=None, string_encoding=DEFAULT_STRING_ENCODING, swmr=False):
+    """
+    Konvertiert eine JSON-Datei mit Chat-Daten in eine H5-Datei.
+    Behandelt doppelte Chat-IDs, indem die Nachrichten zusammengeführt werden.
+
+    Args:
+        json_file_path (str): Pfad zur JSON-Datei
+        h5_file_path (str): Pfad, wo die H5-Datei gespeichert werden soll
+        stream (bool): JSON inkrementell lesen und direkt in die H5-Datei schreiben,
+            statt die ganze Datei in den Speicher zu laden
+        batch_size (int): Maximale Anzahl Nachrichten, die im Streaming-Modus
+            gleichzeitig im Speicher gehalten werden
+        timezone (str): Zeitzone der Zeitstempel im Export; gespeichert werden
+            int64-Unix-Timestamps mit Einheit und Zeitzone als Attribute
+        keep_timestamp_str (bool): Zeitstempel zusätzlich als String speichern
+        layout (int): Layout-Version der H5-Datei (1: eine Gruppe pro Chat,
+            2: globale Spalten mit Chat-Tabelle)
+        dataset_options (dict): Filter- und Chunk-Optionen für die Datasets,
+            siehe get_dataset_options
+        string_encoding (str): Kodierung der Textspalten in Layout 2 ('vlen' oder 'blob',
+            siehe STRING_ENCODING_BLOB)
+        swmr (bool): Layout 2 im SWMR-Modus schreiben, damit der Viewer die Datei
+            schon während der Konvertierung lesen kann
+    """
+    if stream:
+        convert_json_to_h5_streaming(json_file_path, h5_file_path, batch_size, timezone, keep_timestamp_str, layout,
+                                     dataset_options, string_encoding, swmr)
+        return
+
+    print(f"Lese JSON-Datei: {json_file_path}")
+
+    # JSON-Datei einlesen
+    with PROFILER.span("read_json"), open(json_file_path, 'r', encoding='utf-8') as file:
+        chat_data = json.load(file)
+
+    print(f"Gefundene Chats: {len(chat_data)}")
+
+    with PROFILER.span("group_chats"):
+        chat_dict = group_chats(chat_data)
+
+    def prepare_chats():
+        # Aufbereitung Chat für Chat, während der Schreib-Thread die vorherigen schreibt
+        for chat_idx, (chat_id, chats) in enumerate(chat_dict.items()):
+            print(f"Verarbeite Chat {chat_idx+1}/{len(chat_dict)}: {chat_id}")
+            with PROFILER.span("normalize_chat"):
+                state = normalize_chat(chat_id, chats, timezone)
+
+            # Extrahiere Nachrichtendaten
+            columns = None
+            if state['messages']:
+                with PROFILER.span("messages_to_columns"):
+                    columns = messages_to_columns(state['messages'], state['timestamps'],
+                                                  keep_timestamp_str=keep_timestamp_str)
+            yield (chat_id, get_chat_name(chat_id, state['chat']), state['message_count'],
+                   state['unique_sender_count'], columns)
+
     # H5-Datei erstellen
-    with h5py.File(h5_file_path, 'w') as hf:
+    with create_output_file(h5_file_path, swmr) as hf:
+        writer = create_layout_writer(hf, layout, timezone, batch_size, dataset_options,
+                                      string_encoding=string_encoding, swmr=swmr)
+
         # Durchlaufe jeden Chat (jetzt ohne Duplikate)
-        for chat_idx, (chat_id, chat) in enumerate(chat_dict.items()):
+        with PROFILER.span("write_chats"):
+            write_chats_pipelined(writer, prepare_chats(), batch_size)
+
+        with PROFILER.span("close"):
+            writer.close()
+
+    print(f"Konvertierung abgeschlossen. H5-Datei gespeichert unter: {h5_file_path}")
+
+
+def prepare_shard(json_file_path, timezone=DEFAULT_TIMEZONE, keep_timestamp_str=True):
+    """
+    Liest eine Teildatei (Shard) eines Exports ein und bereitet ihre Chats für den
+    Schreibprozess vor. Läuft in einem Worker-Prozess: JSON-Parsing, Zeitstempel und
+    Spaltenaufbereitung passieren hier, Duplikate innerhalb der Datei werden bereits
+    zusammengeführt.
+
+    Returns:
+        dict: Chat-ID -> {'chat_name', 'message_count', 'unique_sender_count',
+            'senders', 'columns'} in der Reihenfolge des ersten Auftretens
+    """
+    with open(json_file_path, 'r', encoding='utf-8') as file:
+        chat_data = json.load(file)
+
+    print(f"Gelesen: {json_file_path} ({len(chat_data)} Chats)")
+
+    shard = {}
+    for chat_id, state in collect_chats(chat_data, timezone).items():
+        senders = state['senders']
+        if senders is None:
+            senders = {msg['sender_alias'] for msg in state['messages'] if 'sender_alias' in msg}
+        columns = None
+        if state['messages']:
+            columns = messages_to_columns(state['messages'], state['timestamps'], keep_timestamp_str=keep_timestamp_str)
+        shard[chat_id] = {
+            'chat_name': get_chat_name(chat_id, state['chat']),
+            'message_count': state['message_count'],
+            'unique_sender_count': state['unique_sender_count'],
+            'senders': senders,
+            'columns': columns,
+        }
+    return shard
+
+
+def group_shards(shards):
+    """
+    Ordnet die Einträge der vorbereiteten Shards in Eingabereihenfolge ihren Chat-IDs zu.
+
+    Returns:
+        dict: Chat-ID -> Liste der Einträge wie bei prepare_shard
+    """
+    chat_dict = {}
+    for shard in shards:
+        for chat_id, entry in shard.items():
+            if chat_id in chat_dict:
+                print(f"Duplikat gefunden für Chat-ID: {chat_id} - füge Nachrichten zusammen")
+                chat_dict[chat_id].append(entry)
+            else:
+                chat_dict[chat_id] = [entry]
+
+    print(f"Eindeutige Chats nach Duplikatentfernung: {len(chat_dict)}")
+    return chat_dict
+
+
+def merge_entries(chat_id, entries, keep_timestamp_str=True):
+    """
+    Führt die Einträge eines Chats aus mehreren Shards zusammen. Es gelten dieselben
+    Regeln wie bei doppelten Chats in einer Datei: Name des ersten Fragments,
+    message_count wird summiert, Nachrichten werden nach Zeitstempel gemischt und
+    nach message_id dedupliziert (die erste gewinnt).
+
+    Returns:
+        dict: Eintrag wie bei prepare_shard (ohne 'senders')
+    """
+    first = entries[0]
+    if len(entries) == 1:
+        del first['senders']
+        return first
+
+    fragments = [sort_fragment(columns_to_fragment(entry['columns']))
+                 for entry in entries if entry['columns'] is not None]
+    timestamps, messages, duplicates = merge_fragments(fragments)
+    if duplicates:
+        print(f"  {duplicates} doppelte Nachrichten in Chat {chat_id} entfernt")
+
+    return {
+        'chat_name': first['chat_name'],
+        'message_count': sum(entry['message_count'] for entry in entries) - duplicates,
+        'unique_sender_count': len(set().union(*(entry['senders'] for entry in entries))),
+        'columns': messages_to_columns(messages, timestamps,
+                                       keep_timestamp_str=keep_timestamp_str) if messages else None,
+    }
+
+
+def convert_json_files_to_h5(json_file_paths, h5_file_path, workers=None, batch_size=DEFAULT_BATCH_SIZE,
+                             timezone=DEFAULT_TIMEZONE, keep_timestamp_str=True, layout=DEFAULT_LAYOUT_VERSION,
+                             dataset_options=None, string_encoding=DEFAULT_STRING_ENCODING, swmr=False):
+    """
+    Konvertiert mehrere JSON-Dateien (Shards eines Exports) in eine H5-Datei.
+    Die Dateien werden parallel in Worker-Prozessen eingelesen und aufbereitet,
+    geschrieben wird von einem einzigen Prozess. Chats, die in mehreren Dateien
+    vorkommen, werden wie Duplikate in convert_json_to_h5 zusammengeführt.
+
+    Args:
+        json_file_paths (list): Pfade der JSON-Dateien in Zusammenführungsreihenfolge
+        h5_file_path (str): Pfad, wo die H5-Datei gespeichert werden soll
+        workers (int): Anzahl Worker-Prozesse (Standard: Anzahl CPU-Kerne);
+            1 verarbeitet alle Dateien im aktuellen Prozess
+        weitere Argumente wie bei convert_json_to_h5
+    """
+    workers = min(workers or os.cpu_count() or 1, len(json_file_paths))
+    print(f"Lese {len(json_file_paths)} JSON-Dateien mit {workers} Prozessen")
+
+    # Abschnitte in den Worker-Prozessen werden nicht einzeln gemessen
+    arguments = (json_file_paths, repeat(timezone), repeat(keep_timestamp_str))
+    with PROFILER.span("read_shards"):
+        if workers > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                shards = list(executor.map(prepare_shard, *arguments))
+        else:
+            shards = list(map(prepare_shard, *arguments))
+
+    with PROFILER.span("group_shards"):
+        chat_dict = group_shards(shards)
+    del shards
+
+    def merge_chats():
+        # Zusammenführung Chat für Chat, während der Schreib-Thread die vorherigen schreibt
+        for chat_idx, (chat_id, entries) in enumerate(chat_dict.items()):
             print(f"Verarbeite Chat {chat_idx+1}/{len(chat_dict)}: {chat_id}")
-            
-            # Erstelle einen gültigen HDF5-Gruppenname, indem ungültige Zeichen ersetzt werden
-            safe_chat_id = chat_id
-            if ":" in chat_id:
-                # HDF5 Pfade können keine Doppelpunkte enthalten, ersetzen durch Unterstrich
-                safe_chat_id = chat_id.replace(":", "_")
-                print(f"  Originale Chat-ID enthält unerlaubte Zeichen, verwende sicheren Namen: {safe_chat_id}")
-            
-            # Gruppe für diesen Chat erstellen
-            chat_group = hf.create_group(safe_chat_id)
-            
-            # Speichere die originale Chat-ID auch als Attribut
-            chat_group.attrs['original_chat_id'] = chat_id
-            
-            # Chat-Metadaten als Attribute hinzufügen
-            chat_group.attrs['unique_sender_count'] = chat['unique_sender_count']
-            chat_group.attrs['message_count'] = chat['message_count']
-            
-            # Chat-Namen extrahieren und bereinigen
-            if 'chat_name' in chat:
-                chat_name = chat['chat_name']
+            with PROFILER.span("merge_entries"):
+                entry = merge_entries(chat_id, entries, keep_timestamp_str)
+            yield chat_id, entry['chat_name'], entry['message_count'], entry['unique_sender_count'], entry['columns']
+
+    with create_output_file(h5_file_path, swmr) as hf:
+        writer = create_layout_writer(hf, layout, timezone, batch_size, dataset_options,
+                                      string_encoding=string_encoding, swmr=swmr)
+
+        with PROFILER.span("write_chats"):
+            write_chats_pipelined(writer, merge_chats(), batch_size)
+
+        with PROFILER.span("close"):
+            writer.close()
+
+    print(f"Konvertierung abgeschlossen. H5-Datei gespeichert unter: {h5_file_path}")
+
+
+def append_columns(chat_group, columns, timezone=DEFAULT_TIMEZONE, dataset_options=None):
+    """
+    Hängt einen Batch von Spalten an die (erweiterbaren) Datasets einer Chat-Gruppe an.
+    Fehlende Datasets werden angelegt; bei Übersetzungen, die erst in einem späteren
+    Batch auftauchen, werden die bisherigen Zeilen mit '' aufgefüllt.
+    """
+    dt_string = h5py.special_dtype(vlen=str)
+    n_old = chat_group['timestamp'].shape[0] if 'timestamp' in chat_group else 0
+    n_new = len(columns['timestamp'])
+
+    for name, values in columns.items():
+        if name not in chat_group:
+            if values is None:
+                continue
+            dataset = create_column(chat_group, name, NUMERIC_COLUMNS.get(name, dt_string), dataset_options,
+                                    shape=(n_old,), resizable=True)
+            if n_old:
+                dataset[:] = [''] * n_old
+            if name == 'timestamp':
+                set_timestamp_attrs(dataset, timezone)
+        dataset = chat_group[name]
+        if values is None:
+            values = [''] * n_new
+        dataset.resize((n_old + n_new,))
+        dataset[n_old:] = values
+
+
+def append_blob_strings(group, name, values, dataset_options=None, first_row=0):
+    """
+    Hängt Texte an die Blob-Spalte name an (siehe STRING_ENCODING_BLOB); die beiden
+    Datasets werden beim ersten Aufruf angelegt, die ersten first_row Zeilen bleiben leer.
+    """
+    if f'{name}_offsets' not in group:
+        blob_options = dict(dataset_options or {})
+        blob_options['chunks'] = (BLOB_CHUNK_BYTES,)
+        create_column(group, f'{name}_blob', np.uint8, blob_options, shape=(0,), resizable=True)
+        offsets_dataset = create_column(group, f'{name}_offsets', np.int64, dataset_options, shape=(0,),
+                                        resizable=True)
+        offsets_dataset.resize((first_row + 1,))
+        offsets_dataset[:] = 0
+    if not len(values):
+        return
+    encoded = [value.encode('utf-8') for value in values]
+    lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded))
+    blob_dataset = group[f'{name}_blob']
+    offsets_dataset = group[f'{name}_offsets']
+    n_bytes = blob_dataset.shape[0]
+    n_old = offsets_dataset.shape[0]
+    offsets_dataset.resize((n_old + len(encoded),))
+    offsets_dataset[n_old:] = n_bytes + np.cumsum(lengths)
+    if lengths.sum():
+        blob_dataset.resize((n_bytes + int(lengths.sum()),))
+        blob_dataset[n_bytes:] = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+
+
+def has_string_column(group, name):
+    """Prüft, ob die Spalte name als Dataset oder als Blob-Spalte vorhanden ist."""
+    return name in group or f'{name}_offsets' in group
+
+
+def string_column_length(group, name):
+    """Anzahl Zeilen der String-Spalte name (vlen oder Blob)."""
+    if name in group:
+        return group[name].shape[0]
+    return group[f'{name}_offsets'].shape[0] - 1
+
+
+def read_string_column(group, name, start, end):
+    """Liest die Zeilen [start, end) der String-Spalte name (vlen oder Blob) als Liste."""
+    if name in group:
+        return group[name].asstr()[start:end].tolist()
+    # Blob: ein zusammenhängender Bytebereich für alle Zeilen
+    offsets = group[f'{name}_offsets'][start:end + 1]
+    data = group[f'{name}_blob'][offsets[0]:offsets[-1]].tobytes()
+    offsets = (offsets - offsets[0]).tolist()
+    return [data[begin:stop].decode('utf-8') for begin, stop in zip(offsets[:-1], offsets[1:])]
+
+
+def get_string_encoding(messages_group):
+    """Ermittelt die Kodierung der Textspalten einer vorhandenen Datei im Layout 2."""
+    return STRING_ENCODING_BLOB if 'message_offsets' in messages_group else STRING_ENCODING_VLEN
+
+
+def append_sparse_column(group, name, rows, values, dataset_options=None, string_encoding=DEFAULT_STRING_ENCODING):
+    """
+    Hängt Zeilen und Texte an die dünn besetzte Spalte name (siehe SPARSE_COLUMNS) an;
+    die beiden Datasets werden beim ersten Aufruf angelegt, die Texte in der Kodierung
+    string_encoding.
+    """
+    if f'{name}_rows' not in group:
+        create_column(group, f'{name}_rows', np.int64, dataset_options, shape=(0,), resizable=True)
+        if string_encoding == STRING_ENCODING_BLOB:
+            append_blob_strings(group, f'{name}_values', [], dataset_options)
+        else:
+            create_column(group, f'{name}_values', h5py.special_dtype(vlen=str), dataset_options, shape=(0,),
+                          resizable=True)
+    if not rows:
+        return
+    n_old = group[f'{name}_rows'].shape[0]
+    dataset = group[f'{name}_rows']
+    dataset.resize((n_old + len(rows),))
+    dataset[n_old:] = np.asarray(rows, dtype=np.int64)
+    if f'{name}_values' in group:
+        dataset = group[f'{name}_values']
+        dataset.resize((n_old + len(rows),))
+        dataset[n_old:] = values
+    else:
+        append_blob_strings(group, f'{name}_values', values, dataset_options)
+
+
+def delete_sparse_column(group, name):
+    """Entfernt die Datasets der dünn besetzten Spalte name (Zeilen und Texte in jeder Kodierung)."""
+    for dataset_name in [f'{name}_rows', f'{name}_values', f'{name}_values_blob', f'{name}_values_offsets']:
+        if dataset_name in group:
+            del group[dataset_name]
+
+
+def read_sparse_column(group, name, start, end, sparse_rows=None):
+    """
+    Liest die dünn besetzte Spalte name für die Zeilen [start, end) als Liste mit ''
+    für Zeilen ohne Wert. sparse_rows kann das bereits gelesene '<name>_rows' sein.
+    """
+    if sparse_rows is None:
+        sparse_rows = group[f'{name}_rows'][:]
+    first, last = np.searchsorted(sparse_rows, [start, end])
+    values = [''] * (end - start)
+    for row, value in zip((sparse_rows[first:last] - start).tolist(),
+                          read_string_column(group, f'{name}_values', int(first), int(last))):
+        values[row] = value
+    return values
+
+
+class GroupLayoutWriter:
+    """
+    Schreibt Layout 1: eine HDF5-Gruppe pro Chat mit eigenen Datasets.
+    Ein bereits vorhandener Chat wird durch write_chat vollständig ersetzt.
+    """
+
+    def __init__(self, hf, timezone=DEFAULT_TIMEZONE, dataset_options=None):
+        self.hf = hf
+        self.timezone = timezone
+        self.dataset_options = dataset_options
+
+    def write_chat(self, chat_id, chat_name, message_count, unique_sender_count, columns):
+        # Gruppe für diesen Chat erstellen (beim Anhängen vorhandene Gruppe ersetzen)
+        safe_chat_id = get_safe_chat_id(chat_id)
+        if safe_chat_id in self.hf:
+            del self.hf[safe_chat_id]
+        chat_group = self.hf.create_group(safe_chat_id)
+
+        # Speichere die originale Chat-ID auch als Attribut
+        chat_group.attrs['original_chat_id'] = chat_id
+
+        # Chat-Metadaten als Attribute hinzufügen
+        chat_group.attrs['unique_sender_count'] = unique_sender_count
+        chat_group.attrs['message_count'] = message_count
+        chat_group.attrs['chat_name'] = chat_name
+
+        if columns is None:
+            return
+
+        # Erstelle Datasets für die Nachrichtendaten
+        dt_string = h5py.special_dtype(vlen=str)
+        for name in MESSAGE_COLUMNS:
+            if columns.get(name) is None:
+                continue
+            dataset = create_column(chat_group, name, NUMERIC_COLUMNS.get(name, dt_string), self.dataset_options,
+                                    data=columns[name])
+            if name == 'timestamp':
+                set_timestamp_attrs(dataset, self.timezone)
+
+    def read_chat(self, chat_id):
+        """
+        Liest einen vorhandenen Chat vollständig (für den Anhängemodus).
+
+        Returns:
+            tuple: (Spalten, Attribute) oder None, wenn der Chat nicht existiert
+        """
+        chat_group = self.hf.get(get_safe_chat_id(chat_id, verbose=False))
+        if chat_group is None:
+            return None
+        columns = read_chat_group_columns(chat_group) if 'message' in chat_group else None
+        return columns, dict(chat_group.attrs)
+
+    def close(self):
+        write_time_index(self.hf, self.timezone, self.dataset_options)
+        write_structure_summary(self.hf)
+
+
+class ColumnarLayoutWriter:
+    """
+    Schreibt Layout 2: alle Nachrichten liegen in wenigen globalen Spalten unter
+    /messages, gruppiert nach Chat. /chats ist eine kleine Chat-Tabelle mit ID,
+    Namen, Zählern und dem Zeilenbereich [start, end) jedes Chats (CSR-artiger
+    Offset-Index); die Sortierung nach Zeitstempel liefert der Zeitindex
+    (siehe write_time_index).
+    Sender werden dictionary-kodiert: /messages/sender_code verweist auf die
+    Zeile in der Sender-Tabelle /senders/sender_alias.
+    Chats werden gepuffert und in Blöcken von mindestens batch_size Zeilen geschrieben.
+    Übersetzungen werden dünn besetzt gespeichert (siehe SPARSE_COLUMNS), nur beim
+    Fortschreiben einer älteren Datei mit voll besetzter Spalte bleibt diese voll besetzt.
+    Texte werden mit string_encoding='blob' als UTF-8-Blob mit Offsets gespeichert
+    (siehe STRING_ENCODING_BLOB); beim Fortschreiben gilt die Kodierung der Datei.
+
+    Mit append=True wird eine vorhandene Datei fortgeschrieben: Ein erneut
+    geschriebener Chat wird ans Ende der Spalten gehängt und sein Eintrag in der
+    Chat-Tabelle umgebogen; die alten Zeilen bleiben als ungenutzte Zeilen stehen
+    (Attribut 'dead_rows' von /messages).
+
+    Mit swmr=True wird die Datei im HDF5-Modus Single-Writer/Multiple-Reader geschrieben
+    (siehe publish): Leser sehen nach jedem Block die bis dahin geschriebenen Chats.
+    Jeder Schreibvorgang trägt eine eigene ID (Attribut 'ingest_id'); 'ingest_complete'
+    wird erst am Ende gesetzt.
+    """
+
+    def __init__(self, hf, timezone=DEFAULT_TIMEZONE, batch_size=DEFAULT_BATCH_SIZE, dataset_options=None,
+                 append=False, string_encoding=DEFAULT_STRING_ENCODING, swmr=False):
+        self.hf = hf
+        self.swmr = swmr
+        self.published_chats = 0
+        self.published_senders = 0
+        self.timezone = timezone
+        self.batch_size = batch_size
+        self.dataset_options = dataset_options
+        self.pending = []
+        self.pending_rows = 0
+
+        if append:
+            self.messages_group = hf['messages']
+            self.chats_group = hf['chats']
+            self.senders_group = hf['senders']
+            self.chat_table = {}
+            for name in CHAT_TABLE_COLUMNS:
+                dataset = self.chats_group[name]
+                values = dataset[:] if name in CHAT_TABLE_NUMERIC_COLUMNS else dataset.asstr()[:]
+                self.chat_table[name] = values.tolist()
+            self.sender_codes = {alias: code for code, alias in
+                                 enumerate(self.senders_group['sender_alias'].asstr()[:].tolist())}
+            self.row_count = self.messages_group['timestamp'].shape[0]
+            self.string_encoding = get_string_encoding(self.messages_group)
+        else:
+            hf.attrs['layout_version'] = LAYOUT_VERSION_COLUMNAR
+            self.messages_group = hf.create_group('messages')
+            self.chats_group = hf.create_group('chats')
+            self.senders_group = hf.create_group('senders')
+            self.chat_table = {name: [] for name in CHAT_TABLE_COLUMNS}
+            self.sender_codes = {}
+            self.row_count = 0
+            self.string_encoding = string_encoding
+        hf.attrs['ingest_id'] = uuid.uuid4().hex
+        hf.attrs['ingest_complete'] = False
+        self.chat_index = {chat_id: idx for idx, chat_id in enumerate(self.chat_table['chat_id'])}
+        self.sparse_columns = [name for name in SPARSE_COLUMNS if name not in self.messages_group]
+        self.sparse_rows = {}
+
+    def write_chat(self, chat_id, chat_name, message_count, unique_sender_count, columns):
+        self.write_chat_batches(chat_id, chat_name, message_count, unique_sender_count,
+                                [columns] if columns is not None else [])
+
+    def write_chat_batches(self, chat_id, chat_name, message_count, unique_sender_count, batches):
+        """
+        Schreibt einen Chat, dessen Spalten in mehreren Batches kommen (Iterator über
+        Spalten-Dicts wie bei write_chat). Die Zeilen des Chats liegen trotzdem zusammenhängend;
+        gepuffert werden höchstens etwa batch_size Zeilen plus ein Batch, auch bei großen Chats.
+        """
+        start = self.row_count
+        for columns in batches:
+            n_rows = len(columns['message'])
+            if not n_rows:
+                continue
+            if self.pending_rows >= self.batch_size:
+                self.flush()
+            self.pending.append(columns)
+            self.pending_rows += n_rows
+            self.row_count += n_rows
+
+        values = {
+            'chat_id': chat_id,
+            'chat_name': chat_name,
+            'message_count': message_count,
+            'unique_sender_count': unique_sender_count,
+            'start': start,
+            'end': self.row_count,
+        }
+        idx = self.chat_index.get(chat_id)
+        if idx is None:
+            # Neuer Chat: Zeile an die Chat-Tabelle anhängen
+            self.chat_index[chat_id] = len(self.chat_table['chat_id'])
+            for name, value in values.items():
+                self.chat_table[name].append(value)
+        else:
+            # Vorhandener Chat: Eintrag auf die neu geschriebenen Zeilen umbiegen
+            for name, value in values.items():
+                self.chat_table[name][idx] = value
+
+        if self.pending_rows >= self.batch_size:
+            self.flush()
+
+    @PROFILER.span("flush")
+    def flush(self):
+        """Schreibt alle gepufferten Chats mit einem Schreibzugriff pro Spalte."""
+        if not self.pending:
+            return
+        first_row = self.row_count - self.pending_rows
+        combined = {}
+        for name in MESSAGE_COLUMNS:
+            parts = [columns.get(name) for columns in self.pending]
+            if all(part is None for part in parts):
+                combined[name] = None
+            elif name in self.sparse_columns:
+                # Nur nicht leere Übersetzungen mit ihrer Zeile in /messages speichern
+                rows = []
+                values = []
+                offset = first_row
+                for part, columns in zip(parts, self.pending):
+                    if part is not None:
+                        for row, value in enumerate(part, offset):
+                            if value:
+                                rows.append(row)
+                                values.append(value)
+                    offset += len(columns['message'])
+                append_sparse_column(self.messages_group, name, rows, values, self.dataset_options,
+                                     self.string_encoding)
+                combined[name] = None
+            elif name in NUMERIC_COLUMNS:
+                combined[name] = np.concatenate([np.asarray(part, dtype=NUMERIC_COLUMNS[name]) for part in parts])
             else:
-                # Ableiten eines vernünftigen Chat-Namens aus der Chat-ID
-                parts = chat_id.split(':')
-                if len(parts) > 1 and parts[0].startswith('!'):
-                    chat_name = parts[-1]  # Verwende die Domain als Chat-Namen
-                else:
-                    chat_name = chat_id
-            
-            chat_group.attrs['chat_name'] = chat_name
-            
-            # Extrahiere Nachrichtendaten
-            messages = chat['messages']
-            if messages:
-                # Datenstrukturen für H5-Datasets vorbereiten
-                timestamps = []
-                timestamp_strings = []
-                sender_aliases = []
-                message_texts = []
-                message_ids = []
-                message_deepl_texts = []
-                message_m2m100_texts = []
-                has_deepl = False
-                has_m2m100 = False
-                
-                # Gehe durch jede Nachricht im Chat
-                for msg in messages:
-                    # Zeitstempel als Unix-Timestamp und als String speichern
-                    try:
-                        dt = datetime.strptime(msg['timestamp'], "%Y-%m-%d %H:%M:%S")
-                        timestamps.append(dt.timestamp())
-                        timestamp_strings.append(msg['timestamp'])
-                    except:
-                        timestamps.append(np.nan)
-                        timestamp_strings.append(msg.get('timestamp', ''))
-                    
-                    # Sender und Nachrichtentext
-                    sender_aliases.append(msg.get('sender_alias', ''))
-                    message_texts.append(msg.get('message', ''))
-                    message_ids.append(msg.get('message_id', -1))
-                    
-                    # Übersetzte Nachricht (wenn vorhanden)
-                    if 'message_deepl' in msg:
-                        has_deepl = True
-                        message_deepl_texts.append(msg['message_deepl'])
-                    else:
-                        message_deepl_texts.append('')
+                # Chats ohne diese Spalte (z. B. ohne Übersetzungen) mit '' auffüllen
+                combined[name] = list(chain.from_iterable(
+                    part if part is not None else [''] * len(columns['message'])
+                    for part, columns in zip(parts, self.pending)))
+                if (self.string_encoding == STRING_ENCODING_BLOB and name != 'sender_alias'
+                        and name not in self.messages_group):
+                    append_blob_strings(self.messages_group, name, combined[name], self.dataset_options, first_row)
+                    combined[name] = None
+        append_columns(self.messages_group, self.encode_senders(combined), self.timezone, self.dataset_options)
+        self.pending = []
+        self.pending_rows = 0
+        if self.swmr:
+            self.publish()
+
+    def publish(self):
+        """
+        SWMR-Modus: hängt die seit dem letzten Aufruf hinzugekommenen Sender und Chats an
+        die Tabellen an und macht den Stand für Leser sichtbar. Die Reihenfolge Zeilen,
+        Sender, Chats mit je einem hf.flush() sorgt dafür, dass ein Leser nur Chats sieht,
+        deren Zeilen und Sender bereits in der Datei stehen.
+        Beim ersten Aufruf werden die übrigen Datasets angelegt und der SWMR-Modus
+        eingeschaltet; danach lassen sich keine Datasets oder Attribute mehr anlegen.
+        """
+        if not self.hf.swmr_mode:
+            for name in self.sparse_columns:
+                append_sparse_column(self.messages_group, name, [], [], self.dataset_options, self.string_encoding)
+            dt_string = h5py.special_dtype(vlen=str)
+            for name in CHAT_TABLE_COLUMNS:
+                create_column(self.chats_group, name, np.int64 if name in CHAT_TABLE_NUMERIC_COLUMNS else dt_string,
+                              self.dataset_options, shape=(0,), resizable=True)
+            create_column(self.senders_group, 'sender_alias', dt_string, self.dataset_options, shape=(0,),
+                          resizable=True)
+            self.messages_group.attrs['dead_rows'] = 0
+            self.hf.swmr_mode = True
+
+        self.hf.flush()
+        tables = [
+            (self.senders_group, {'sender_alias': list(self.sender_codes)}, self.published_senders),
+            (self.chats_group, self.chat_table, self.published_chats),
+        ]
+        for group, table, n_old in tables:
+            for name, values in table.items():
+                if len(values) > n_old:
+                    dataset = group[name]
+                    dataset.resize((len(values),))
+                    dataset[n_old:] = np.asarray(values[n_old:],
+                                                 dtype=np.int64 if name in CHAT_TABLE_NUMERIC_COLUMNS else object)
+            self.hf.flush()
+        self.published_senders = len(self.sender_codes)
+        self.published_chats = len(self.chat_table['chat_id'])
+
+    def close(self):
+        self.flush()
+        if 'timestamp' not in self.messages_group:
+            # Leere Datei: Spalten trotzdem anlegen, damit Leser sie vorfinden
+            self.pending.append(messages_to_columns([]))
+            self.flush()
+
+        if self.swmr:
+            # Tabellen, Zeitindex und Strukturübersicht lassen sich im SWMR-Modus nicht neu
+            # anlegen: Datei schließen und für den Abschluss normal öffnen
+            file_name = self.hf.filename
+            self.hf.close()
+            self.hf = h5py.File(file_name, 'r+')
+            self.messages_group = self.hf['messages']
+            self.chats_group = self.hf['chats']
+            self.senders_group = self.hf['senders']
+            # publish legt alle dünn besetzten Spalten vorab an; ungenutzte wieder entfernen,
+            # damit die Datei der ohne SWMR geschriebenen entspricht
+            for name in self.sparse_columns:
+                if self.messages_group[f'{name}_rows'].shape[0] == 0:
+                    delete_sparse_column(self.messages_group, name)
+
+        # Chat- und Sender-Tabelle (neu) schreiben; beim Anhängen ersetzen
+        for group in (self.chats_group, self.senders_group):
+            for name in list(group):
+                del group[name]
+
+        dt_string = h5py.special_dtype(vlen=str)
+        for name, values in self.chat_table.items():
+            if name in CHAT_TABLE_NUMERIC_COLUMNS:
+                create_column(self.chats_group, name, np.int64, self.dataset_options,
+                              data=np.asarray(values, dtype=np.int64))
+            else:
+                create_column(self.chats_group, name, dt_string, self.dataset_options,
+                              data=np.asarray(values, dtype=object))
+        create_column(self.senders_group, 'sender_alias', dt_string, self.dataset_options,
+                      data=np.asarray(list(self.sender_codes), dtype=object))
+
+        # Zeilen, auf die kein Chat mehr verweist (nach dem Anhängen)
+        used_rows = sum(end - start for start, end in zip(self.chat_table['start'], self.chat_table['end']))
+        self.messages_group.attrs['dead_rows'] = self.row_count - used_rows
+
+        write_time_index(self.hf, self.timezone, self.dataset_options)
+        write_activity_stats(self.hf, self.timezone, self.dataset_options)
+        self.hf.attrs['ingest_complete'] = True
+        write_structure_summary(self.hf)
+        if self.swmr:
+            self.hf.close()
+
+    def read_chat(self, chat_id):
+        """
+        Liest einen vorhandenen Chat vollständig (für den Anhängemodus).
+
+        Returns:
+            tuple: (Spalten, Attribute) oder None, wenn der Chat nicht existiert
+        """
+        idx = self.chat_index.get(chat_id)
+        if idx is None:
+            return None
+        start, end = self.chat_table['start'][idx], self.chat_table['end'][idx]
+        sender_aliases = list(self.sender_codes)
+
+        columns = {}
+        for name in MESSAGE_COLUMNS:
+            if name == 'sender_alias':
+                codes = self.messages_group['sender_code'][start:end]
+                columns[name] = [sender_aliases[code] for code in codes]
+            elif f'{name}_rows' in self.messages_group:
+                # Zeilen der dünn besetzten Spalte einmal lesen; gelesen werden nur vorhandene Chats
+                if name not in self.sparse_rows:
+                    self.sparse_rows[name] = self.messages_group[f'{name}_rows'][:]
+                columns[name] = read_sparse_column(self.messages_group, name, start, end, self.sparse_rows[name])
+            elif not has_string_column(self.messages_group, name):
+                columns[name] = None
+            elif name in NUMERIC_COLUMNS:
+                columns[name] = self.messages_group[name][start:end]
+            else:
+                columns[name] = read_string_column(self.messages_group, name, start, end)
+        attrs = {name: self.chat_table[name][idx] for name in ('chat_name', 'message_count', 'unique_sender_count')}
+        return columns, attrs
+
+    def encode_senders(self, columns):
+        """Ersetzt die Spalte sender_alias durch Codes in die laufende Sender-Tabelle."""
+        sender_aliases = columns.pop('sender_alias')
+        sender_codes = self.sender_codes
+        columns['sender_code'] = np.fromiter((sender_codes.setdefault(alias, len(sender_codes))
+                                              for alias in sender_aliases),
+                                             dtype=np.int32, count=len(sender_aliases))
+        return columns
+
+
+def create_output_file(h5_file_path, swmr=False):
+    """Legt die Ausgabedatei an; der SWMR-Modus setzt das neueste HDF5-Dateiformat voraus."""
+    return h5py.File(h5_file_path, 'w', libver='latest' if swmr else None)
+
+
+def create_layout_writer(hf, layout, timezone=DEFAULT_TIMEZONE, batch_size=DEFAULT_BATCH_SIZE, dataset_options=None,
+                         append=False, string_encoding=DEFAULT_STRING_ENCODING, swmr=False):
+    """
+    Erstellt den Writer für die gewünschte Layout-Version (append: vorhandene Datei fortschreiben;
+    string_encoding und swmr gelten nur für Layout 2).
+    """
+    if layout == LAYOUT_VERSION_GROUPS:
+        return GroupLayoutWriter(hf, timezone, dataset_options)
+    if layout == LAYOUT_VERSION_COLUMNAR:
+        return ColumnarLayoutWriter(hf, timezone, batch_size, dataset_options, append, string_encoding, swmr)
+    raise ValueError(f"Unbekannte Layout-Version: {layout}")
+
+
+def read_chat_group_columns(chat_group, start=0, end=None):
+    """Liest die Nachrichtenspalten einer (Staging-)Chat-Gruppe für die Zeilen [start, end) (Standard: vollständig)."""
+    columns = {}
+    for name in MESSAGE_COLUMNS:
+        if name not in chat_group:
+            columns[name] = None
+        elif name in NUMERIC_COLUMNS:
+            columns[name] = chat_group[name][start:end]
+        else:
+            columns[name] = chat_group[name].asstr()[start:end].tolist()
+    return columns
+
+
+def iter_chat_group_batches(chat_group, batch_size=DEFAULT_BATCH_SIZE):
+    """Liest die Nachrichtenspalten einer (Staging-)Chat-Gruppe in Blöcken von batch_size Zeilen."""
+    n_rows = chat_group['message'].shape[0] if 'message' in chat_group else 0
+    for start in range(0, n_rows, batch_size):
+        with PROFILER.span("read_staged_chat"):
+            columns = read_chat_group_columns(chat_group, start, start + batch_size)
+        yield columns
+
+
+def columns_to_fragment(columns):
+    """
+    Wandelt gelesene Spalten eines vorhandenen Chats zurück in ein Fragment
+    (timestamps, messages), damit es mit neuen Nachrichten gemischt werden kann.
+    Leere Übersetzungen ('' als Auffüllwert) werden weggelassen.
+    """
+    timestamp_strings = columns['timestamp_str']
+    deepl_texts = columns['message_deepl']
+    m2m100_texts = columns['message_m2m100']
+    messages = []
+    for i, (sender_alias, message, message_id) in enumerate(zip(columns['sender_alias'], columns['message'],
+                                                                 np.asarray(columns['message_id']).tolist())):
+        msg = {'sender_alias': sender_alias, 'message': message, 'message_id': message_id}
+        if timestamp_strings is not None:
+            msg['timestamp'] = timestamp_strings[i]
+        if deepl_texts is not None and deepl_texts[i]:
+            msg['message_deepl'] = deepl_texts[i]
+        if m2m100_texts is not None and m2m100_texts[i]:
+            msg['message_m2m100'] = m2m100_texts[i]
+        messages.append(msg)
+    return np.asarray(columns['timestamp'], dtype=np.int64), messages
+
+
+def merge_chat_group(chat_group):
+    """
+    Sortiert alle Datasets einer zusammengeführten Chat-Gruppe stabil nach dem
+    Zeitstempel und entfernt doppelte Nachrichten anhand der message_id.
+
+    Returns:
+        int: Anzahl entfernter Duplikate
+    """
+    timestamps = chat_group['timestamp'][:]
+    message_ids = chat_group['message_id'][:]
+
+    # Nicht parsebare Zeitstempel (NaT) sortieren wie im In-Memory-Pfad zuerst
+    order = np.argsort(timestamps, kind='stable')
+
+    # Erstes Vorkommen jeder message_id behalten, Nachrichten ohne ID (-1) immer
+    sorted_ids = message_ids[order]
+    keep = sorted_ids == -1
+    _, first_index = np.unique(sorted_ids, return_index=True)
+    keep[first_index] = True
+    order = order[keep]
+
+    duplicates = len(timestamps) - len(order)
+    if duplicates == 0 and np.all(order[1:] > order[:-1]):
+        return 0
+
+    for name in chat_group:
+        dataset = chat_group[name]
+        values = dataset[:][order]
+        dataset.resize((len(order),))
+        dataset[:] = values
+    return duplicates
+
+
+def get_timestamp_settings(hf, layout):
+    """
+    Ermittelt Zeitzone und das Vorhandensein von timestamp_str einer vorhandenen Datei.
+
+    Returns:
+        tuple: (timezone, keep_timestamp_str)
+    """
+    if layout == LAYOUT_VERSION_COLUMNAR:
+        groups = [hf['messages']]
+    else:
+        groups = (hf[name] for name in hf if isinstance(hf[name], h5py.Group) and 'timestamp' in hf[name])
+    for group in groups:
+        attrs = group['timestamp'].attrs
+        if 'unit' not in attrs:
+            raise ValueError("Die H5-Datei verwendet noch Float-Zeitstempel; bitte neu konvertieren, "
+                             "bevor Daten angehängt werden")
+        return attrs['timezone'], has_string_column(group, 'timestamp_str')
+    return DEFAULT_TIMEZONE, True
+
+
+def append_json_to_h5(json_file_path, h5_file_path, batch_size=DEFAULT_BATCH_SIZE, dataset_options=None):
+    """
+    Führt einen (Delta-)Export in eine vorhandene H5-Datei zusammen. Nur Chats mit
+    neuen Nachrichten werden neu geschrieben: vorhandene und neue Nachrichten werden
+    nach Zeitstempel gemischt und nach message_id dedupliziert (vorhandene gewinnen),
+    message_count und unique_sender_count werden fortgeschrieben.
+    Layout, Zeitzone, timestamp_str und die Kodierung der Textspalten richten sich nach
+    der vorhandenen Datei.
+
+    Args:
+        json_file_path (str): Pfad zur JSON-Datei mit den neuen Daten
+        h5_file_path (str): Pfad zur vorhandenen H5-Datei
+        batch_size (int): Zeilen pro Schreibblock (Layout 2)
+        dataset_options (dict): Filter- und Chunk-Optionen für neu angelegte Datasets
+    """
+    print(f"Lese JSON-Datei: {json_file_path}")
+
+    with PROFILER.span("read_json"), open(json_file_path, 'r', encoding='utf-8') as file:
+        chat_data = json.load(file)
+
+    print(f"Gefundene Chats: {len(chat_data)}")
+
+    new_chats = 0
+    changed_chats = 0
+    added_messages = 0
+
+    with h5py.File(h5_file_path, 'r+') as hf:
+        layout = hf.attrs.get('layout_version', LAYOUT_VERSION_GROUPS)
+        timezone, keep_timestamp_str = get_timestamp_settings(hf, layout)
+        with PROFILER.span("collect_chats"):
+            chat_dict = collect_chats(chat_data, timezone)
+        writer = create_layout_writer(hf, layout, timezone, batch_size, dataset_options, append=True)
+
+        for chat_id, state in chat_dict.items():
+            new_fragment = sort_fragment((state['timestamps'], state['messages']))
+            with PROFILER.span("read_chat"):
+                existing = writer.read_chat(chat_id)
+
+            if existing is None:
+                print(f"Neuer Chat: {chat_id}")
+                new_chats += 1
+                added_messages += len(state['messages'])
+                columns = None
+                if state['messages']:
+                    columns = messages_to_columns(state['messages'], state['timestamps'],
+                                                  keep_timestamp_str=keep_timestamp_str)
+                with PROFILER.span("write_chat"):
+                    writer.write_chat(chat_id, get_chat_name(chat_id, state['chat']),
+                                      state['message_count'], state['unique_sender_count'], columns)
+                continue
+
+            old_columns, old_attrs = existing
+            if old_columns is not None:
+                old_timestamps, old_messages, _ = merge_fragments([sort_fragment(columns_to_fragment(old_columns))])
+            else:
+                old_timestamps, old_messages = np.array([], dtype=np.int64), []
+
+            timestamps, messages, _ = merge_fragments([(old_timestamps, old_messages), new_fragment])
+            added = len(messages) - len(old_messages)
+            if added == 0:
+                # Alle Nachrichten waren schon vorhanden - Chat bleibt unangetastet
+                continue
+
+            print(f"Aktualisiere Chat {chat_id}: {added} neue Nachrichten")
+            changed_chats += 1
+            added_messages += added
+            senders = {msg['sender_alias'] for msg in messages if 'sender_alias' in msg}
+            chat_name = state['chat'].get('chat_name', old_attrs['chat_name'])
+            with PROFILER.span("write_chat"):
+                writer.write_chat(chat_id, chat_name, int(old_attrs['message_count']) + added, len(senders),
+                                  messages_to_columns(messages, timestamps, keep_timestamp_str=keep_timestamp_str))
+
+        with PROFILER.span("close"):
+            writer.close()
+
+        if 'search_index' in hf:
+            # Neu geschriebene Chats liegen am Ende von /messages und werden nachindiziert
+            update_search_index(hf, dataset_options)
+
+        if layout == LAYOUT_VERSION_COLUMNAR and hf['messages'].attrs['dead_rows']:
+            print(f"Hinweis: {hf['messages'].attrs['dead_rows']} Zeilen werden nicht mehr verwendet; "
+                  "eine Neukonvertierung gibt den Platz frei.")
+
+    print(f"Neue Chats: {new_chats}, geänderte Chats: {changed_chats}, "
+          f"unveränderte Chats: {len(chat_dict) - new_chats - changed_chats}, neue Nachrichten: {added_messages}")
+    print(f"Anhängen abgeschlossen. H5-Datei aktualisiert: {h5_file_path}")
+
+
+def convert_json_to_h5_streaming(json_file_path, h5_file_path, batch_size=DEFAULT_BATCH_SIZE,
+                                 timezone=DEFAULT_TIMEZONE, keep_timestamp_str=True, layout=DEFAULT_LAYOUT_VERSION,
+                                 dataset_options=None, string_encoding=DEFAULT_STRING_ENCODING, swmr=False):
+    """
+    Streaming-Variante von convert_json_to_h5: Liest das JSON-Array Chat für Chat
+    und schreibt die Nachrichten batchweise in erweiterbare Datasets. Der
+    Speicherbedarf hängt damit von batch_size ab und nicht von der Dateigröße.
+    Doppelte Chat-IDs werden an die bestehende Gruppe angehängt und am Ende
+    einmalig nach Zeitstempel sortiert und nach message_id dedupliziert; nur
+    dafür wird ein einzelner Chat vollständig gelesen.
+
+    Für Layout 2 werden die Chats zuerst in eine temporäre Datei im Layout 1
+    geschrieben und danach Chat für Chat in Blöcken von batch_size Zeilen in die
+    globalen Spalten kopiert, damit die Zeilen jedes Chats auch bei verstreuten
+    Fragmenten zusammenhängend liegen und auch große Chats nie vollständig im
+    Speicher stehen.
+
+    Args:
+        json_file_path (str): Pfad zur JSON-Datei
+        h5_file_path (str): Pfad, wo die H5-Datei gespeichert werden soll
+        batch_size (int): Maximale Anzahl Nachrichten pro Batch
+        timezone (str): Zeitzone der Zeitstempel im Export
+        keep_timestamp_str (bool): Zeitstempel zusätzlich als String speichern
+        layout (int): Layout-Version der H5-Datei
+        dataset_options (dict): Filter- und Chunk-Optionen für die Datasets
+        string_encoding (str): Kodierung der Textspalten in Layout 2
+        swmr (bool): Layout 2 im SWMR-Modus schreiben (Leser sehen die Chats ab der Kopierphase)
+    """
+    print(f"Lese JSON-Datei im Streaming-Modus (Batchgröße {batch_size}): {json_file_path}")
+
+    if layout == LAYOUT_VERSION_GROUPS:
+        with h5py.File(h5_file_path, 'w') as hf:
+            with PROFILER.span("stage_chats"):
+                stage_chats_streaming(json_file_path, hf, batch_size, timezone, keep_timestamp_str, dataset_options)
+            write_time_index(hf, timezone, dataset_options)
+            write_structure_summary(hf)
+    else:
+        # Staging-Datei neben der Ausgabedatei anlegen, damit sie auf demselben Laufwerk liegt
+        staging_fd, staging_path = tempfile.mkstemp(suffix='.h5', dir=os.path.dirname(os.path.abspath(h5_file_path)))
+        os.close(staging_fd)
+        try:
+            with h5py.File(staging_path, 'w') as staging_hf:
+                with PROFILER.span("stage_chats"):
+                    chat_states = stage_chats_streaming(json_file_path, staging_hf, batch_size, timezone,
+                                                        keep_timestamp_str)
+
+                with create_output_file(h5_file_path, swmr) as hf:
+                    writer = create_layout_writer(hf, layout, timezone, batch_size, dataset_options,
+                                                  string_encoding=string_encoding, swmr=swmr)
+                    with PROFILER.span("copy_chats"):
+                        for chat_id, state in chat_states.items():
+                            # Große Chats blockweise kopieren, damit der Speicherbedarf bei batch_size bleibt
+                            chat_group = state['group']
+                            writer.write_chat_batches(chat_id, chat_group.attrs['chat_name'],
+                                                      chat_group.attrs['message_count'],
+                                                      chat_group.attrs['unique_sender_count'],
+                                                      iter_chat_group_batches(chat_group, batch_size))
+                    with PROFILER.span("close"):
+                        writer.close()
+        finally:
+            os.remove(staging_path)
 
-                        # Übersetzte Nachricht (wenn vorhanden)
-                    if 'message_m2m100' in msg:
-                        has_m2m100 = True
-                        message_m2m100_texts.append(msg['message_m2m100'])
-                    else:
-                        message_m2m100_texts.append('')
-                
-                # Erstelle Datasets für die Nachrichtendaten
-                dt_string = h5py.special_dtype(vlen=str)
-                
-                timestamps_dataset = chat_group.create_dataset('timestamp', data=timestamps)
-                timestamp_str_dataset = chat_group.create_dataset('timestamp_str', data=timestamp_strings, dtype=dt_string)
-                
-                sender_dataset = chat_group.create_dataset('sender_alias', data=sender_aliases, dtype=dt_string)
-                message_dataset = chat_group.create_dataset('message', data=message_texts, dtype=dt_string)
-                id_dataset = chat_group.create_dataset('message_id', data=message_ids)
-                
-                if has_deepl:
-                    deepl_dataset = chat_group.create_dataset('message_deepl', data=message_deepl_texts, dtype=dt_string)
-
-                if has_m2m100:
-                    m2m100_dataset = chat_group.create_dataset('message_m2m100', data=message_m2m100_texts, dtype=dt_string)
-    
     print(f"Konvertierung abgeschlossen. H5-Datei gespeichert unter: {h5_file_path}")
 
+
+def stage_chats_streaming(json_file_path, hf, batch_size=DEFAULT_BATCH_SIZE,
+                          timezone=DEFAULT_TIMEZONE, keep_timestamp_str=True, dataset_options=None):
+    """
+    Schreibt die Chats einer JSON-Datei batchweise im Layout 1 in die geöffnete
+    H5-Datei hf und führt doppelte Chats am Ende zusammen.
+
+    Returns:
+        dict: Zustand pro Chat-ID (u. a. die H5-Gruppe unter 'group'), in der
+            Reihenfolge des ersten Auftretens
+    """
+    # Laufender Zustand pro Chat-ID: Gruppe, Sender, Fragmente
+    chat_states = {}
+    fragment_count = 0
+
+    current = None
+    for chat_meta, messages in iter_chat_batches(json_file_path, batch_size):
+        chat_id = chat_meta['chat_id']
+
+        if current is None or current['meta'] is not chat_meta:
+            # Neues Chat-Fragment beginnt
+            fragment_count += 1
+            if chat_id in chat_states:
+                print(f"Duplikat gefunden für Chat-ID: {chat_id} - füge Nachrichten zusammen")
+                current = chat_states[chat_id]
+                current['fragments'] += 1
+            else:
+                print(f"Verarbeite Chat {len(chat_states)+1}: {chat_id}")
+                chat_group = hf.create_group(get_safe_chat_id(chat_id))
+                chat_group.attrs['original_chat_id'] = chat_id
+                current = {
+                    'group': chat_group,
+                    'senders': set(),
+                    'message_count': 0,
+                    'unique_sender_count': 0,
+                    'fragments': 1,
+                }
+                chat_states[chat_id] = current
+            current['meta'] = chat_meta
+
+        if messages is not None:
+            with PROFILER.span("messages_to_columns"):
+                columns = messages_to_columns(messages, timezone=timezone, keep_timestamp_str=keep_timestamp_str)
+            current['senders'].update(msg['sender_alias'] for msg in messages if 'sender_alias' in msg)
+            with PROFILER.span("append_columns"):
+                append_columns(current['group'], columns, timezone, dataset_options)
+            continue
+
+        # Fragment abgeschlossen: Metadaten wie im In-Memory-Pfad fortschreiben
+        chat_group = current['group']
+        current['message_count'] += chat_meta.get('message_count', 0)
+        if current['fragments'] == 1:
+            current['unique_sender_count'] = chat_meta.get('unique_sender_count', len(current['senders']))
+            chat_group.attrs['chat_name'] = get_chat_name(chat_id, chat_meta)
+        else:
+            current['unique_sender_count'] = len(current['senders'])
+        chat_group.attrs['unique_sender_count'] = current['unique_sender_count']
+        chat_group.attrs['message_count'] = current['message_count']
+
+    print(f"Gefundene Chats: {fragment_count}")
+    print(f"Eindeutige Chats nach Duplikatentfernung: {len(chat_states)}")
+
+    # Zusammengeführte Chats einmalig sortieren und nach message_id deduplizieren
+    for chat_id, state in chat_states.items():
+        if state['fragments'] > 1:
+            with PROFILER.span("merge_chat_group"):
+                duplicates = merge_chat_group(state['group'])
+            if duplicates:
+                print(f"  {duplicates} doppelte Nachrichten in Chat {chat_id} entfernt")
+                state['group'].attrs['message_count'] = state['message_count'] - duplicates
+
+    return chat_states
+
+
+def ngram_pairs(texts, first_row=0, n=SEARCH_INDEX_NGRAM):
+    """
+    Zerlegt casefoldete Texte vektorisiert in n-Gramme (Unicode-Codepunkte).
+    Jedes n-Gramm wird als int64-Schlüssel kodiert (21 Bit pro Codepunkt).
+
+    Returns:
+        tuple: (keys, rows) eindeutiger Paare, sortiert nach Schlüssel und Zeile
+    """
+    folded = [text.casefold() for text in texts]
+    lengths = np.fromiter(map(len, folded), dtype=np.int64, count=len(folded))
+    codes = np.frombuffer(''.join(folded).encode('utf-32-le'), dtype=np.uint32).astype(np.int64)
+    if len(codes) < n:
+        return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+
+    char_rows = np.repeat(np.arange(first_row, first_row + len(folded), dtype=np.int64), lengths)
+    # Nur n-Gramme, deren Zeichen alle aus derselben Zeile stammen
+    valid = char_rows[:len(codes) - n + 1] == char_rows[n - 1:]
+    keys = np.zeros(len(codes) - n + 1, dtype=np.int64)
+    for i in range(n):
+        keys = (keys << 21) | codes[i:len(codes) - n + 1 + i]
+    keys = keys[valid]
+    rows = char_rows[:len(codes) - n + 1][valid]
+
+    order = np.lexsort((rows, keys))
+    keys, rows = keys[order], rows[order]
+    keep = np.ones(len(keys), dtype=bool)
+    keep[1:] = (keys[1:] != keys[:-1]) | (rows[1:] != rows[:-1])
+    return keys[keep], rows[keep]
+
+
+def read_search_segment(segment_group):
+    """Liest ein Segment des Suchindex als (Schlüssel, Zeile)-Paare, sortiert nach Schlüssel und Zeile."""
+    keys = segment_group['keys'][:]
+    offsets = segment_group['offsets'][:]
+    return np.repeat(keys, np.diff(offsets)), segment_group['rows'][:].astype(np.int64)
+
+
+def write_search_segment(segments_group, name, keys, rows, texts, row_dtype, dataset_options=None):
+    """Schreibt nach Schlüssel sortierte (Schlüssel, Zeile)-Paare als CSR-Segment."""
+    unique_keys, counts = np.unique(keys, return_counts=True)
+    offsets = np.zeros(len(unique_keys) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+
+    segment_group = segments_group.create_group(name)
+    create_column(segment_group, 'keys', np.int64, dataset_options, data=unique_keys)
+    create_column(segment_group, 'offsets', np.int64, dataset_options, data=offsets)
+    create_column(segment_group, 'rows', row_dtype, dataset_options, data=rows.astype(row_dtype))
+    segment_group.attrs['texts'] = texts
+
+
+@PROFILER.span("search_index")
+def update_search_index(hf, dataset_options=None, batch_rows=SEARCH_INDEX_BATCH_ROWS):
+    """
+    Baut den n-Gramm-Suchindex unter /search_index auf bzw. ergänzt ihn um Zeilen,
+    die seit dem letzten Aufbau angehängt wurden (nur Layout 2).
+
+    Pro Textspalte entsteht eine Untergruppe 'segments' mit durchnummerierten Segmenten
+    ('0', '1', ...). Jedes Segment ist ein invertierter Index im CSR-Format über einen
+    Zeilenbereich: 'keys' (sortierte n-Gramm-Schlüssel), 'offsets' und 'rows' (Zeilen in
+    /messages, die das n-Gramm enthalten, rows[offsets[i]:offsets[i+1]]). Der Viewer
+    fragt alle Segmente ab und hängt die Treffer aneinander. Das Attribut 'row_count'
+    gibt an, bis zu welcher Zeile die Spalte indiziert ist. Dünn besetzte Spalten
+    (siehe SPARSE_COLUMNS) werden über ihre Texte indiziert.
+
+    Neue Zeilen werden blockweise zu je höchstens batch_rows Texten indiziert, ohne den
+    vorhandenen Index zu lesen. Nur kleine Segmente am Ende werden wie bei einem binären
+    Zähler mit dem neuen Block zusammengelegt, solange das Ergebnis batch_rows Texte nicht
+    überschreitet; so bleibt die Anzahl der Segmente klein und der Aufwand eines Anhangs
+    proportional zu den neuen Zeilen (amortisiert).
+    """
+    messages_group = hf['messages']
+    index_group = hf.require_group('search_index')
+    index_group.attrs['ngram'] = SEARCH_INDEX_NGRAM
+    index_group.attrs['casefold'] = True
+    n_rows = messages_group['timestamp'].shape[0]
+    # Zeilennummern passen bis 2^31 Zeilen in int32, was den Index halbiert
+    row_dtype = np.int32 if n_rows <= np.iinfo(np.int32).max else np.int64
+
+    for column in SEARCH_INDEX_COLUMNS:
+        if has_string_column(messages_group, column):
+            text_column = column
+            sparse_rows = None
+        elif f'{column}_rows' in messages_group:
+            text_column = f'{column}_values'
+            sparse_rows = messages_group[f'{column}_rows'][:]
+        else:
+            continue
+        column_group = index_group.require_group(column)
+        first_row = int(column_group.attrs.get('row_count', 0))
+        if first_row >= n_rows:
+            continue
+
+        print(f"Baue Suchindex für {column}: Zeilen {first_row}-{n_rows}")
+        # Bei dünn besetzten Spalten laufen die Blöcke über die Texte ab der ersten neuen Zeile
+        first_value = first_row if sparse_rows is None else int(np.searchsorted(sparse_rows, first_row))
+        segments_group = column_group.require_group('segments')
+        if 'keys' in column_group:
+            # Früheres Format mit einem einzigen Index über alle Zeilen wird zum ersten Segment
+            segments_group.create_group('0').attrs['texts'] = first_value
+            for name in ['keys', 'offsets', 'rows']:
+                column_group.move(name, f'segments/0/{name}')
+
+        n_texts = string_column_length(messages_group, text_column)
+        n_entries = 0
+        for start in range(first_value, n_texts, batch_rows):
+            with PROFILER.span("read_texts"):
+                texts = read_string_column(messages_group, text_column, start, min(start + batch_rows, n_texts))
+            with PROFILER.span("ngrams"):
+                keys, rows = ngram_pairs(texts, start)
+            if sparse_rows is not None:
+                rows = sparse_rows[rows]
+            n_entries += len(rows)
+
+            segment_texts = len(texts)
+            while len(segments_group):
+                last_name = str(len(segments_group) - 1)
+                last_texts = int(segments_group[last_name].attrs['texts'])
+                if last_texts > segment_texts or last_texts + segment_texts > batch_rows:
+                    break
+                with PROFILER.span("merge_segments"):
+                    old_keys, old_rows = read_search_segment(segments_group[last_name])
+                    del segments_group[last_name]
+                    keys = np.concatenate([old_keys, keys])
+                    rows = np.concatenate([old_rows, rows])
+                    # Stabil sortieren: die neuen Zeilen liegen alle hinter denen des alten Segments
+                    order = np.argsort(keys, kind='stable')
+                    keys, rows = keys[order], rows[order]
+                segment_texts += last_texts
+            write_search_segment(segments_group, str(len(segments_group)), keys, rows, segment_texts,
+                                 row_dtype, dataset_options)
+
+        column_group.attrs['row_count'] = n_rows
+        print(f"  {n_entries} neue Einträge, {len(segments_group)} Segmente")
+
+    write_structure_summary(hf)
+
+
+def format_bytes(size):
+    """Formatiert eine Byteanzahl menschenlesbar."""
+    for unit in ['B', 'KiB', 'MiB', 'GiB']:
+        if abs(size) < 1024 or unit == 'GiB':
+            return f"{size:.1f} {unit}" if unit != 'B' else f"{size} B"
+        size /= 1024
+
+
+def report_storage(h5_file_path):
+    """
+    Gibt einen Bericht über Speicherbedarf und Lesedurchsatz einer H5-Datei aus.
+    Pro Spalte werden Rohgröße der Daten, von HDF5 belegte Chunks, Filter und die
+    Zeit zum vollständigen Lesen gemessen (bei Layout 1 über alle Chats summiert).
+    Der Durchsatz wird mit warmem Page-Cache gemessen.
+
+    Hinweis: Strings variabler Länge liegen im globalen Heap der Datei; HDF5-Filter
+    komprimieren nur die Verweise darauf, nicht den Text selbst. Blob-Spalten
+    (siehe STRING_ENCODING_BLOB) werden dagegen vollständig komprimiert.
+
+    Returns:
+        dict: Kennzahlen pro Spalte und Gesamtwerte
+    """
+    columns = {}
+    with h5py.File(h5_file_path, 'r') as hf:
+        columnar = hf.attrs.get('layout_version', LAYOUT_VERSION_GROUPS) >= LAYOUT_VERSION_COLUMNAR
+        dataset_names = []
+        hf.visititems(lambda name, obj: dataset_names.append(name) if isinstance(obj, h5py.Dataset) else None)
+
+        for name in dataset_names:
+            dataset = hf[name]
+            start_time = time.perf_counter()
+            values = dataset[:]
+            read_seconds = time.perf_counter() - start_time
+
+            if dataset.dtype.kind == 'O':
+                raw_bytes = sum(len(value) for value in values)
+            else:
+                raw_bytes = values.nbytes
+
+            key = name if columnar else name.rsplit('/', 1)[-1]
+            stats = columns.setdefault(key, {'rows': 0, 'raw_bytes': 0, 'stored_bytes': 0, 'read_seconds': 0.0,
+                                             'filters': describe_filters(dataset)})
+            stats['rows'] += dataset.shape[0]
+            stats['raw_bytes'] += raw_bytes
+            stats['stored_bytes'] += dataset.id.get_storage_size()
+            stats['read_seconds'] += read_seconds
+
+    file_bytes = os.path.getsize(h5_file_path)
+    raw_total = sum(stats['raw_bytes'] for stats in columns.values())
+    read_total = sum(stats['read_seconds'] for stats in columns.values())
+
+    print(f"\nSpeicherbericht für {h5_file_path}")
+    print(f"{'Spalte':<34} {'Zeilen':>10} {'Roh':>11} {'Chunks':>11} {'Lesen':>9}  Filter")
+    for key, stats in columns.items():
+        print(f"{key:<34} {stats['rows']:>10} {format_bytes(stats['raw_bytes']):>11} "
+              f"{format_bytes(stats['stored_bytes']):>11} {stats['read_seconds']*1000:>7.1f}ms  {stats['filters']}")
+    ratio = file_bytes / raw_total if raw_total else 0.0
+    throughput = raw_total / read_total if read_total else 0.0
+    print(f"Rohdaten: {format_bytes(raw_total)}, Datei: {format_bytes(file_bytes)} (Faktor {ratio:.2f})")
+    print(f"Lesedurchsatz: {format_bytes(throughput)}/s ({read_total:.2f} s für alle Spalten)")
+    print("(Strings variabler Länge liegen im globalen Heap; Filter wirken nur auf deren Verweise, "
+          "bei --string-encoding blob auch auf die Texte.)")
+
+    return {
+        'columns': columns,
+        'raw_bytes': raw_total,
+        'file_bytes': file_bytes,
+        'read_seconds': read_total,
+        'read_bytes_per_second': throughput,
+    }
+
+
+def describe_filters(dataset):
+    """Kurzbeschreibung von Chunking und Filtern eines Datasets für den Speicherbericht."""
+    parts = []
+    if dataset.chunks:
+        parts.append(f"chunks={dataset.chunks[0]}")
+    if dataset.compression:
+        level = f":{dataset.compression_opts}" if dataset.compression_opts is not None else ""
+        parts.append(f"{dataset.compression}{level}")
+    if dataset.shuffle:
+        parts.append("shuffle")
+    return ", ".join(parts) if parts else "zusammenhängend"
+
+
+def write_profile_report(report, profile_path, json_file_paths, h5_file_path, settings):
+    """
+    Schreibt den Bericht von PROFILER.stop() zusammen mit Ein- und Ausgabegrößen,
+    Einstellungen und Bibliotheksversionen als JSON-Datei und gibt eine Übersicht aus.
+    Zeiten sind in Sekunden (Summe und längster Einzelaufruf je Abschnitt), Speicher in Bytes.
+    """
+    report = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'input_files': [{'path': path, 'bytes': os.path.getsize(path)} for path in json_file_paths],
+        'output_file': {'path': h5_file_path, 'bytes': os.path.getsize(h5_file_path)},
+        'settings': settings,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'versions': {'h5py': h5py.__version__, 'hdf5': h5py.version.hdf5_version,
+                     'numpy': np.__version__, 'pandas': pd.__version__},
+        **report,
+    }
+    if resource is not None:
+        # ru_maxrss ist unter Linux in KiB, unter macOS in Bytes angegeben
+        max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        report['max_rss_bytes'] = max_rss if platform.system() == 'Darwin' else max_rss * 1024
+    with open(profile_path, 'w', encoding='utf-8') as file:
+        json.dump(report, file, indent=2, ensure_ascii=False)
+
+    print(f"\nLaufzeitprofil ({report['total_seconds']:.2f} s gesamt)")
+    print(f"{'Abschnitt':<50} {'Aufrufe':>8} {'Sekunden':>10} {'Anteil':>7} {'Spitze':>11}")
+    for span in report['spans']:
+        share = span['seconds'] / report['total_seconds'] if report['total_seconds'] else 0.0
+        peak = format_bytes(span['peak_bytes']) if report['peak_bytes'] is not None else '-'
+        print(f"{span['name']:<50} {span['count']:>8} {span['seconds']:>10.3f} {share:>7.1%} {peak:>11}")
+    print(f"Profil gespeichert unter: {profile_path}")
+
+
 if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description="Konvertiert eine JSON-Datei mit Chat-Daten in eine H5-Datei.")
-    parser.add_argument("json_file", help="Pfad zur JSON-Datei")
+    parser = argparse.ArgumentParser(description="Konvertiert eine oder mehrere JSON-Dateien mit Chat-Daten in eine H5-Datei.")
+    parser.add_argument("json_files", nargs='+',
+                        help="Pfad(e) zur JSON-Datei; Platzhalter wie 'export/*.json' werden aufgelöst")
     parser.add_argument("--output", "-o", help="Pfad zur Ausgabe-H5-Datei (Optional)", default=None)
     parser.add_argument("--overwrite", "-w", action="store_true", help="Überschreibe die Ausgabedatei, falls sie existiert")
-    
+    parser.add_argument("--append", "-a", action="store_true",
+                        help="Neue Daten in eine vorhandene Ausgabedatei einfügen; nur geänderte Chats werden neu geschrieben")
+    parser.add_argument("--stream", "-s", action="store_true",
+                        help="JSON inkrementell lesen und batchweise schreiben (für Exporte, die größer als der Arbeitsspeicher sind)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f"Maximale Anzahl Nachrichten pro Batch im Streaming-Modus (Standard: {DEFAULT_BATCH_SIZE})")
+    parser.add_argument("--workers", "-j", type=int, default=None,
+                        help="Anzahl Prozesse zum Einlesen mehrerer JSON-Dateien (Standard: Anzahl CPU-Kerne)")
+
+    parser.add_argument("--layout", type=int, choices=[LAYOUT_VERSION_GROUPS, LAYOUT_VERSION_COLUMNAR],
+                        default=DEFAULT_LAYOUT_VERSION,
+                        help="Layout der H5-Datei: 1 = eine Gruppe pro Chat, 2 = globale Spalten mit Chat-Tabelle "
+                             f"(Standard: {DEFAULT_LAYOUT_VERSION})")
+    parser.add_argument("--compression", choices=['none', 'gzip', 'lzf'], default='none',
+                        help="Kompressionsfilter für die Datasets (Standard: none)")
+    parser.add_argument("--compression-level", type=int, default=None,
+                        help=f"gzip-Stufe 0-9 (Standard: {DEFAULT_GZIP_LEVEL})")
+    parser.add_argument("--shuffle", action="store_true", help="Shuffle-Filter vor der Kompression anwenden")
+    parser.add_argument("--chunk-size", type=int, default=None,
+                        help="Zeilen pro Chunk (Standard: automatisch, wenn Chunks nötig sind)")
+    parser.add_argument("--string-encoding", choices=[STRING_ENCODING_VLEN, STRING_ENCODING_BLOB],
+                        default=DEFAULT_STRING_ENCODING,
+                        help="Kodierung der Textspalten: vlen = ein HDF5-String pro Nachricht, blob = UTF-8-Bytes "
+                             "einer Spalte am Stück mit Offsets (nur Layout 2, schnelleres Lesen großer Bereiche; "
+                             f"Standard: {DEFAULT_STRING_ENCODING})")
+    parser.add_argument("--swmr", action="store_true",
+                        help="Im HDF5-Modus Single-Writer/Multiple-Reader schreiben, damit der Viewer die Datei schon "
+                             "während der Konvertierung lesen und neue Chats nachladen kann (nur Layout 2)")
+    parser.add_argument("--search-index", action="store_true",
+                        help="Trigramm-Suchindex über Nachrichten und Übersetzungen anlegen (nur Layout 2)")
+    parser.add_argument("--report", action="store_true",
+                        help="Nach der Konvertierung Speicherbedarf und Lesedurchsatz ausgeben")
+    parser.add_argument("--timezone", default=DEFAULT_TIMEZONE,
+                        help=f"Zeitzone der Zeitstempel im Export, z. B. Europe/Berlin (Standard: {DEFAULT_TIMEZONE})")
+    parser.add_argument("--profile", metavar="JSON", default=None,
+                        help="Laufzeit und Speicher der einzelnen Phasen messen und als JSON-Bericht speichern")
+    parser.add_argument("--profile-no-memory", action="store_true",
+                        help="Beim Profilieren auf die Speichermessung (tracemalloc) verzichten, "
+                             "die die Laufzeiten verlangsamt")
+    parser.add_argument("--no-timestamp-str", action="store_true",
+                        help="Zeitstempel nur als int64-Unix-Timestamp speichern, ohne zusätzliche String-Spalte")
+
     args = parser.parse_args()
-    
-    json_file_path = args.json_file
-    
+
+    json_file_paths = []
+    for pattern in args.json_files:
+        if glob.has_magic(pattern):
+            matches = sorted(glob.glob(pattern))
+            if not matches:
+                parser.error(f"Keine Dateien gefunden für: {pattern}")
+            json_file_paths.extend(matches)
+        else:
+            json_file_paths.append(pattern)
+    json_file_path = json_file_paths[0]
+
     if args.output:
         h5_file_path = args.output
+    elif len(json_file_paths) > 1:
+        parser.error("Bei mehreren Eingabedateien muss --output angegeben werden")
     else:
         # Wenn kein Ausgabepfad angegeben ist, nutze den gleichen Namen wie die JSON-Datei
         h5_file_path = os.path.splitext(json_file_path)[0] + '.h5'
-    
+
+    if args.append and args.overwrite:
+        parser.error("--append und --overwrite schließen sich aus")
+
+    if args.append and args.stream:
+        parser.error("--append unterstützt keinen Streaming-Modus")
+
+    if len(json_file_paths) > 1 and (args.append or args.stream):
+        parser.error("--append und --stream unterstützen nur eine Eingabedatei")
+
+    if args.search_index and args.layout == LAYOUT_VERSION_GROUPS and not args.append:
+        parser.error("--search-index wird nur für Layout 2 unterstützt")
+
+    if args.string_encoding != STRING_ENCODING_VLEN and args.layout == LAYOUT_VERSION_GROUPS and not args.append:
+        parser.error("--string-encoding blob wird nur für Layout 2 unterstützt")
+
+    if args.swmr and (args.layout == LAYOUT_VERSION_GROUPS or args.append):
+        parser.error("--swmr wird nur für neue Dateien im Layout 2 unterstützt (nicht mit --append)")
+
+    if args.workers is not None and args.workers < 1:
+        parser.error("--workers muss mindestens 1 sein")
+
     # Prüfe, ob die Ausgabedatei bereits existiert
-    if os.path.exists(h5_file_path) and not args.overwrite:
-        print(f"Die Ausgabedatei {h5_file_path} existiert bereits. Verwende --overwrite, um sie zu überschreiben.")
+    if os.path.exists(h5_file_path) and not (args.overwrite or args.append):
+        print(f"Die Ausgabedatei {h5_file_path} existiert bereits. Verwende --overwrite, um sie zu überschreiben, "
+              "oder --append, um neue Daten anzuhängen.")
         exit(1)
-    
-    convert_json_to_h5(json_file_path, h5_file_path)
\ No newline at end of file
+
+    if args.timezone != 'UTC':
+        try:
+            pd.Timestamp('2000-01-01').tz_localize(args.timezone)
+        except Exception:
+            parser.error(f"Unbekannte Zeitzone: {args.timezone}")
+
+    if args.batch_size < 1:
+        parser.error("--batch-size muss mindestens 1 sein")
+
+    if args.compression_level is not None:
+        if args.compression != 'gzip':
+            parser.error("--compression-level ist nur mit --compression gzip möglich")
+        if not 0 <= args.compression_level <= 9:
+            parser.error("--compression-level muss zwischen 0 und 9 liegen")
+
+    if args.chunk_size is not None and args.chunk_size < 1:
+        parser.error("--chunk-size muss mindestens 1 sein")
+
+    if args.profile_no_memory and not args.profile:
+        parser.error("--profile-no-memory ist nur mit --profile möglich")
+
+    dataset_options = get_dataset_options(None if args.compression == 'none' else args.compression,
+                                          args.compression_level, args.shuffle, args.chunk_size)
+
+    if args.profile:
+        PROFILER.start(memory=not args.profile_no_memory)
+
+    if len(json_file_paths) > 1:
+        with PROFILER.span("convert"):
+            convert_json_files_to_h5(json_file_paths, h5_file_path, workers=args.workers, batch_size=args.batch_size,
+                                     timezone=args.timezone, keep_timestamp_str=not args.no_timestamp_str,
+                                     layout=args.layout, dataset_options=dataset_options,
+                                     string_encoding=args.string_encoding, swmr=args.swmr)
+    elif args.append and os.path.exists(h5_file_path):
+        with PROFILER.span("append"):
+            append_json_to_h5(json_file_path, h5_file_path, batch_size=args.batch_size,
+                              dataset_options=dataset_options)
+    else:
+        with PROFILER.span("convert"):
+            convert_json_to_h5(json_file_path, h5_file_path, stream=args.stream, batch_size=args.batch_size,
+                               timezone=args.timezone, keep_timestamp_str=not args.no_timestamp_str,
+                               layout=args.layout, dataset_options=dataset_options,
+                               string_encoding=args.string_encoding, swmr=args.swmr)
+
+    if args.search_index:
+        with h5py.File(h5_file_path, 'r+') as hf:
+            if hf.attrs.get('layout_version', LAYOUT_VERSION_GROUPS) != LAYOUT_VERSION_COLUMNAR:
+                print("Der Suchindex wird nur für Layout 2 unterstützt und wurde nicht angelegt.")
+            else:
+                update_search_index(hf, dataset_options)
+
+    if args.profile:
+        settings = {name: value for name, value in vars(args).items() if name not in ('json_files', 'profile')}
+        write_profile_report(PROFILER.stop(), args.profile, json_file_paths, h5_file_path, settings)
+
+    if args.report:
+        report_storage(h5_file_path)
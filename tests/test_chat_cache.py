@@ -0,0 +1,29 @@
+import numpy as np
+import pandas as pd
+import streamlit
+
+streamlit.config.set_option("logger.level", "error")
+
+from cv import ChatCache, estimate_frame_nbytes
+
+
+def test_clear_resets_size():
+    cache = ChatCache(budget=10)
+    cache.put('a', 'A', size=6)
+    cache.put('b', 'B', size=4)
+    cache.clear()
+    assert cache.size == 0
+    # Nach dem Leeren passen wieder Einträge bis zum vollen Budget hinein
+    cache.put('c', 'C', size=5)
+    cache.put('d', 'D', size=5)
+    assert cache.get('c') == 'C' and cache.get('d') == 'D'
+
+
+def test_size_estimate_is_close_to_deep_memory_usage():
+    rows = 20000
+    df = pd.DataFrame({
+        'timestamp': pd.date_range('2023-01-01', periods=rows, freq='min'),
+        'message': [f"Nachricht {i} " + "x" * (i % 50) for i in range(rows)],
+        'sender_alias': pd.Categorical.from_codes(np.arange(rows) % 7, [f"@user{i}" for i in range(7)]),
+    })
+    assert abs(estimate_frame_nbytes(df) / df.memory_usage(deep=True).sum() - 1) < 0.05
@@ -0,0 +1,31 @@
+import os
+
+import streamlit
+
+streamlit.config.set_option("logger.level", "error")
+
+from cv import get_disk_cache_path
+
+FILE_INFO = {'fingerprint': (os.path.abspath("/data/archiv.h5"), 1234, 5678)}
+
+
+def test_default_is_the_user_cache_directory(monkeypatch, tmp_path):
+    monkeypatch.delenv("CHAT_VIEWER_DISK_CACHE_DIR", raising=False)
+    monkeypatch.delenv("CHAT_VIEWER_DISK_CACHE_BESIDE_DATA", raising=False)
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    path = get_disk_cache_path(FILE_INFO, "all")
+    assert path.startswith(os.path.join(str(tmp_path), "chat-viewer") + os.sep)
+    assert path.endswith("1234-5678-all.npz")
+
+
+def test_beside_data_is_explicit(monkeypatch):
+    monkeypatch.delenv("CHAT_VIEWER_DISK_CACHE_DIR", raising=False)
+    monkeypatch.setenv("CHAT_VIEWER_DISK_CACHE_BESIDE_DATA", "1")
+    assert get_disk_cache_path(FILE_INFO, "all") == os.path.join(FILE_INFO['fingerprint'][0] + ".viewer-cache",
+                                                                  "1234-5678-all.npz")
+
+
+def test_empty_directory_disables_the_cache(monkeypatch):
+    monkeypatch.setenv("CHAT_VIEWER_DISK_CACHE_DIR", "")
+    monkeypatch.setenv("CHAT_VIEWER_DISK_CACHE_BESIDE_DATA", "1")
+    assert get_disk_cache_path(FILE_INFO, "all") is None
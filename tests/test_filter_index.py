@@ -0,0 +1,50 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+import streamlit
+
+streamlit.config.set_option("logger.level", "error")
+
+from cv import FilterIndex, segment_searchsorted
+
+
+@pytest.mark.parametrize("value", [-1, 0, 3, 4, 5, 7, 9, 10])
+def test_segment_searchsorted_matches_searchsorted(value):
+    keys = np.array([1, 3, 3, 5, 0, 4, 4, 9, 2, 2, 7])
+    starts = np.array([0, 4, 8, 11, 3])
+    ends = np.array([4, 8, 11, 11, 3])
+    expected = [np.searchsorted(keys[start:end], value) + start for start, end in zip(starts, ends)]
+    assert list(segment_searchsorted(keys, starts, ends, value)) == expected
+
+
+@pytest.fixture
+def frame():
+    rng = np.random.default_rng(7)
+    rows = 200
+    chat_ids = np.sort(rng.integers(0, 4, rows))
+    timestamps = pd.to_datetime('2023-01-01') + pd.to_timedelta(rng.integers(0, 90, rows), unit='D')
+    df = pd.DataFrame({
+        'chat_id': pd.Categorical.from_codes(chat_ids, categories=['a', 'b', 'c', 'd']),
+        'sender_alias': pd.Categorical.from_codes(rng.integers(0, 3, rows), categories=['x', 'y', 'z']),
+        'timestamp': timestamps,
+    })
+    df.loc[[5, 77], 'timestamp'] = pd.NaT
+    # Wie die geladenen Frames: nach Chat und Zeitstempel sortiert, NaT zuletzt
+    return df.sort_values(['chat_id', 'timestamp'], kind='stable', na_position='last').reset_index(drop=True)
+
+
+@pytest.mark.parametrize("sender_code", [None, 0, 2])
+@pytest.mark.parametrize("dates", [None, (date(2023, 1, 20), date(2023, 2, 10)),
+                                   (date(2024, 1, 1), date(2024, 1, 2))])
+def test_filter_matches_boolean_masks(frame, sender_code, dates):
+    mask = np.ones(len(frame), dtype=bool)
+    if sender_code is not None:
+        mask &= frame['sender_alias'].cat.codes.to_numpy() == sender_code
+    start_date, end_date = dates or (None, None)
+    if dates is not None:
+        days = frame['timestamp'].dt.date
+        mask &= ((days >= start_date) & (days <= end_date)).to_numpy()
+    filtered = FilterIndex(frame).filter(frame, sender_code, start_date, end_date)
+    pd.testing.assert_frame_equal(filtered, frame[mask])
@@ -0,0 +1,103 @@
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+import streamlit
+
+streamlit.config.set_option("logger.level", "error")
+
+import cv
+import json_toh5
+
+CATEGORICAL_COLUMNS = ['sender_alias', 'chat_id', 'chat_name', 'file_name']
+
+
+def make_chat(chat, senders, translation=None):
+    messages = []
+    for index in range(12):
+        message = {"timestamp": f"2023-{1 + (chat + index) % 9:02d}-{10 + index} 12:00:00",
+                   "sender_alias": senders[index % len(senders)], "message": f"Nachricht {chat}-{index}",
+                   "message_id": index}
+        if index % 4 == 0:
+            message["message_deepl"] = f"DeepL {chat}-{index}"
+        if translation and index % 3 == 0:
+            message[translation] = f"M2M {chat}-{index}"
+        messages.append(message)
+    return f"!room{chat}:example.com", messages
+
+
+def write_chats(writer, chats):
+    for chat_id, messages in chats:
+        writer.write_chat(chat_id, chat_id, len(messages), 2, json_toh5.messages_to_columns(messages))
+    # flush veröffentlicht die Chats im SWMR-Modus für Leser
+    writer.flush()
+
+
+def load(path):
+    chat_index, file_info = cv.read_chat_index(path)
+    return cv.load_all_chats(path, chat_index, file_info, show_progress=False)
+
+
+def raw_values(series):
+    return series.cat.codes.to_numpy() if isinstance(series.dtype, pd.CategoricalDtype) else series.to_numpy()
+
+
+def plain(df):
+    return df.astype({column: object for column in CATEGORICAL_COLUMNS})
+
+
+@pytest.fixture
+def live_file(tmp_path, monkeypatch):
+    monkeypatch.setenv("CHAT_VIEWER_DISK_CACHE_DIR", "")
+    cv.get_chat_cache().clear()
+    cv.get_live_frames()[0].clear()
+    read_chats = []
+    read_all_chats = cv.read_all_chats
+
+    def recording_read_all_chats(file_path, chat_index, file_info, show_progress=True):
+        read_chats.append(list(chat_index['chat_id']))
+        return read_all_chats(file_path, chat_index, file_info, show_progress)
+    monkeypatch.setattr(cv, "read_all_chats", recording_read_all_chats)
+
+    path = str(tmp_path / "live.h5")
+    hf = json_toh5.create_output_file(path, swmr=True)
+    writer = json_toh5.create_layout_writer(hf, json_toh5.LAYOUT_VERSION_COLUMNAR, batch_size=1, swmr=True)
+    return path, writer, read_chats
+
+
+def test_refresh_appends_only_new_chats(live_file):
+    path, writer, read_chats = live_file
+    write_chats(writer, [make_chat(chat, ["@a", "@b"]) for chat in (5, 6, 7)])
+    df_old, index_old = load(path)
+
+    # Neue Chats sortieren alphabetisch vor die alten, bringen einen neuen Sender und die erste M2M100-Übersetzung
+    write_chats(writer, [make_chat(chat, ["@c", "@a"], "message_m2m100") for chat in (1, 2)])
+    df_new, index_new = load(path)
+
+    # Gelesen wurden nur die neuen Chats
+    assert read_chats == [[f"!room{chat}:example.com" for chat in (5, 6, 7)],
+                          [f"!room{chat}:example.com" for chat in (1, 2)]]
+    # Die alten Zeilen stehen unverändert vorne und liegen im selben Speicher
+    n_old = len(df_old)
+    assert len(df_new) == n_old + 24
+    pd.testing.assert_frame_equal(plain(df_new.iloc[:n_old][df_old.columns]), plain(df_old))
+    for column in df_old.columns:
+        assert np.shares_memory(raw_values(df_new[column])[:n_old], raw_values(df_old[column])), column
+    assert (df_new['message_m2m100'].iloc[:n_old] == '').all()
+    # Der frühere Stand bleibt für Sitzungen, die ihn noch anzeigen, gültig
+    assert index_old.filter(df_old, 0, date(2023, 1, 1), date(2023, 12, 31)).shape[0] > 0
+
+    # Der erweiterte Filterindex filtert wie ein neu aufgebauter
+    rebuilt = cv.FilterIndex(df_new)
+    for sender_code in [None] + list(range(len(df_new['sender_alias'].cat.categories))):
+        for dates in [(None, None), (date(2023, 3, 1), date(2023, 6, 30))]:
+            pd.testing.assert_frame_equal(index_new.filter(df_new, sender_code, *dates),
+                                          rebuilt.filter(df_new, sender_code, *dates))
+
+    # Nach dem Abschluss wird die Datei einmal vollständig und sortiert gelesen
+    writer.close()
+    df_final, _ = load(path)
+    assert cv.get_live_frames()[0] == {}
+    expected = plain(df_new).sort_values(['chat_id', 'timestamp'], kind='stable')
+    pd.testing.assert_frame_equal(plain(df_final), expected)
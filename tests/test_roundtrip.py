@@ -0,0 +1,126 @@
+import json
+import os
+
+import h5py
+import pandas as pd
+import pytest
+import streamlit
+
+# Der Festplatten-Cache des Viewers würde Ergebnisse zwischen den Varianten mitnehmen
+os.environ["CHAT_VIEWER_DISK_CACHE_DIR"] = ""
+streamlit.config.set_option("logger.level", "error")
+
+import cv
+import json_toh5
+from json_toh5 import LAYOUT_VERSION_COLUMNAR, LAYOUT_VERSION_GROUPS
+
+
+def make_message(chat, index):
+    message = {"timestamp": f"2023-{1 + index % 9:02d}-{10 + index % 18} 1{index % 10}:0{index % 6}:00",
+               "sender_alias": f"@user{(chat + index) % 4}:example.com",
+               "message": f"Nachricht {chat}-{index} ünïcode \"quote\"",
+               "message_id": index}
+    if index % 3 == 0:
+        message["message_deepl"] = f"DeepL {chat}-{index}"
+    return message
+
+
+def make_chats(lo=0, hi=12):
+    return [{"chat_id": f"!room{chat}:example.com", "chat_name": f"Raum {chat}", "unique_sender_count": 4,
+             "message_count": hi - lo, "messages": [make_message(chat, index) for index in range(lo, hi)]}
+            for chat in range(5)]
+
+
+def write_json(path, chats):
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(chats, file, ensure_ascii=False)
+    return str(path)
+
+
+def load_frame(path):
+    chat_index, file_info = cv.read_chat_index(path)
+    df, _ = cv.load_all_chats(path, chat_index, file_info, show_progress=False)
+    # file_name hängt von der Ausgabedatei ab, die Zeilennummern von der Speicherreihenfolge
+    return df.drop(columns=['file_name']).reset_index(drop=True)
+
+
+def with_group_chat_ids(df):
+    # Layout 1 speichert die Chat-ID als Gruppenname mit '_' statt ':'
+    return df.assign(chat_id=df['chat_id'].cat.rename_categories(lambda chat_id: chat_id.replace(":", "_")))
+
+
+@pytest.fixture(scope="module")
+def full_export(tmp_path_factory):
+    return write_json(tmp_path_factory.mktemp("exports") / "full.json", make_chats())
+
+
+@pytest.fixture(scope="module")
+def reference(full_export, tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("reference") / "reference.h5")
+    json_toh5.convert_json_to_h5(full_export, path, layout=LAYOUT_VERSION_COLUMNAR)
+    return load_frame(path)
+
+
+def test_reference_frame(reference):
+    assert len(reference) == 60
+    assert reference['chat_id'].nunique() == 5
+    assert (reference['message_deepl'] != '').sum() == 20
+    # Innerhalb eines Chats nach Zeitstempel sortiert
+    assert reference.groupby('chat_id', observed=True)['timestamp'].apply(
+        lambda timestamps: timestamps.is_monotonic_increasing).all()
+
+
+def test_layout1_matches_layout2(full_export, reference, tmp_path):
+    path = str(tmp_path / "layout1.h5")
+    json_toh5.convert_json_to_h5(full_export, path, layout=LAYOUT_VERSION_GROUPS)
+    pd.testing.assert_frame_equal(load_frame(path), with_group_chat_ids(reference))
+
+
+def test_streaming_matches(full_export, reference, tmp_path):
+    path = str(tmp_path / "stream.h5")
+    json_toh5.convert_json_to_h5(full_export, path, stream=True, batch_size=7)
+    pd.testing.assert_frame_equal(load_frame(path), reference)
+
+
+def test_duplicate_chat_ids_are_merged(reference, tmp_path):
+    # Jede Chat-ID kommt zweimal vor und wird beim Konvertieren zusammengeführt
+    export = write_json(tmp_path / "duplicates.json", make_chats(0, 6) + make_chats(6, 12))
+    path = str(tmp_path / "duplicates.h5")
+    json_toh5.convert_json_to_h5(export, path, batch_size=7)
+    pd.testing.assert_frame_equal(load_frame(path), reference)
+
+
+@pytest.mark.parametrize("layout", [LAYOUT_VERSION_GROUPS, LAYOUT_VERSION_COLUMNAR])
+def test_append_matches(reference, tmp_path, layout):
+    # Der Delta-Export überschneidet sich mit den vorhandenen message_ids 5 und 6
+    first = write_json(tmp_path / "first.json", make_chats(0, 7))
+    second = write_json(tmp_path / "second.json", make_chats(5, 12))
+    path = str(tmp_path / "append.h5")
+    json_toh5.convert_json_to_h5(first, path, layout=layout)
+    json_toh5.append_json_to_h5(second, path, batch_size=7)
+    expected = with_group_chat_ids(reference) if layout == LAYOUT_VERSION_GROUPS else reference
+    pd.testing.assert_frame_equal(load_frame(path), expected)
+
+
+def test_workers_match(reference, tmp_path):
+    # Jeder Chat ist auf zwei Shards verteilt, die sich in zwei Nachrichten überschneiden
+    shards = [write_json(tmp_path / "first.json", make_chats(0, 7)),
+              write_json(tmp_path / "second.json", make_chats(5, 12))]
+    path = str(tmp_path / "workers.h5")
+    json_toh5.convert_json_files_to_h5(shards, path, workers=2)
+    pd.testing.assert_frame_equal(load_frame(path), reference)
+
+
+def test_blob_encoding_matches(full_export, reference, tmp_path):
+    path = str(tmp_path / "blob.h5")
+    json_toh5.convert_json_to_h5(full_export, path, batch_size=7, string_encoding=json_toh5.STRING_ENCODING_BLOB)
+    pd.testing.assert_frame_equal(load_frame(path), reference)
+
+
+def test_swmr_matches(full_export, reference, tmp_path):
+    path = str(tmp_path / "swmr.h5")
+    json_toh5.convert_json_to_h5(full_export, path, batch_size=7, swmr=True)
+    pd.testing.assert_frame_equal(load_frame(path), reference)
+    # Der Export hat keine M2M100-Übersetzungen; die vorab angelegte Spalte wird wieder entfernt
+    with h5py.File(path, 'r') as hf:
+        assert not [name for name in hf['messages'] if name.startswith('message_m2m100')]
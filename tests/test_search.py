@@ -0,0 +1,32 @@
+import streamlit
+
+streamlit.config.set_option("logger.level", "error")
+
+from cv import parse_search_query
+
+
+def test_words_are_and_clauses():
+    assert parse_search_query('Treffen Montag') == [[(False, 'treffen')], [(False, 'montag')]]
+
+
+def test_phrase_or_and_negation():
+    assert parse_search_query('treffen "am Montag" OR dienstag -abgesagt') == [
+        [(False, 'treffen')],
+        [(False, 'am montag'), (False, 'dienstag')],
+        [(True, 'abgesagt')],
+    ]
+
+
+def test_pipe_not_and_negated_phrase():
+    assert parse_search_query('a | b NOT c -"d e"') == [[(False, 'a'), (False, 'b')], [(True, 'c')],
+                                                         [(True, 'd e')]]
+
+
+def test_empty_terms_are_skipped():
+    assert parse_search_query('"" - OR') == [[(False, '-')]]
+    assert parse_search_query('   ') == []
+
+
+def test_unterminated_phrase_runs_to_the_end():
+    assert parse_search_query('x "offene phrase') == [[(False, 'x')], [(False, 'offene phrase')]]
+
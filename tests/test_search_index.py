@@ -0,0 +1,97 @@
+import functools
+import json
+import shutil
+
+import h5py
+import numpy as np
+import pytest
+import streamlit
+
+streamlit.config.set_option("logger.level", "error")
+
+import cv
+import json_toh5
+
+QUERIES = ["nachricht", "Nachricht 3-1", "deepl 2", "ÜNÏ", "gibt es nicht"]
+
+
+def make_chats(lo, hi):
+    return [{"chat_id": f"!room{chat}:example.com", "chat_name": f"Raum {chat}", "unique_sender_count": 1,
+             "message_count": hi - lo,
+             "messages": [{"timestamp": f"2023-01-{10 + index} 12:00:00", "sender_alias": "@a:example.com",
+                           "message": f"Nachricht {chat}-{index} ünïcode", "message_id": index,
+                           **({"message_deepl": f"DeepL {chat}-{index}"} if index % 3 == 0 else {})}
+                          for index in range(lo, hi)]}
+            for chat in range(4)]
+
+
+def write_json(path, chats):
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(chats, file, ensure_ascii=False)
+    return str(path)
+
+
+def search_candidates(path, query, column):
+    file_info = cv.read_chat_index(path)[1]
+    return cv.find_search_candidates(path, cv.get_search_index(file_info['fingerprint']), query, [column])
+
+
+@pytest.fixture
+def appended_file(tmp_path, monkeypatch):
+    # Kleine Blöcke, damit mehrere Segmente entstehen und zusammengelegt werden
+    monkeypatch.setattr(json_toh5, "update_search_index",
+                        functools.partial(json_toh5.update_search_index, batch_rows=8))
+    path = str(tmp_path / "index.h5")
+    json_toh5.convert_json_to_h5(write_json(tmp_path / "first.json", make_chats(0, 5)), path,
+                                 layout=json_toh5.LAYOUT_VERSION_COLUMNAR)
+    with h5py.File(path, 'r+') as hf:
+        json_toh5.update_search_index(hf)
+    return path, tmp_path
+
+
+def test_append_indexes_only_new_rows(appended_file, monkeypatch):
+    path, tmp_path = appended_file
+    with h5py.File(path, 'r') as hf:
+        indexed_rows = int(hf['search_index/message'].attrs['row_count'])
+    indexed_blocks = []
+    ngram_pairs = json_toh5.ngram_pairs
+
+    def recording_ngram_pairs(texts, first_row=0, n=json_toh5.SEARCH_INDEX_NGRAM):
+        if texts and texts[0].startswith("Nachricht"):
+            indexed_blocks.append((first_row, len(texts)))
+        return ngram_pairs(texts, first_row, n)
+    monkeypatch.setattr(json_toh5, "ngram_pairs", recording_ngram_pairs)
+
+    json_toh5.append_json_to_h5(write_json(tmp_path / "second.json", make_chats(5, 7)), path)
+
+    with h5py.File(path, 'r') as hf:
+        n_rows = hf['messages/timestamp'].shape[0]
+        segments = hf['search_index/message/segments']
+        texts = [int(segments[str(i)].attrs['texts']) for i in range(len(segments))]
+        assert int(hf['search_index/message'].attrs['row_count']) == n_rows
+    # Nur die angehängten Zeilen werden in n-Gramme zerlegt
+    assert min(first_row for first_row, _ in indexed_blocks) == indexed_rows
+    assert sum(length for _, length in indexed_blocks) == n_rows - indexed_rows
+    assert sum(texts) == n_rows
+    assert max(texts) <= 8
+
+
+def test_segments_find_the_same_rows_as_a_single_index(appended_file):
+    path, tmp_path = appended_file
+    json_toh5.append_json_to_h5(write_json(tmp_path / "second.json", make_chats(5, 7)), path)
+    json_toh5.append_json_to_h5(write_json(tmp_path / "third.json", make_chats(7, 8)), path)
+
+    rebuilt = str(tmp_path / "rebuilt.h5")
+    shutil.copy(path, rebuilt)
+    with h5py.File(rebuilt, 'r+') as hf:
+        del hf['search_index']
+        json_toh5.update_search_index.func(hf)
+        assert len(hf['search_index/message/segments']) == 1
+
+    for column in ['message', 'message_deepl']:
+        for query in QUERIES:
+            rows, row_count = search_candidates(path, query, column)
+            expected_rows, expected_row_count = search_candidates(rebuilt, query, column)
+            np.testing.assert_array_equal(rows, expected_rows)
+            assert row_count == expected_row_count
+    assert len(search_candidates(path, "nachricht 3-7", 'message')[0]) == 1
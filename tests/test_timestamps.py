@@ -0,0 +1,37 @@
+import numpy as np
+import pandas as pd
+
+from json_toh5 import NAT_VALUE, parse_timestamps
+
+
+def to_utc(values):
+    return [str(value) for value in pd.to_datetime(values, unit='s')]
+
+
+def test_parse_utc():
+    assert to_utc(parse_timestamps(['2023-09-19 13:12:58'])) == ['2023-09-19 13:12:58']
+
+
+def test_invalid_values_become_nat():
+    timestamps = parse_timestamps(['kein Datum', None, '', '2023-09-19 13:12:58'])
+    assert timestamps.dtype == np.int64
+    assert list(timestamps[:3]) == [NAT_VALUE] * 3
+    assert timestamps[3] != NAT_VALUE
+
+
+def test_timezone_is_converted_to_utc():
+    assert to_utc(parse_timestamps(['2023-06-01 12:00:00'], 'Europe/Berlin')) == ['2023-06-01 10:00:00']
+
+
+def test_berlin_fall_back_hour_stays_valid():
+    # Die Stunde 02:00-03:00 am 29.10.2023 gibt es zweimal; sie gilt als Sommerzeit (erstes Auftreten)
+    timestamps = parse_timestamps(['2023-10-29 01:59:00', '2023-10-29 02:30:00', '2023-10-29 03:10:00'],
+                                  'Europe/Berlin')
+    assert NAT_VALUE not in timestamps
+    assert to_utc(timestamps) == ['2023-10-28 23:59:00', '2023-10-29 00:30:00', '2023-10-29 02:10:00']
+    assert np.all(np.diff(timestamps) > 0)
+
+
+def test_berlin_spring_forward_hour_is_shifted():
+    # 02:30 am 26.03.2023 gibt es nicht; der Zeitstempel wird auf 03:00 Sommerzeit verschoben
+    assert to_utc(parse_timestamps(['2023-03-26 02:30:00'], 'Europe/Berlin')) == ['2023-03-26 01:00:00']